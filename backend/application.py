@@ -1,42 +1,204 @@
-from flask import Flask, request, jsonify, make_response
+from flask import Flask, Response, g, request, jsonify, make_response
 from flask_cors import CORS
+from contextlib import nullcontext
+import json
 import os
-import pandas as pd
-import matplotlib
-from io import BytesIO
-from reportlab.lib import colors
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Table,
-    TableStyle,
-    Image,
-    Paragraph,
-    Spacer
+import time
+import numpy as np
+from logparser.columnar import STORE_FOLDER
+from logparser.formats import sniff_format
+from logparser.incremental import continues_checkpoint, ingest_appended, read_checkpoint
+from logparser.metrics import REGISTRY, stage, track_ingest
+from logparser.rollups import BUCKET_SIZES
+from logparser.sources import COMPRESSED_EXTENSIONS, open_log
+from logparser.templates import template_parameters
+from logparser.timestamps import MISSING_EPOCH
+from backend.datasets import (
+    dataset_folder,
+    dataset_lock,
+    discard_ingest,
+    find_dataset,
+    ingest_folder,
+    list_datasets,
+    new_dataset_id,
+    publish_dataset,
+    read_dataset
+)
+from backend.jobs import JobQueue
+from backend.cache import ResultCache
+from backend.profiler import SamplingProfiler
+from backend.report import (
+    DEFAULT_MAX_ROWS,
+    SAMPLING_MODES,
+    build_report,
+    level_chart,
+    load_libraries
+)
+from backend.search import parse_query, search_rows
+from backend.timeline import merged_batches
+from backend.uploads import (
+    UploadError,
+    UploadTooLarge,
+    append_chunk,
+    complete_upload,
+    create_upload,
+    save_stream,
+    upload_status
+)
+from backend.store import (
+    build_time_index,
+    extend_time_index,
+    level_matches,
+    load_store,
+    parse_timestamp
 )
-from reportlab.lib.styles import ParagraphStyle
-from logparser.clf_parser import clf_parser
-from logparser.json_parser import json_parser
-from logparser.hadoop_parser import hadoop_parser, is_hadoop_log_file
-from logparser.zookeeper_parser import zookeeper_parser, is_zookeeper_log_file
-from logparser.hdfs_parser import hdfs_parser, is_hdfs_log_file
-
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 
 app = Flask(__name__)
 CORS(app)
 
-uploaded_files = []
-
 UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'log', 'json'}
+ALLOWED_EXTENSIONS = {'log', 'json', 'ndjson', 'jsonl'}
 
 OUTPUT_FOLDER = 'parsed_logs'
-MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10 MB maximum file size
+# Maximum size of a request body, 20 GB by default. Uploads are streamed to
+# disk, so this is not bounded by memory.
+MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 20 * 1024 ** 3))
+# Number of processes used to parse line-oriented logs. 1 parses serially.
+PARSE_WORKERS = int(os.environ.get('PARSE_WORKERS', 1))
+# Number of uploads parsed at the same time in the background. Every upload
+# is parsed into its own dataset folder, so they never interfere.
+INGEST_WORKERS = int(os.environ.get('INGEST_WORKERS', 4))
+JOBS_FOLDER = 'jobs'
+# Maximum number of histogram buckets returned by /stats.
+STATS_MAX_BUCKETS = int(os.environ.get('STATS_MAX_BUCKETS', 2000))
+# Maximum number of log rows in the table of a PDF report.
+REPORT_MAX_ROWS = int(os.environ.get('REPORT_MAX_ROWS', DEFAULT_MAX_ROWS))
+# Folder and total size of the cache of generated reports and charts.
+CACHE_FOLDER = 'cache'
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 256 * 1024 ** 2))
+# Whether a request may ask, with ?profile=1, for a sampling profile of
+# itself instead of its response. Off by default.
+PROFILE_REQUESTS = os.environ.get('PROFILE_REQUESTS', '0') == '1'
+# Whether to import matplotlib and reportlab at startup rather than on the
+# first report, e.g. with gunicorn --preload, whose forked workers then
+# share them.
+PRELOAD_REPORT_LIBRARIES = os.environ.get('PRELOAD_REPORT_LIBRARIES', '0') == '1'
 
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
+app.config['PARSE_WORKERS'] = PARSE_WORKERS
+app.config['JOBS_FOLDER'] = JOBS_FOLDER
+app.config['CACHE_FOLDER'] = CACHE_FOLDER
+app.config['PROFILE_REQUESTS'] = PROFILE_REQUESTS
+
+ingest_jobs = JobQueue(app.config['JOBS_FOLDER'], INGEST_WORKERS)
+result_cache = ResultCache(app.config['CACHE_FOLDER'], CACHE_MAX_BYTES)
+if PRELOAD_REPORT_LIBRARIES:
+    load_libraries()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Requests answered by route and status.',
+    ('method', 'route', 'status'))
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_seconds', 'Seconds spent answering a request, up to its first byte.',
+    ('method', 'route'))
+# The counters of the report cache, read when the metrics are rendered.
+for key, metric_type, documentation in (
+        ('hits', 'counter', 'Report cache lookups that found the result.'),
+        ('misses', 'counter', 'Report cache lookups that built the result.'),
+        ('evictions', 'counter', 'Results evicted from the report cache.'),
+        ('entries', 'gauge', 'Results held in the report cache.'),
+        ('bytes', 'gauge', 'Bytes held in the report cache.')):
+    REGISTRY.callback('report_cache_' + key + ('_total' if metric_type == 'counter' else ''),
+                      documentation, lambda key=key: result_cache.stats()[key], metric_type)
+
+# Number of example records returned with the counts of a template.
+TEMPLATE_EXAMPLES = 10
+
+# Number of records serialized at a time when streaming logs back.
+RESPONSE_BATCH_ROWS = 10000
+# Default and maximum page size of the /logs endpoint.
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 10000
+
+
+def stream_batches(batches):
+    """
+    Stream batches of records as one compact JSON array response.
+
+    Parameters:
+    - batches (iterable): Lists of records, in response order.
+
+    Returns:
+    Response: The streamed JSON response.
+    """
+    def generate():
+        # Serialize the records batch by batch so nothing is built up in memory
+        yield '['
+        separator = ''
+        for batch in batches:
+            if batch:
+                yield separator + json.dumps(batch, separators=(',', ':'))[1:-1]
+                separator = ','
+        yield ']'
+
+    return Response(generate(), mimetype='application/json')
+
+
+def stream_records(store, rows):
+    """
+    Stream the given rows of a store as a compact JSON array response.
+
+    Parameters:
+    - store (LogStore): The store holding the records.
+    - rows (ndarray): The row numbers to send, in response order.
+
+    Returns:
+    Response: The streamed JSON response.
+    """
+    return stream_batches(
+        store.records(rows[start:start + RESPONSE_BATCH_ROWS])
+        for start in range(0, len(rows), RESPONSE_BATCH_ROWS)
+    )
+
+
+def query_rows(store, args):
+    """
+    Find the rows of a store matching the start, end and level arguments
+    of a request.
+
+    Parameters:
+    - store (LogStore): The store to query.
+    - args (dict): The request arguments.
+
+    Returns:
+    ndarray: The matching row numbers in ascending timestamp order.
+
+    Raises:
+    ValueError: If a timestamp argument is invalid.
+    """
+    start = parse_timestamp(args['start']) if args.get('start') else None
+    end = parse_timestamp(args['end']) if args.get('end') else None
+
+    rows = store.time_range(start, end)
+    if args.get('level'):
+        rows = store.filter_level(rows, args['level'])
+    return rows
+
+
+def file_extension_of(filename):
+    """
+    Return the lower-case extension of a file, ignoring a compression suffix.
+
+    Example:
+    >>> file_extension_of('hadoop.log.gz')
+    'log'
+    """
+    parts = filename.lower().split('.')
+    if len(parts) > 2 and parts[-1] in COMPRESSED_EXTENSIONS:
+        parts.pop()
+    return parts[-1] if len(parts) > 1 else ''
 
 
 def allowed_file(filename):
@@ -52,62 +214,254 @@ def allowed_file(filename):
     Example:
     >>> allowed_file('example.log')
     True
+    >>> allowed_file('example.log.zst')
+    True
     >>> allowed_file('document.txt')
     False
     """
-    return (
-        '.' in filename and filename.rsplit('.', 1)[1].lower() in (
-            ALLOWED_EXTENSIONS
-        )
-    )
+    return file_extension_of(filename) in ALLOWED_EXTENSIONS
 
 
-def handle_uploaded_file(file_path, file_extension):
+def handle_uploaded_file(file_path, file_extension, dataset_id, incremental=False,
+                         progress=None):
     """
-    Send the uploaded file to appropriate parser based on its extension.
+    Send the uploaded file to the parser of its log format.
 
     Parameters:
     - file_path (str): The path to the uploaded file.
     - file_extension (str): The extension of the uploaded file.
+    - dataset_id (str): The dataset the file is parsed into.
+    - incremental (bool): Only parse what was appended to the file since it
+    was last ingested (see logparser.incremental).
+    - progress (callable): Optional progress(bytes_read, lines_read) callback.
 
     Returns:
-    None
+    dict: The description of the dataset, with the number of parsed records.
+
+    Raises:
+    RuntimeError: If the file could not be parsed.
 
     Notes:
-    - If the file extension is 'json', it is parsed using the json_parser function.
-    - If the file extension is 'log', the appropriate parser is chosen based on
-    the log type.
-      - Hadoop logs are parsed using hadoop_parser.
-      - Zookeeper logs are parsed using zookeeper_parser.
-      - HDFS logs are parsed using hdfs_parser.
-      - Other logs are parsed using clf_parser.
-    """
-    if file_extension == 'json':
-        json_parser(file_path, app.config['OUTPUT_FOLDER'])
-    elif file_extension == 'log':
-        if is_hadoop_log_file(file_path):
-            hadoop_parser(file_path, app.config['OUTPUT_FOLDER'])
-        elif is_zookeeper_log_file(file_path):
-            zookeeper_parser(file_path, app.config['OUTPUT_FOLDER'])
-        elif is_hdfs_log_file(file_path):
-            hdfs_parser(file_path, app.config['OUTPUT_FOLDER'])
-        else:
-            clf_parser(file_path, app.config['OUTPUT_FOLDER'])
+    - The file is opened once; the format is sniffed from a sample of its
+    first lines (see logparser.formats) and the open file is handed to the
+    parser of that format.
+      - Hadoop, Zookeeper, HDFS and CLF logs are told apart by their lines.
+      - JSON files hold an array of log objects, or one object per line
+      (NDJSON); both are decoded one record at a time.
+      - '.log' files that match no format are parsed as CLF logs.
+    - Line-oriented logs are parsed with PARSE_WORKERS processes.
+    - Compressed files (gzip, bz2, xz, zstd) are decompressed while they are
+    parsed. They, and JSON files, are always parsed in full.
+    - A dataset is parsed into a temporary folder that is renamed into
+    place when it is complete (see backend.datasets). Only lines appended
+    to the log of an existing dataset are added to its folder in place,
+    under the lock of the dataset.
+    - The time index of the parsed logs is built once the parse is done, or
+    extended with the appended rows.
+    - Cached reports and charts of a re-ingested dataset are dropped.
+    - The lines, bytes and records of the ingest and the time spent in
+    every stage are added to the metrics (see logparser.metrics).
+    """
+    output_root = app.config['OUTPUT_FOLDER']
+    workers = app.config['PARSE_WORKERS']
+    # Appends to a dataset hold its lock, so they never run at once
+    lock = dataset_lock(output_root, dataset_id) if incremental else nullcontext()
+
+    with lock:
+        output_folder = None
+        try:
+            with track_ingest() as ingest:
+                with open_log(file_path) as source:
+                    log_format = sniff_format(source, file_extension)
+                    if log_format is None:
+                        raise RuntimeError(
+                            f"Unknown log format of '{os.path.basename(file_path)}'")
+                    ingest.log_format = log_format.name
+
+                    first_row = 0
+                    if incremental and log_format.parse_entry and not source.compression:
+                        # Lines are only appended in place to the log they
+                        # continue, anything else is parsed into a new folder
+                        live_folder = os.path.join(output_root, dataset_id)
+                        in_place = continues_checkpoint(
+                            source, read_checkpoint(live_folder), live_folder)
+                        output_folder = ingest_folder(output_root, dataset_id, in_place)
+                        first_row, records = ingest_appended(
+                            source, output_folder, log_format.parse_entry, progress)
+                    else:
+                        output_folder = ingest_folder(output_root, dataset_id)
+                        records = log_format.parse(source, output_folder, workers, progress)
+
+                # The parsers report their errors and return None when they fail
+                if records is None:
+                    raise RuntimeError(f"Failed to parse '{os.path.basename(file_path)}'")
+
+                # Sort the parsed rows by timestamp once so queries can bisect them
+                store_folder = os.path.join(output_folder, STORE_FOLDER)
+                with stage('index'):
+                    if first_row:
+                        extend_time_index(store_folder, first_row)
+                    else:
+                        build_time_index(store_folder)
+        except BaseException:
+            if output_folder:
+                discard_ingest(output_folder)
+            raise
+
+        dataset = publish_dataset(output_root, dataset_id, output_folder, {
+            'filename': os.path.basename(file_path),
+            'format': log_format.name,
+            'rows': first_row + records,
+        })
+    # Reports cached for the previous version of the dataset are stale
+    result_cache.invalidate(dataset_id)
+    return dict(dataset, records=records)
+
+
+def queue_parse(filename, file_path, incremental=False):
+    """
+    Queue an uploaded file for parsing in the background.
+
+    Parameters:
+    - filename (str): The name of the uploaded file.
+    - file_path (str): The path of the file in the uploads folder.
+    - incremental (bool): Only parse what was appended since the last upload
+    of the same log, into the dataset of that upload.
+
+    Returns:
+    tuple: The queued parse job and the id of the dataset it parses into.
+    """
+    # Create the output folder for the datasets of parsed logs.
+    os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+
+    dataset_id = None
+    if incremental:
+        dataset_id = find_dataset(app.config['OUTPUT_FOLDER'], filename)
+    dataset_id = dataset_id or new_dataset_id()
+
+    file_extension = file_extension_of(filename)
+    job = ingest_jobs.submit(filename, file_path, handle_uploaded_file,
+                             file_path, file_extension, dataset_id, incremental)
+    return job, dataset_id
+
+
+def open_store(dataset_id=None):
+    """
+    Open the columnar store of a dataset, by default of the latest one.
+
+    Raises:
+    FileNotFoundError: If there is no such dataset.
+    """
+    return load_store(dataset_folder(app.config['OUTPUT_FOLDER'], dataset_id))
+
+
+def open_selections(dataset_ids, args):
+    """
+    Open the stores of several datasets and find their rows matching the
+    start, end and level arguments of a request.
+
+    Returns:
+    tuple: The (store, rows) pair and the source file name of every dataset.
+
+    Raises:
+    FileNotFoundError: If a dataset does not exist.
+    ValueError: If a timestamp argument is invalid.
+    """
+    selections, sources = [], []
+    for dataset_id in dataset_ids:
+        folder = dataset_folder(app.config['OUTPUT_FOLDER'], dataset_id)
+        store = load_store(folder)
+        selections.append((store, query_rows(store, args)))
+        sources.append(read_dataset(folder)['filename'])
+    return selections, sources
+
+
+def dataset_versions(dataset_ids):
+    """
+    Return the (id, version) pair of every dataset, a missing id meaning the
+    latest dataset. The version changes whenever a dataset is re-ingested.
+
+    Raises:
+    FileNotFoundError: If a dataset does not exist.
+    """
+    versions = []
+    for dataset_id in dataset_ids:
+        dataset = read_dataset(dataset_folder(app.config['OUTPUT_FOLDER'], dataset_id))
+        versions.append((dataset['id'], dataset['updated_at']))
+    return versions
+
+
+def window_filters(args):
+    """
+    Return the start, end and level arguments of a request, with the
+    timestamps in epoch microseconds, as the filters of a cache key.
+
+    Raises:
+    ValueError: If a timestamp argument is invalid.
+    """
+    return {
+        'start': parse_timestamp(args['start']) if args.get('start') else None,
+        'end': parse_timestamp(args['end']) if args.get('end') else None,
+        'level': args.get('level') or None,
+    }
+
+
+def is_incremental(args):
+    """Check whether an upload request asks for append-only ingestion."""
+    return args.get('mode') == 'append'
+
+
+@app.before_request
+def start_request():
+    """Start timing a request, and profiling it if it asks to be."""
+    g.request_started = time.perf_counter()
+    if app.config['PROFILE_REQUESTS'] and request.args.get('profile') == '1':
+        g.profiler = SamplingProfiler().start()
+
+
+@app.after_request
+def finish_request(response):
+    """
+    Add a request to the HTTP metrics, by route pattern so that every
+    dataset or job id does not become a metric of its own.
+
+    A profiled request is answered with its profile in the collapsed stack
+    format (see backend.profiler) instead of its response. A streamed body
+    is produced first, so that it is part of the profile.
+    """
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                     method=request.method, route=route)
+    HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    response.get_data()
+    profiler.stop()
+    profile = Response(profiler.collapsed(), mimetype='text/plain')
+    profile.headers['X-Profile-Samples'] = str(profiler.samples)
+    profile.headers['X-Profile-Seconds'] = f'{profiler.seconds:.3f}'
+    profile.headers['X-Profile-Status'] = str(response.status_code)
+    return profile
 
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """
-    Handles file uploads via a POST request and sends it for file handling.
+    Handles file uploads via a POST request and queues them for parsing.
 
     Endpoint: /upload
     Methods: POST
 
     Returns:
-        JSON: A JSON response indicating the status of the file upload.
+        JSON: A JSON response with the ids of the queued parse job and of
+        the dataset the file is parsed into.
 
     Responses:
-        - 200 OK: File uploaded successfully.
+        - 202 Accepted: File uploaded successfully and queued for parsing.
         - 400 Bad Request: If no file is provided, the selected file is
         empty, or the file type is not allowed.
         - 500 Internal Server Error: If an unexpected server error occurs
@@ -115,8 +469,13 @@ def upload_file():
 
     Notes:
         - Allowed file types are determined by the `allowed_file` function.
-        - The uploaded file gets saved to the 'uploads' folder.
+        - The uploaded file gets streamed to the 'uploads' folder.
+        - The file is parsed in the background; its progress is reported
+        by the /jobs/<job_id> endpoint.
         - The corresponding parsed JSON file is stored in the 'output' folder.
+        - Every upload is parsed into a new dataset, whose id is returned.
+        - With '?mode=append' only the lines appended since the last upload
+        of the same log are parsed and added to the dataset of that upload.
 
     """
     try:
@@ -130,29 +489,203 @@ def upload_file():
         if not allowed_file(file.filename):
             return jsonify({'error': 'Invalid file type'}), 400
 
-        # Read the content of the file
-        file_content = file.read()
+        # Copy the file to the uploads folder in chunks
+        file_path = save_stream(file.stream, app.config['UPLOAD_FOLDER'], file.filename)
+        job, dataset_id = queue_parse(os.path.basename(file_path), file_path,
+                                      is_incremental(request.args))
+        return jsonify({'message': 'File uploaded successfully', 'job_id': job.id,
+                        'dataset_id': dataset_id}), 202
 
-        # Create the uploads folder if it doesn't exist
-        if not os.path.exists(app.config['UPLOAD_FOLDER']):
-            os.makedirs(app.config['UPLOAD_FOLDER'])
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
-        # Save the file to the uploads folder
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-        with open(file_path, 'wb') as uploaded_file:
-            uploaded_file.write(file_content)
 
-        # Create the output folder for the storing parsed json file.
-        if not os.path.exists(app.config['OUTPUT_FOLDER']):
-            os.makedirs(app.config['OUTPUT_FOLDER'])
+@app.route('/upload/stream', methods=['PUT'])
+def upload_stream():
+    """
+    Handles a file sent as the raw request body and queues it for parsing.
 
-        uploaded_files.append(file.filename)
-        file_extension = file.filename.split('.')[-1]
-        handle_uploaded_file(file_path, file_extension)
-        return jsonify({'message': 'File uploaded successfully'}), 200
+    Endpoint: /upload/stream?filename=<name>
+    Methods: PUT
 
-    except Exception as e:
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    Returns:
+        JSON: A JSON response with the ids of the queued parse job and of
+        the dataset the file is parsed into.
+
+    Responses:
+        - 202 Accepted: File uploaded successfully and queued for parsing.
+        - 400 Bad Request: If the filename is missing or not allowed, or the
+        gzip body is not valid.
+        - 413 Payload Too Large: If the body is larger than
+        MAX_CONTENT_LENGTH once decompressed.
+
+    Notes:
+        - The body is written to disk chunk by chunk as it arrives.
+        - A body sent with 'Content-Encoding: gzip' is decompressed on the fly,
+        at most COPY_CHUNK_SIZE bytes at a time.
+        - Compressed log files ('.gz', '.bz2', '.xz', '.zst') are stored as
+        they are and decompressed while they are parsed.
+        - '?mode=append' works as for /upload.
+    """
+    filename = request.args.get('filename', '')
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    try:
+        gzipped = request.headers.get('Content-Encoding') == 'gzip'
+        file_path = save_stream(request.stream, app.config['UPLOAD_FOLDER'], filename, gzipped,
+                                app.config['MAX_CONTENT_LENGTH'])
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+
+    job, dataset_id = queue_parse(os.path.basename(file_path), file_path,
+                                  is_incremental(request.args))
+    return jsonify({'message': 'File uploaded successfully', 'job_id': job.id,
+                    'dataset_id': dataset_id}), 202
+
+
+@app.route('/uploads', methods=['POST'])
+def start_resumable_upload():
+    """
+    Start a resumable upload.
+
+    Endpoint: /uploads
+    Methods: POST
+
+    Parameters:
+        - filename (str): The name of the file, in the JSON body.
+
+    Returns:
+        JSON: {"upload_id": str, "filename": str, "received": 0}
+
+    Notes:
+        - Send the file in chunks with PUT /uploads/<upload_id>?offset=<n>,
+        then call POST /uploads/<upload_id>/complete to queue it for parsing.
+    """
+    filename = (request.get_json(silent=True) or {}).get('filename', '')
+    if not allowed_file(filename):
+        return jsonify({'error': 'Invalid file type'}), 400
+
+    try:
+        upload_id = create_upload(app.config['UPLOAD_FOLDER'], filename)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(upload_status(app.config['UPLOAD_FOLDER'], upload_id)), 201
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_resumable_upload(upload_id):
+    """
+    Report how many bytes of a resumable upload have been received, which is
+    the offset to resume from.
+
+    Endpoint: /uploads/<upload_id>
+    Methods: GET
+    """
+    try:
+        return jsonify(upload_status(app.config['UPLOAD_FOLDER'], upload_id))
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 404
+
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def append_resumable_upload(upload_id):
+    """
+    Append the raw request body to a resumable upload.
+
+    Endpoint: /uploads/<upload_id>?offset=<n>
+    Methods: PUT
+
+    Responses:
+        - 200 OK: {"received": int}, the bytes received so far.
+        - 409 Conflict: If the offset is not the number of bytes received so
+        far. The body then holds the expected offset.
+        - 413 Payload Too Large: If the chunk is larger than
+        MAX_CONTENT_LENGTH once decompressed. It is dropped, the upload can
+        resume from the same offset.
+    """
+    try:
+        offset = int(request.args.get('offset', -1))
+        gzipped = request.headers.get('Content-Encoding') == 'gzip'
+        received = append_chunk(app.config['UPLOAD_FOLDER'], upload_id, offset,
+                                request.stream, gzipped, app.config['MAX_CONTENT_LENGTH'])
+    except ValueError:
+        return jsonify({'error': 'Invalid offset'}), 400
+    except UploadTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except UploadError as e:
+        try:
+            status = upload_status(app.config['UPLOAD_FOLDER'], upload_id)
+        except UploadError:
+            return jsonify({'error': str(e)}), 404
+        return jsonify(dict(status, error=str(e))), 409
+    return jsonify({'upload_id': upload_id, 'received': received})
+
+
+@app.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_resumable_upload(upload_id):
+    """
+    Finish a resumable upload and queue it for parsing.
+
+    Endpoint: /uploads/<upload_id>/complete
+    Methods: POST
+
+    Returns:
+        JSON: A JSON response with the ids of the queued parse job and of
+        the dataset the file is parsed into.
+
+    Notes:
+        - '?mode=append' works as for /upload.
+    """
+    try:
+        filename, file_path = complete_upload(app.config['UPLOAD_FOLDER'], upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 404
+
+    job, dataset_id = queue_parse(filename, file_path, is_incremental(request.args))
+    return jsonify({'message': 'File uploaded successfully', 'job_id': job.id,
+                    'dataset_id': dataset_id}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Report the state and progress of a parse job.
+
+    Endpoint: /jobs/<job_id>
+    Method: GET
+
+    Returns:
+        JSON: The job state ('queued', 'running', 'done' or 'failed'), the
+        bytes and lines parsed so far and the parse throughput.
+
+    Responses:
+        - 200 OK: The job state.
+        - 404 Not Found: If there is no job with this id.
+    """
+    status = ingest_jobs.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
+
+
+@app.route('/datasets', methods=['GET'])
+def get_datasets():
+    """
+    List the datasets of parsed logs.
+
+    Endpoint: /datasets
+    Method: GET
+
+    Returns:
+        JSON: [{"id": str, "filename": str, "format": str, "rows": int,
+        "updated_at": float}, ...], the latest updated first.
+    """
+    return jsonify(list_datasets(app.config['OUTPUT_FOLDER']))
 
 
 @app.route('/get_parsed_log_file_path', methods=['GET'])
@@ -167,19 +700,615 @@ def get_parsed_log_file_path():
         str: The content of the parsed log file in JSON format.
 
     Notes:
-        - The endpoint returns the content of the parsed log file stored in 
-        'parsed_logs/output.json'.
-        - The content is returned as a JSON string.
+        - The records are read from the columnar store of the dataset named
+        by the 'dataset' parameter, by default the latest parsed one, and
+        streamed back as a compact JSON array.
         - If the file is not found, a 404 error is returned.
 
     """
     try:
-        with open('parsed_logs/output.json', 'r') as file:
-            logs_content = file.read()
-        return logs_content
+        store = open_store(request.args.get('dataset'))
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+
+    return stream_records(store, np.arange(len(store)))
+
+
+@app.route('/logs/query', methods=['GET'])
+def query_logs():
+    """
+    Retrieve the parsed logs within a time window, optionally of one level.
+
+    Endpoint: /logs/query
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - start (str): Optional ISO 8601 start timestamp (inclusive).
+        - end (str): Optional ISO 8601 end timestamp (inclusive).
+        - level (str): Optional log level to keep.
+
+    Returns:
+        JSON: The matching records in ascending timestamp order.
+
+    Responses:
+        - 200 OK: The matching records.
+        - 400 Bad Request: If a timestamp is invalid.
+        - 404 Not Found: If the dataset does not exist or no log file has
+        been parsed yet.
+
+    Notes:
+        - The window is found by bisecting the time index built at ingest, so
+        a query costs O(log n + k) for k matching records.
+    """
+    try:
+        store = open_store(request.args.get('dataset'))
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+
+    try:
+        rows = query_rows(store, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return stream_records(store, rows)
+
+
+@app.route('/logs/merged', methods=['GET'])
+def query_merged_logs():
+    """
+    Retrieve the parsed logs of several datasets as one timeline.
+
+    Endpoint: /logs/merged
+    Method: GET
+
+    Parameters:
+        - datasets (str): Comma separated dataset ids.
+        - start (str): Optional ISO 8601 start timestamp (inclusive).
+        - end (str): Optional ISO 8601 end timestamp (inclusive).
+        - level (str): Optional log level to keep.
+
+    Returns:
+        JSON: The matching records of all the datasets in ascending
+        timestamp order, each with a "source" field holding the name of the
+        file it was parsed from.
+
+    Responses:
+        - 200 OK: The matching records.
+        - 400 Bad Request: If no dataset is given or a timestamp is invalid.
+        - 404 Not Found: If a dataset does not exist.
+
+    Notes:
+        - The per-dataset time indexes are merged with a k-way merge (see
+        backend.timeline), so the records are streamed without re-sorting.
+    """
+    dataset_ids = [d for d in request.args.get('datasets', '').split(',') if d]
+    if not dataset_ids:
+        return jsonify({'error': 'No datasets given'}), 400
+
+    try:
+        selections, sources = open_selections(dataset_ids, request.args)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return stream_batches(merged_batches(selections, sources, RESPONSE_BATCH_ROWS))
+
+
+@app.route('/logs', methods=['GET'])
+def get_logs_page():
+    """
+    Retrieve one page of the parsed logs.
+
+    Endpoint: /logs
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - cursor (int): Offset of the first record of the page. Defaults to 0.
+        - limit (int): Maximum number of records in the page.
+        - start (str): Optional ISO 8601 start timestamp (inclusive).
+        - end (str): Optional ISO 8601 end timestamp (inclusive).
+        - level (str): Optional log level to keep.
+
+    Returns:
+        JSON: {"records": [...], "next_cursor": int or null, "total": int}
+
+    Responses:
+        - 200 OK: The requested page.
+        - 400 Bad Request: If a parameter is invalid.
+        - 404 Not Found: If the dataset does not exist or no log file has
+        been parsed yet.
+
+    Notes:
+        - Records are ordered by timestamp. Pass next_cursor back as the
+        cursor to get the following page; it is null on the last page.
+        - The limit is capped at MAX_PAGE_SIZE.
+    """
+    try:
+        store = open_store(request.args.get('dataset'))
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+
+    try:
+        cursor = int(request.args.get('cursor', 0))
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if cursor < 0 or limit < 1:
+            raise ValueError("cursor must be >= 0 and limit >= 1")
+        rows = query_rows(store, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    next_cursor = cursor + limit if cursor + limit < len(rows) else None
+    page = {
+        'records': store.records(rows[cursor:cursor + limit]),
+        'next_cursor': next_cursor,
+        'total': len(rows),
+    }
+    return Response(json.dumps(page, separators=(',', ':')), mimetype='application/json')
+
+
+@app.route('/search', methods=['GET'])
+def search_logs():
+    """
+    Search the parsed messages for terms and phrases.
+
+    Endpoint: /search
+    Method: GET
+
+    Parameters:
+        - q (str): The query. Every whitespace separated term and every
+        "quoted phrase" must appear in the message (of a CLF log, in the
+        request or the client address). Case insensitive.
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - start (str): Optional ISO 8601 start timestamp (inclusive).
+        - end (str): Optional ISO 8601 end timestamp (inclusive).
+        - level (str): Optional log level to keep.
+        - cursor (int): Offset of the first record of the page. Defaults to 0.
+        - limit (int): Maximum number of records in the page.
+
+    Returns:
+        JSON: {"records": [...], "next_cursor": int or null, "total": int,
+        "took_ms": float}, the same page as /logs.
+
+    Responses:
+        - 200 OK: The requested page of matching records.
+        - 400 Bad Request: If the query is empty or a parameter is invalid.
+        - 404 Not Found: If the dataset does not exist or no log file has
+        been parsed yet.
+
+    Notes:
+        - Terms are looked up in the inverted token index built at ingest
+        (see backend.search), so only the matching rows are read.
+        - Words are runs of letters and digits, '_' separating them too:
+        'blk' finds 'blk_-1608999687919862906', as does the whole token.
+        - Records are ordered by timestamp, and paged like /logs.
+    """
+    started = time.perf_counter()
+    terms = parse_query(request.args.get('q', ''))
+    try:
+        cursor = int(request.args.get('cursor', 0))
+        limit = min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        if cursor < 0 or limit < 1:
+            raise ValueError("cursor must be >= 0 and limit >= 1")
+        if not terms:
+            raise ValueError("q must hold at least one search term")
+        filters = window_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        store = open_store(request.args.get('dataset'))
     except FileNotFoundError:
         return jsonify({"error": "Parsed log file not found"}), 404
 
+    rows = search_rows(store, terms)
+    rows = store.filter_time(rows, filters['start'], filters['end'])
+    if filters['level']:
+        rows = store.filter_level(rows, filters['level'])
+    rows = rows[np.argsort(store.timestamps[rows], kind='stable')]
+
+    next_cursor = cursor + limit if cursor + limit < len(rows) else None
+    page = {
+        'records': store.records(rows[cursor:cursor + limit]),
+        'next_cursor': next_cursor,
+        'total': len(rows),
+        'took_ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+    return Response(json.dumps(page, separators=(',', ':')), mimetype='application/json')
+
+
+@app.route('/templates', methods=['GET'])
+def get_templates():
+    """
+    List the message templates of a dataset with their counts.
+
+    Endpoint: /templates
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - start (str): Optional ISO 8601 start timestamp (inclusive).
+        - end (str): Optional ISO 8601 end timestamp (inclusive).
+        - level (str): Optional log level to keep.
+        - limit (int): Optional maximum number of templates returned.
+
+    Returns:
+        JSON: {"total": int, "distinct": int, "templates": [{"id": int,
+        "template": str, "count": int}, ...]}, the most frequent first,
+        counting only the records matching the filters.
+
+    Responses:
+        - 200 OK: The templates.
+        - 400 Bad Request: If a parameter is invalid.
+        - 404 Not Found: If the dataset does not exist, no log file has been
+        parsed yet or it was parsed before templates were mined.
+
+    Notes:
+        - Templates are mined while the log is parsed (see
+        logparser.templates) and every record keeps the id of its template,
+        so the counts are a bincount of that column. With level=ERROR this
+        lists the distinct kinds of errors.
+    """
+    try:
+        store = open_store(request.args.get('dataset'))
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+    if store.template_ids is None:
+        return jsonify({"error": "No templates were mined for this log"}), 404
+
+    try:
+        limit = int(request.args['limit']) if request.args.get('limit') else None
+        rows = query_rows(store, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    templates = store.templates()
+    counts = np.bincount(store.template_ids[rows], minlength=len(templates))
+    found = np.flatnonzero(counts)
+    found = found[np.argsort(-counts[found], kind='stable')][:limit]
+    return jsonify({
+        'total': len(rows),
+        'distinct': int(np.count_nonzero(counts)),
+        'templates': [
+            {'id': int(template_id), 'template': templates[template_id]['template'],
+             'count': int(counts[template_id])}
+            for template_id in found
+        ],
+    })
+
+
+@app.route('/templates/<int:template_id>', methods=['GET'])
+def get_template(template_id):
+    """
+    Retrieve the counts over time of one message template.
+
+    Endpoint: /templates/<template_id>
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - bucket (str): Histogram bucket size, 'second', 'minute' (default)
+        or 'hour'.
+        - start (str): Optional ISO 8601 start timestamp (inclusive).
+        - end (str): Optional ISO 8601 end timestamp (inclusive).
+        - level (str): Optional log level to keep.
+
+    Returns:
+        JSON: {"id": int, "template": str, "total": int, "bucket": str,
+        "buckets": [{"timestamp": str, "count": int}, ...],
+        "examples": [{..record.., "parameters": [str, ...]}, ...]}
+
+    Responses:
+        - 200 OK: The template counts.
+        - 400 Bad Request: If a parameter is invalid.
+        - 404 Not Found: If the dataset or the template does not exist.
+
+    Notes:
+        - The parameters of the example records are the values of the
+        wildcards of the template in their message.
+    """
+    bucket = request.args.get('bucket', 'minute')
+    try:
+        store = open_store(request.args.get('dataset'))
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+    templates = store.templates()
+    if template_id >= len(templates):
+        return jsonify({"error": "Template not found"}), 404
+
+    try:
+        if bucket not in BUCKET_SIZES:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKET_SIZES)}")
+        rows = query_rows(store, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Rows stay in timestamp order
+    rows = rows[store.template_ids[rows] == template_id]
+    seconds = store.timestamps[rows]
+    seconds = seconds[seconds != MISSING_EPOCH] // 1_000_000
+    size = BUCKET_SIZES[bucket]
+    starts, counts = np.unique(seconds - seconds % size, return_counts=True)
+
+    template = templates[template_id]['template']
+    examples = store.records(rows[:TEMPLATE_EXAMPLES])
+    for record in examples:
+        record['parameters'] = template_parameters(template, record['message'])
+    return jsonify({
+        'id': template_id,
+        'template': template,
+        'total': len(rows),
+        'bucket': bucket,
+        'buckets': [
+            {'timestamp': np.datetime_as_string(np.datetime64(start, 's')), 'count': count}
+            for start, count in zip(starts.tolist(), counts.tolist())
+        ],
+        'examples': examples,
+    })
+
+
+@app.route('/stats', methods=['GET'])
+def get_stats():
+    """
+    Retrieve the log level counts and a log level histogram over time.
+
+    Endpoint: /stats
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - bucket (str): Histogram bucket size, 'second', 'minute' (default)
+        or 'hour'.
+        - start (str): Optional ISO 8601 start timestamp.
+        - end (str): Optional ISO 8601 end timestamp.
+        - level (str): Optional log level to keep.
+
+    Returns:
+        JSON: {"total": int, "levels": {level: count}, "bucket": str,
+        "bucket_seconds": int,
+        "buckets": [{"timestamp": str, "counts": {level: count}}, ...]}
+
+    Responses:
+        - 200 OK: The statistics.
+        - 400 Bad Request: If a parameter is invalid or the per-second
+        histogram was not kept for a log spanning too long a time.
+        - 404 Not Found: If the dataset does not exist or no log file has
+        been parsed yet.
+
+    Notes:
+        - The counts are rolled up while the log is parsed, so no records
+        are read. With a time window the level counts are summed from the
+        buckets overlapping it, so they are exact to the bucket size.
+        - Only the buckets in the time window are read from the histogram
+        file of the bucket size. At most STATS_MAX_BUCKETS buckets are
+        returned: a longer window gets consecutive buckets summed into
+        wider ones, 'bucket_seconds' wide.
+    """
+    bucket = request.args.get('bucket', 'minute')
+    try:
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+        if bucket not in BUCKET_SIZES:
+            raise ValueError(f"bucket must be one of {', '.join(BUCKET_SIZES)}")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        store = open_store(request.args.get('dataset'))
+        rollups = store.rollups()
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+
+    histogram = store.histogram(bucket, start, end, STATS_MAX_BUCKETS)
+    if histogram is None:
+        return jsonify({'error': f"No per-{bucket} histogram for this log"}), 400
+    starts, size, names, counts = histogram
+
+    level = request.args.get('level')
+    if level:
+        keep = [level_matches(name, level) for name in names]
+        names = [name for name, kept in zip(names, keep) if kept]
+        counts = counts[:, np.array(keep, dtype=bool)]
+
+    if start is None and end is None:
+        levels = rollups['levels']
+        total = rollups['rows']
+        if level:
+            levels = {name: count for name, count in levels.items() if level_matches(name, level)}
+            total = sum(levels.values())
+    else:
+        levels = {name: count for name, count in zip(names, counts.sum(axis=0).tolist())
+                  if count}
+        total = sum(levels.values())
+
+    return jsonify({
+        'total': total,
+        'levels': levels,
+        'bucket': bucket,
+        'bucket_seconds': size,
+        'buckets': [
+            {'timestamp': np.datetime_as_string(np.datetime64(second, 's')),
+             'counts': {name: count for name, count in zip(names, row) if count}}
+            for second, row in zip(starts.tolist(), counts.tolist())
+        ],
+    })
+
+
+@app.route('/access', methods=['GET'])
+def get_access_summary():
+    """
+    Summarize the clients, paths, statuses and response sizes of access logs.
+
+    Endpoint: /access
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - datasets (str): Optional comma separated dataset ids, summarized
+        together instead of one dataset.
+        - top (int): The number of top clients and paths, 10 by default.
+        - start (str): Optional ISO 8601 start timestamp.
+        - end (str): Optional ISO 8601 end timestamp.
+
+    Returns:
+        JSON: {"rows": int,
+        "top_clients": [{"value": str, "count": int, "error": int}, ...],
+        "top_paths": [...], "distinct_clients": int, "bucket_seconds": int,
+        "distinct_clients_per_bucket": [{"timestamp": str, "count": int}, ...],
+        "statuses": {status: count}, "status_quantiles": {"p50": int, ...},
+        "size_quantiles": {"p50": float, ...}}
+
+    Responses:
+        - 200 OK: The summary.
+        - 400 Bad Request: If a parameter is invalid, or a dataset is not an
+        access log.
+        - 404 Not Found: If a dataset does not exist or no log file has been
+        parsed yet.
+
+    Notes:
+        - The summary is read from the sketches built while the logs were
+        parsed (see logparser.sketches), so no records are read and its size
+        does not depend on the number of lines.
+        - Counts of top clients and paths are at most their error above the
+        true count, distinct clients are estimated within about 1% (2% per
+        bucket) and size quantiles within 1%.
+        - The window only applies to the distinct clients, to the bucket
+        size; the other figures cover the whole logs.
+    """
+    dataset_ids = [d for d in request.args.get('datasets', '').split(',') if d] \
+        or [request.args.get('dataset')]
+    try:
+        top = int(request.args.get('top', 10))
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else None
+        if top < 1:
+            raise ValueError("top must be >= 1")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    sketches = None
+    for dataset_id in dataset_ids:
+        try:
+            access = open_store(dataset_id).access()
+        except FileNotFoundError:
+            return jsonify({"error": "Parsed log file not found"}), 404
+        if access is None:
+            return jsonify({'error': "Not an access log: no client addresses were parsed"}), 400
+        if sketches is None:
+            sketches = access
+        else:
+            sketches.merge(access)
+
+    summary = sketches.summary(top, start, end)
+    summary['distinct_clients_per_bucket'] = [
+        {'timestamp': np.datetime_as_string(np.datetime64(second, 's')), 'count': count}
+        for second, count in summary['distinct_clients_per_bucket']
+    ]
+    return jsonify(summary)
+
+
+@app.route('/chart', methods=['GET'])
+def get_chart():
+    """
+    Render the log level counts over time as a PNG image.
+
+    Endpoint: /chart
+    Method: GET
+
+    Parameters:
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - datasets (str): Optional comma-separated dataset ids to chart
+        together.
+        - start (str): Optional ISO 8601 start timestamp.
+        - end (str): Optional ISO 8601 end timestamp.
+        - level (str): Optional log level to keep.
+
+    Returns:
+        Response: The chart, the same as in the PDF report.
+
+    Responses:
+        - 200 OK: The chart.
+        - 400 Bad Request: If a timestamp is invalid.
+        - 404 Not Found: If a dataset does not exist.
+
+    Notes:
+        - Charts are cached by dataset version and filters, shared with the
+        PDF reports.
+    """
+    dataset_ids = [d for d in request.args.get('datasets', '').split(',') if d] \
+        or [request.args.get('dataset')]
+    try:
+        filters = window_filters(request.args)
+        versions = dataset_versions(dataset_ids)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+
+    def build():
+        selections, _ = open_selections([dataset_id for dataset_id, _ in versions], request.args)
+        return level_chart(selections)
+
+    response = make_response(result_cache.get_or_build('png', versions, build, **filters))
+    response.headers['Content-Type'] = 'image/png'
+    return response
+
+
+@app.route('/cache', methods=['GET'])
+def get_cache_stats():
+    """
+    Report the hit and miss counters and the size of the report cache.
+
+    Endpoint: /cache
+    Method: GET
+
+    Returns:
+        JSON: {"hits": int, "misses": int, "hit_ratio": float,
+        "evictions": int, "entries": int, "bytes": int, "max_bytes": int}
+
+    Notes:
+        - The counters are those of the backend process answering.
+    """
+    return jsonify(result_cache.stats())
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Report the metrics of the backend in the Prometheus text format.
+
+    Endpoint: /metrics
+    Method: GET
+
+    Returns:
+        text/plain: Every metric of the REGISTRY of logparser.metrics:
+        - logparser_*: lines, bytes, records and unmatched lines read by the
+        ingests, the lines and bytes per second of the last ingest, and the
+        seconds per ingest spent reading, parsing, converting timestamps,
+        waiting for parse workers, writing 'output.json' and the store,
+        closing the outputs and indexing the rows.
+        - report_stage_seconds: the seconds spent in every stage of the PDF
+        reports, and report_cache_*: the counters of the report cache.
+        - http_requests_total and http_request_seconds: the requests answered
+        by route, and their latency.
+
+    Notes:
+        - The metrics are those of the backend process answering.
+        - The latency of a streamed response only covers the time to its
+        first byte.
+        - With PROFILE_REQUESTS=1, adding ?profile=1 to any request answers
+        it with a sampling profile of the request instead.
+    """
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 @app.route('/generate_pdf', methods=['POST'])
 def generate_pdf():
@@ -192,106 +1321,70 @@ def generate_pdf():
     Parameters:
         - start_timestamp (str): Start timestamp for log filtering.
         - end_timestamp (str): End timestamp for log filtering.
+        - level (str): Optional log level to keep.
+        - dataset (str): Optional dataset id. Defaults to the latest parsed
+        dataset.
+        - datasets (list): Optional dataset ids to report on together, as
+        one timeline with a source column.
+        - max_rows (int): Optional maximum number of rows of the log table,
+        at most REPORT_MAX_ROWS (the default).
+        - sampling (str): 'head' (default) to show the first rows of the
+        window in the log table, or 'even' to sample rows evenly over it.
 
     Returns:
-        Response: A PDF file containing a line chart and a table containing
-        log data.
+        Response: A PDF file containing a chart of the log levels over time,
+        summary tables and a table of the log data.
 
     Responses:
         - 200 OK: Successful PDF generation.
         - 400 Bad Request: If required parameters are missing or invalid.
+        - 404 Not Found: If a dataset does not exist.
         - 500 Internal Server Error: If an unexpected server error occurs 
         during PDF generation.
 
     Notes:
         - Requires a JSON payload with start_timestamp and end_timestamp for
         log filtering.
-        - Retrieves log data from 'parsed_logs/output.json'.
-        - Generates a line chart and a table based on the filtered log data.
+        - Retrieves log data from the columnar store of the dataset named by
+        'dataset' in the payload, by default the latest parsed one.
+        - The report is built by backend.report, whose time and memory stay
+        bounded whatever the number of matching rows.
+        - Reports and their charts are cached by dataset version and
+        filters (see backend.cache), so asking again for the same report
+        only reads it back from the cache.
         - Returns a PDF file as an attachment named 'logs_report.pdf'.
     """
-    # Convert start and end timestamp to appropriate datetime object.
-    if request.json['start_timestamp'] == '' and request.json['end_timestamp'] == '':
-        start_timestamp = None
-        end_timestamp = None
-    elif request.json['start_timestamp'] != '' and request.json['end_timestamp'] == '':
-        start_timestamp = pd.to_datetime(request.json['start_timestamp'])
-        end_timestamp = None
-    elif request.json['start_timestamp'] == '' and request.json['end_timestamp'] != '':
-        start_timestamp = None
-        end_timestamp = pd.to_datetime(request.json['end_timestamp'])
-    else:
-        start_timestamp = pd.to_datetime(request.json['start_timestamp'])
-        end_timestamp = pd.to_datetime(request.json['end_timestamp'])
-
-    # Read the parsed json file and convert it to a dataframe
-    logs_df = pd.read_json('parsed_logs/output.json')
-    # Sort the dataframe entries in ascending order as per the timestamp column
-    logs_df.sort_values(by='timestamp', inplace=True)
-    # Convert the timestamp column in the dataframe to ISO 8601 format
-    logs_df['timestamp'] = pd.to_datetime(logs_df['timestamp'], format='ISO8601')
-    filtered_logs = logs_df
-
-    # Filter the logs based on the start and the end timestamps
-    if start_timestamp and end_timestamp:
-        filtered_logs = logs_df[(logs_df['timestamp'] >= start_timestamp) & (logs_df['timestamp'] <= end_timestamp)]
-    elif start_timestamp and not end_timestamp:
-        filtered_logs = logs_df[(logs_df['timestamp'] >= start_timestamp)]
-    elif not start_timestamp and end_timestamp:
-        filtered_logs = logs_df[(logs_df['timestamp'] <= end_timestamp)]
-
-    # Plot a line chart
-    line_chart_buffer = BytesIO()
-    plt.figure(figsize=(12, 9))
-    plt.plot(filtered_logs['timestamp'], filtered_logs['log_level'], marker='o')
-    plt.xlabel('Timestamp')
-    plt.ylabel('Log Level')
-    plt.title('Line Chart')
-    plt.xticks(rotation=45, ha='right')
-    plt.savefig(line_chart_buffer, format='png')
-    plt.close()
-
-    # Create a paragraph style for log messages so that they stay wrapped.
-    normal_style = ParagraphStyle(
-        'Normal',
-        fontName='Helvetica',
-        fontSize=8,
-        textColor=colors.black,
-        # Enable word wrapping for CJK languages (Chinese, Japanese, Korean)
-        wordWrap='CJK',
-    )
-    # Apply this paragraph style to all the log messages in the filtered dataframe
-    messages = [Paragraph(text, style=normal_style) for text in filtered_logs['message']]
-    # Arrange the table data from the filtered dataframe
-    table_data = [filtered_logs.columns] + list(
-        zip(filtered_logs['timestamp'], filtered_logs['log_level'], messages))
-
-    # Prepare a pdf with the line chart and the table created above.
-    pdf_buffer = BytesIO()
-    pdf = SimpleDocTemplate(pdf_buffer, pagesize=(800, 700))
-
-    pdf_buffer.seek(0)
-
-    col_widths = [150, 80, 300]
-    table = Table(table_data, colWidths=col_widths)
-    style = TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-    ])
-    table.setStyle(style)
-
-    dummy_space = Spacer(1, 20)
-
-    line_chart_buffer.seek(0)
-    line_chart_image = Image(line_chart_buffer, width=400, height=300)
-    pdf.build([line_chart_image, dummy_space, table])
-
-    pdf_bytes = pdf_buffer.getvalue()
+    payload = request.json
+    try:
+        window = {
+            'start': payload['start_timestamp'],
+            'end': payload['end_timestamp'],
+            'level': payload.get('level') or '',
+        }
+        max_rows = min(int(payload.get('max_rows') or REPORT_MAX_ROWS), REPORT_MAX_ROWS)
+        sampling = payload.get('sampling') or 'head'
+        if max_rows < 1 or sampling not in SAMPLING_MODES:
+            raise ValueError("max_rows must be >= 1 and sampling one of "
+                             + ', '.join(SAMPLING_MODES))
+        filters = window_filters(window)
+        versions = dataset_versions(payload.get('datasets') or [payload.get('dataset')])
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    except FileNotFoundError:
+        return jsonify({"error": "Parsed log file not found"}), 404
+
+    def build():
+        # Merge the time-sorted rows of every dataset into one timeline
+        selections, sources = open_selections([dataset_id for dataset_id, _ in versions], window)
+        title = 'Log report: ' + ', '.join(sources)
+        if window['start'] or window['end']:
+            title += f" from {window['start'] or 'the start'} to {window['end'] or 'the end'}"
+        chart = result_cache.get_or_build('png', versions, lambda: level_chart(selections),
+                                          **filters)
+        return build_report(selections, sources, title, max_rows, sampling, chart)
+
+    pdf_bytes = result_cache.get_or_build('pdf', versions, build, max_rows=max_rows,
+                                          sampling=sampling, **filters)
 
     response = make_response(pdf_bytes)
     response.headers['Content-Type'] = 'application/pdf'
@@ -0,0 +1,197 @@
+"""
+On-disk LRU cache of generated reports and charts.
+
+Rendering a chart or a PDF is by far the slowest thing the backend does for
+a read request, and dashboards ask for the same time window over and over.
+Results are therefore cached on disk, in the cache folder:
+
+    cache/<key>.<kind>    the bytes of the result ('pdf', 'png', ...)
+    cache/<key>.json      kind, size and the datasets it was built from
+
+The key hashes the kind of result, the id and version ('updated_at') of
+every dataset it reads, and the request filters. Re-ingesting a dataset
+gives it a new version, so older results can never be returned again; they
+are also dropped right away by invalidate(). Once the cache holds more than
+max_bytes, the least recently used entries are evicted.
+
+The cache survives restarts and is shared by the backend processes using
+the same folder. Each process keeps its own LRU order and hit/miss counters,
+so the size bound holds per process and entries removed by another process
+simply count as misses.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+META_EXTENSION = 'json'
+
+
+def cache_key(kind, versions, **params):
+    """
+    Return the cache key of a result.
+
+    Parameters:
+    - kind (str): The kind of result, also the extension of its file.
+    - versions (list): (dataset id, version) pairs of the datasets read.
+    - params: The filters the result was built with.
+
+    Returns:
+    str: A hex digest.
+    """
+    text = json.dumps([kind, versions, params], sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    LRU cache of result bytes in a folder, bounded in total size.
+
+    Parameters:
+    - folder (str): The cache folder, created when needed.
+    - max_bytes (int): The total size the entries are evicted down to.
+    """
+
+    def __init__(self, folder, max_bytes):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        # key -> (kind, size, dataset ids), least recently used first
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self._load()
+
+    def _path(self, key, extension):
+        return os.path.join(self.folder, f'{key}.{extension}')
+
+    def _load(self):
+        # Pick up the entries left by earlier runs, oldest used first
+        if not os.path.isdir(self.folder):
+            return
+        found = []
+        for name in os.listdir(self.folder):
+            key, _, extension = name.partition('.')
+            if extension != META_EXTENSION:
+                continue
+            meta = self._read_meta(key)
+            if meta:
+                found.append((os.path.getmtime(self._path(key, META_EXTENSION)), key, meta))
+        for _, key, meta in sorted(found):
+            self._add(key, meta)
+        self._evict()
+
+    def _read_meta(self, key):
+        try:
+            with open(self._path(key, META_EXTENSION), 'r') as meta_file:
+                meta = json.load(meta_file)
+            return meta if os.path.exists(self._path(key, meta['kind'])) else None
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _add(self, key, meta):
+        if key in self.entries:
+            self.size -= self.entries[key][1]
+        self.entries[key] = (meta['kind'], meta['size'], meta['datasets'])
+        self.entries.move_to_end(key)
+        self.size += meta['size']
+
+    def _remove(self, key):
+        kind, size, _ = self.entries.pop(key)
+        self.size -= size
+        for extension in (META_EXTENSION, kind):
+            try:
+                os.remove(self._path(key, extension))
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        while self.size > self.max_bytes and self.entries:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _write(self, path, data, mode):
+        # Readers never see a half written file
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, mode) as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    def get(self, key, kind):
+        """Return the cached bytes of a key, or None on a miss."""
+        with self.lock:
+            if key not in self.entries:
+                # Another process may have built it
+                meta = self._read_meta(key)
+                if meta:
+                    self._add(key, meta)
+            try:
+                with open(self._path(key, kind), 'rb') as file:
+                    data = file.read()
+            except FileNotFoundError:
+                if key in self.entries:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            # The meta file time is the last use, for the LRU order of restarts
+            os.utime(self._path(key, META_EXTENSION))
+            self.hits += 1
+            return data
+
+    def put(self, key, kind, data, dataset_ids):
+        """Store the bytes of a key, evicting old entries if needed."""
+        if len(data) > self.max_bytes:
+            return
+        meta = {'kind': kind, 'size': len(data), 'datasets': list(dataset_ids)}
+        with self.lock:
+            os.makedirs(self.folder, exist_ok=True)
+            self._write(self._path(key, kind), data, 'wb')
+            self._write(self._path(key, META_EXTENSION), json.dumps(meta), 'w')
+            self._add(key, meta)
+            self._evict()
+
+    def get_or_build(self, kind, versions, build, **params):
+        """
+        Return a cached result, building and caching it on a miss.
+
+        Parameters:
+        - kind (str): The kind of result, see cache_key.
+        - versions (list): (dataset id, version) pairs of the datasets read.
+        - build (callable): Returns the result bytes when not cached.
+        - params: The filters the result is built with.
+
+        Returns:
+        bytes: The result.
+        """
+        key = cache_key(kind, versions, **params)
+        data = self.get(key, kind)
+        if data is None:
+            data = build()
+            self.put(key, kind, data, [dataset_id for dataset_id, _ in versions])
+        return data
+
+    def invalidate(self, dataset_id):
+        """Drop every entry built from a dataset."""
+        with self.lock:
+            for key in [key for key, (_, _, datasets) in self.entries.items()
+                        if dataset_id in datasets]:
+                self._remove(key)
+
+    def stats(self):
+        """Return the counters and size of the cache."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+            }
@@ -0,0 +1,170 @@
+"""
+Per-upload datasets of parsed logs.
+
+Every ingested file gets its own dataset id and folder in the output folder:
+
+    parsed_logs/<dataset id>/output.json
+    parsed_logs/<dataset id>/store/          (see logparser.columnar)
+    parsed_logs/<dataset id>/dataset.json    id, filename, format, records
+
+A dataset is parsed into '<dataset id>.tmp' and renamed into place once
+it is complete, so readers never see a partial dataset and concurrent
+ingests never share a file. Re-parsing an existing dataset from the start
+works the same way, the finished folder then replaces the old one.
+
+Lines appended to a log are the exception (see logparser.incremental): they
+are added to the live dataset folder in place, which readers tolerate since
+a store only shows the rows its 'meta.json' counts. Such appends hold the
+'<dataset id>.lock' file of the dataset, so two of them never write the
+same files at once. An append that fails is rolled back by the writers, and
+one that was interrupted is cut back to the committed rows by the next one.
+
+The 'latest' file names the dataset completed last, which is read when a
+request does not name one. All of this state is on disk, so any number of
+backend processes can ingest and read at once.
+"""
+from contextlib import contextmanager
+import fcntl
+import json
+import os
+import shutil
+import time
+import uuid
+
+DATASET_FILE = 'dataset.json'
+LATEST_FILE = 'latest'
+LOCK_SUFFIX = '.lock'
+OLD_SUFFIX = '.old'
+TEMP_SUFFIX = '.tmp'
+
+
+def new_dataset_id():
+    return uuid.uuid4().hex
+
+
+def _write_atomic(path, text):
+    # Unique temporary name, so concurrent writers never share it
+    temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(temp_path, 'w') as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+def dataset_folder(output_folder, dataset_id=None):
+    """
+    Return the folder of a dataset, by default of the latest one.
+
+    Raises:
+    FileNotFoundError: If there is no such dataset.
+    """
+    if not dataset_id:
+        with open(os.path.join(output_folder, LATEST_FILE), 'r') as latest_file:
+            dataset_id = latest_file.read().strip()
+
+    # Dataset ids are hex uuids; anything else cannot name a dataset
+    folder = os.path.join(output_folder, dataset_id)
+    if not dataset_id.isalnum() or not os.path.isdir(folder):
+        raise FileNotFoundError(f"Unknown dataset '{dataset_id}'")
+    return folder
+
+
+def read_dataset(folder):
+    """Return the description saved in a dataset folder."""
+    with open(os.path.join(folder, DATASET_FILE), 'r') as dataset_file:
+        return json.load(dataset_file)
+
+
+@contextmanager
+def dataset_lock(output_folder, dataset_id):
+    """
+    Hold the lock of a dataset for the body of a with statement.
+
+    The lock is an exclusive flock of '<dataset id>.lock', so it serializes
+    the ingests of one dataset across threads and processes, and is
+    released when the process holding it dies.
+    """
+    lock_path = os.path.join(output_folder, dataset_id + LOCK_SUFFIX)
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ingest_folder(output_folder, dataset_id, in_place=False):
+    """
+    Return the folder to parse a dataset into.
+
+    That is the dataset folder itself when lines are appended to it in
+    place, otherwise a new temporary folder that publish_dataset renames.
+    Appending in place requires the lock of the dataset (see dataset_lock).
+    """
+    folder = os.path.join(output_folder, dataset_id)
+    if in_place:
+        return folder
+    temp_folder = folder + TEMP_SUFFIX
+    shutil.rmtree(temp_folder, ignore_errors=True)
+    os.makedirs(temp_folder)
+    return temp_folder
+
+
+def discard_ingest(folder):
+    """Remove the temporary folder of a dataset whose ingest failed."""
+    if folder.endswith(TEMP_SUFFIX):
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def publish_dataset(output_folder, dataset_id, folder, info):
+    """
+    Save the description of an ingested dataset and make it visible.
+
+    Parameters:
+    - output_folder (str): The folder holding all the datasets.
+    - dataset_id (str): The id of the dataset.
+    - folder (str): The folder returned by ingest_folder.
+    - info (dict): Description saved as 'dataset.json', with 'id' and
+    'updated_at' added.
+
+    Returns:
+    dict: The saved description.
+    """
+    info = dict(info, id=dataset_id, updated_at=time.time())
+    _write_atomic(os.path.join(folder, DATASET_FILE), json.dumps(info))
+    if folder.endswith(TEMP_SUFFIX):
+        # A dataset parsed again from the start replaces the old folder
+        live_folder = os.path.join(output_folder, dataset_id)
+        old_folder = live_folder + OLD_SUFFIX
+        shutil.rmtree(old_folder, ignore_errors=True)
+        if os.path.isdir(live_folder):
+            os.rename(live_folder, old_folder)
+        os.rename(folder, live_folder)
+        shutil.rmtree(old_folder, ignore_errors=True)
+    _write_atomic(os.path.join(output_folder, LATEST_FILE), dataset_id)
+    return info
+
+
+def list_datasets(output_folder):
+    """Return the descriptions of all datasets, the latest updated first."""
+    datasets = []
+    if not os.path.isdir(output_folder):
+        return datasets
+    for name in os.listdir(output_folder):
+        # Only dataset ids, not the temporary, old and lock files beside them
+        if not name.isalnum():
+            continue
+        try:
+            with open(os.path.join(output_folder, name, DATASET_FILE), 'r') as dataset_file:
+                datasets.append(json.load(dataset_file))
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+    datasets.sort(key=lambda dataset: dataset['updated_at'], reverse=True)
+    return datasets
+
+
+def find_dataset(output_folder, filename):
+    """Return the id of the latest dataset ingested from a file name, or None."""
+    for dataset in list_datasets(output_folder):
+        if dataset['filename'] == filename:
+            return dataset['id']
+    return None
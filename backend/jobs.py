@@ -0,0 +1,145 @@
+"""
+Background job queue for parsing uploaded log files.
+
+Jobs run on a thread pool inside the backend process, so no outside broker
+is needed. The state of every job is also saved as JSON in the jobs folder,
+which lets any backend worker process answer a status request.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Job:
+    """
+    State and progress of one parse job.
+
+    Attributes:
+    - id (str): The job id.
+    - state (str): One of QUEUED, RUNNING, DONE or FAILED.
+    - bytes_total (int): The size of the file being parsed.
+    - bytes_parsed (int): The number of bytes parsed so far.
+    - lines_parsed (int): The number of lines parsed so far.
+    """
+
+    def __init__(self, filename, bytes_total, jobs_folder):
+        self.id = uuid.uuid4().hex
+        self.filename = filename
+        self.state = QUEUED
+        self.error = None
+        self.result = None
+        self.bytes_total = bytes_total
+        self.bytes_parsed = 0
+        self.lines_parsed = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.path = os.path.join(jobs_folder, self.id + '.json')
+
+    def update_progress(self, bytes_parsed, lines_parsed):
+        """Progress callback handed to the parsers."""
+        self.bytes_parsed = bytes_parsed
+        self.lines_parsed = lines_parsed
+        self.save()
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'state': self.state,
+            'error': self.error,
+            'result': self.result,
+            'bytes_total': self.bytes_total,
+            'bytes_parsed': self.bytes_parsed,
+            'lines_parsed': self.lines_parsed,
+            'elapsed_seconds': round(elapsed, 3),
+            'bytes_per_second': round(self.bytes_parsed / elapsed) if elapsed else 0,
+            'lines_per_second': round(self.lines_parsed / elapsed) if elapsed else 0,
+        }
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as job_file:
+            json.dump(self.to_dict(), job_file)
+        os.replace(temp_path, self.path)
+
+
+class JobQueue:
+    """
+    Runs parse jobs on a pool of background threads.
+
+    Parameters:
+    - jobs_folder (str): The folder where the job states are saved.
+    - workers (int): The number of jobs run at the same time.
+    """
+
+    def __init__(self, jobs_folder, workers):
+        self.jobs_folder = jobs_folder
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='ingest')
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, filename, file_path, function, *args):
+        """
+        Queue a parse job.
+
+        The function is called as function(*args, progress=callback) and its
+        return value is saved as the job result.
+
+        Returns:
+        Job: The queued job.
+        """
+        os.makedirs(self.jobs_folder, exist_ok=True)
+        job = Job(filename, os.path.getsize(file_path), self.jobs_folder)
+        job.save()
+        with self.lock:
+            self.jobs[job.id] = job
+        self.executor.submit(self._run, job, function, args)
+        return job
+
+    def _run(self, job, function, args):
+        job.state = RUNNING
+        job.started_at = time.time()
+        job.save()
+        try:
+            job.result = function(*args, progress=job.update_progress)
+            job.state = DONE
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+            job.state = FAILED
+        job.finished_at = time.time()
+        job.save()
+        with self.lock:
+            # Finished jobs are answered from their saved state
+            self.jobs.pop(job.id, None)
+
+    def status(self, job_id):
+        """
+        Return the state of a job as a dict, or None if the job is unknown.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+        if job:
+            return job.to_dict()
+
+        # Only ids made of hex digits can name a job file
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.jobs_folder, job_id + '.json'), 'r') as job_file:
+                return json.load(job_file)
+        except FileNotFoundError:
+            return None
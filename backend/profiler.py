@@ -0,0 +1,80 @@
+"""
+Sampling profiler for a single request.
+
+A background thread looks at the stack of the profiled thread every
+interval seconds (with sys._current_frames) and counts how often every
+stack was seen. Sampling costs the profiled thread nothing but the GIL
+switches, so it can be used on a production backend, and it shows where
+the time of one slow request goes without a tracing profiler's overhead.
+
+The result is in the collapsed stack format flame graph tools read, one
+stack per line, outermost frame first, with its sample count:
+
+    generate_pdf (application.py:1095);build_report (report.py:255) 42
+"""
+from collections import Counter
+import os
+import sys
+import threading
+import time
+
+# Seconds between two samples of the profiled stack.
+DEFAULT_INTERVAL = 0.005
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread until it is stopped.
+
+    Parameters:
+    - thread_id (int): The id of the thread to sample, by default the one
+    creating the profiler.
+    - interval (float): The seconds between two samples.
+
+    Example:
+    >>> profiler = SamplingProfiler()
+    >>> profiler.start()
+    >>> ...
+    >>> print(profiler.stop().collapsed())
+    """
+
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.seconds = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+
+    def _sample(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self):
+        """Return the sampled stacks in the collapsed format, most seen first."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
@@ -0,0 +1,358 @@
+"""
+PDF reports of parsed logs whose cost does not grow with the input size.
+
+A report holds:
+
+    - a line chart of the level counts per time bucket, with at most
+      PLOT_MAX_BUCKETS points per level whatever the number of rows,
+    - summary tables: level counts per (coarser) bucket and the most
+      frequent messages,
+    - the log table itself, capped at max_rows rows (the first rows of the
+      window, or rows sampled evenly over it), messages truncated to
+      MESSAGE_MAX_CHARS, and split into page-sized tables.
+
+The counts are computed from the numpy columns of the stores in chunks of
+COUNT_CHUNK_ROWS rows, and only the rows shown in the table are decoded, so
+both time and memory stay bounded.
+
+The seconds spent counting, decoding the table rows, drawing the chart and
+laying the document out are observed in the histogram report_stage_seconds
+(see logparser.metrics).
+
+matplotlib and reportlab take most of the startup time and idle memory of
+a backend process, so they are only imported when the first chart or
+report is drawn (see pyplot and styles), or by load_libraries.
+"""
+import bisect
+from collections import Counter
+from functools import lru_cache
+from io import BytesIO
+from itertools import islice
+import math
+from types import SimpleNamespace
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from backend.timeline import decode_rows, merge_rows
+from logparser.columnar import MISSING_LEVEL
+from logparser.metrics import REGISTRY
+from logparser.timestamps import MISSING_EPOCH
+
+# Default maximum number of rows in the log table of a report.
+DEFAULT_MAX_ROWS = 5000
+# Messages longer than this are cut in the tables.
+MESSAGE_MAX_CHARS = 300
+# Number of log rows per table, about one page.
+TABLE_CHUNK_ROWS = 40
+# Maximum number of time buckets plotted per level.
+PLOT_MAX_BUCKETS = 200
+# Maximum number of rows of the level counts per bucket table.
+SUMMARY_MAX_BUCKETS = 24
+# Number of most frequent messages listed.
+TOP_MESSAGES = 20
+# Rows decoded at most to find the most frequent messages; above that the
+# counts are estimated from an even sample.
+TOP_MESSAGES_SAMPLE_ROWS = 50000
+# Rows counted at a time when bucketing.
+COUNT_CHUNK_ROWS = 1_000_000
+
+REPORT_SECONDS = REGISTRY.histogram(
+    'report_stage_seconds', 'Seconds spent in every stage of building a PDF report.',
+    ('stage',))
+
+# Bucket sizes to pick from, in seconds.
+BUCKET_LADDER = [1, 5, 10, 30, 60, 300, 600, 1800, 3600, 3 * 3600, 6 * 3600,
+                 12 * 3600, 86400, 7 * 86400, 30 * 86400]
+
+SAMPLING_MODES = ('head', 'even')
+
+
+@lru_cache(maxsize=None)
+def pyplot():
+    """Return matplotlib.pyplot, imported on first use with the Agg backend."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+@lru_cache(maxsize=None)
+def styles():
+    """
+    Return the reportlab styles of the reports, importing reportlab on first
+    use.
+
+    Returns:
+    SimpleNamespace: The table style, and the paragraph styles of the table
+    cells and of the titles.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.platypus import TableStyle
+
+    return SimpleNamespace(
+        table=TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ]),
+        # Paragraph style of the table cells, so that long messages stay wrapped.
+        cell=ParagraphStyle(
+            'Normal',
+            fontName='Helvetica',
+            fontSize=8,
+            textColor=colors.black,
+            # Enable word wrapping for CJK languages (Chinese, Japanese, Korean)
+            wordWrap='CJK',
+        ),
+        title=ParagraphStyle('Title', fontName='Helvetica-Bold', fontSize=14, leading=18),
+    )
+
+
+def load_libraries():
+    """Import matplotlib and reportlab now rather than on the first report."""
+    pyplot()
+    styles()
+
+
+def _first_timed(store, rows):
+    # Rows are in timestamp order with the rows without one first
+    return bisect.bisect_right(range(len(rows)), MISSING_EPOCH,
+                               key=lambda i: store.timestamps[rows[i]])
+
+
+def _time_span(selections):
+    first, last = None, None
+    for store, rows in selections:
+        start = _first_timed(store, rows)
+        if start < len(rows):
+            low = int(store.timestamps[rows[start]])
+            high = int(store.timestamps[rows[-1]])
+            first = low if first is None else min(first, low)
+            last = high if last is None else max(last, high)
+    return first, last
+
+
+def bucket_seconds(first, last, max_buckets=PLOT_MAX_BUCKETS):
+    """Pick the smallest bucket size giving at most max_buckets buckets."""
+    span = (last - first) // 1_000_000 + 1
+    for seconds in BUCKET_LADDER:
+        if span / seconds <= max_buckets:
+            return seconds
+    return math.ceil(span / max_buckets / 86400) * 86400
+
+
+def level_histogram(selections):
+    """
+    Count the selected rows per time bucket and log level.
+
+    Returns:
+    tuple: The bucket start times in epoch seconds, the bucket size in
+    seconds, the level names and an array of counts[bucket, level].
+    """
+    names = []
+    for store, _ in selections:
+        names += [name for name in store.log_levels if name not in names]
+
+    first, last = _time_span(selections)
+    if first is None:
+        return [], 0, names, np.zeros((0, len(names)), dtype=np.int64)
+
+    size = bucket_seconds(first, last)
+    origin = first // 1_000_000 // size * size
+    bucket_count = (last // 1_000_000 - origin) // size + 1
+    counts = np.zeros(bucket_count * len(names), dtype=np.int64)
+
+    for store, rows in selections:
+        # Store level codes -> positions in names, -1 for rows without one
+        level_map = np.full(MISSING_LEVEL + 1, -1, dtype=np.int64)
+        level_map[:len(store.log_levels)] = [names.index(name) for name in store.log_levels]
+        for start in range(0, len(rows), COUNT_CHUNK_ROWS):
+            chunk = rows[start:start + COUNT_CHUNK_ROWS]
+            timestamps = store.timestamps[chunk]
+            levels = level_map[store.level_codes[chunk]]
+            keep = (timestamps != MISSING_EPOCH) & (levels >= 0)
+            buckets = (timestamps[keep] // 1_000_000 - origin) // size
+            counts += np.bincount(buckets * len(names) + levels[keep],
+                                  minlength=len(counts))
+
+    starts = [origin + i * size for i in range(bucket_count)]
+    return starts, size, names, counts.reshape(bucket_count, len(names))
+
+
+def top_messages(selections, limit=TOP_MESSAGES, sample_rows=TOP_MESSAGES_SAMPLE_ROWS):
+    """
+    Find the most frequent messages of the selected rows.
+
+    Returns:
+    tuple: [(message, count), ...] and whether the counts are estimated
+    from a sample.
+    """
+    total = sum(len(rows) for _, rows in selections)
+    step = max(1, math.ceil(total / sample_rows))
+    counter = Counter()
+    for store, rows in selections:
+        counter.update(store.messages(rows[::step]))
+    return [(message, count * step) for message, count in counter.most_common(limit)], step > 1
+
+
+def pick_rows(selections, max_rows, sampling='head'):
+    """
+    Pick the rows shown in the log table, in timestamp order.
+
+    Parameters:
+    - selections (list): (store, rows) pairs, rows in timestamp order.
+    - max_rows (int): The maximum number of rows to pick.
+    - sampling (str): 'head' for the first rows, 'even' for rows spread
+    evenly over all the selected rows.
+
+    Returns:
+    list: (source, row) pairs.
+    """
+    total = sum(len(rows) for _, rows in selections)
+    step = max(1, math.ceil(total / max_rows)) if sampling == 'even' else 1
+    if len(selections) == 1:
+        rows = selections[0][1][::step][:max_rows]
+        return [(0, row) for row in rows.tolist()]
+    merged = islice(merge_rows(selections), 0, step * max_rows, step)
+    return [(source, row) for _, source, row in merged]
+
+
+def _shorten(message):
+    message = message or ''
+    if len(message) > MESSAGE_MAX_CHARS:
+        return message[:MESSAGE_MAX_CHARS] + '...'
+    return message
+
+
+def _cell(text):
+    from reportlab.platypus import Paragraph
+    return Paragraph(escape(_shorten(text)), style=styles().cell)
+
+
+def _chunked_tables(header, rows, col_widths):
+    from reportlab.platypus import Spacer, Table
+
+    # Many page-sized tables lay out far faster than one huge table
+    table_style = styles().table
+    tables = []
+    for start in range(0, len(rows), TABLE_CHUNK_ROWS):
+        table = Table([header] + rows[start:start + TABLE_CHUNK_ROWS],
+                      colWidths=col_widths, repeatRows=1)
+        table.setStyle(table_style)
+        tables += [table, Spacer(1, 10)]
+    if not tables:
+        table = Table([header], colWidths=col_widths)
+        table.setStyle(table_style)
+        tables.append(table)
+    return tables
+
+
+@REPORT_SECONDS.time(stage='chart')
+def _chart(starts, names, counts):
+    plt = pyplot()
+    chart_buffer = BytesIO()
+    plt.figure(figsize=(12, 9))
+    moments = np.array(starts, dtype='datetime64[s]')
+    for position, name in enumerate(names):
+        plt.plot(moments, counts[:, position], label=name)
+    plt.xlabel('Timestamp')
+    plt.ylabel('Log count')
+    plt.title('Log levels over time')
+    if names:
+        plt.legend()
+    plt.xticks(rotation=45, ha='right')
+    plt.savefig(chart_buffer, format='png')
+    plt.close()
+    return chart_buffer.getvalue()
+
+
+def level_chart(selections):
+    """Render the level counts over time of the selected rows as a PNG."""
+    starts, _, names, counts = level_histogram(selections)
+    return _chart(starts, names, counts)
+
+
+def _summary_rows(starts, size, names, counts):
+    # Merge adjacent plot buckets so the table has few rows
+    factor = max(1, math.ceil(len(starts) / SUMMARY_MAX_BUCKETS))
+    rows = []
+    for position in range(0, len(starts), factor):
+        moment = np.datetime_as_string(np.datetime64(starts[position], 's'))
+        totals = counts[position:position + factor].sum(axis=0).tolist()
+        rows.append([moment] + totals + [sum(totals)])
+    return rows, size * factor
+
+
+def build_report(selections, sources, title='Log report', max_rows=DEFAULT_MAX_ROWS,
+                 sampling='head', chart=None):
+    """
+    Build the PDF report of the selected rows of one or more stores.
+
+    Parameters:
+    - selections (list): (store, rows) pairs, rows in timestamp order.
+    - sources (list): The source name of every store, shown in a column of
+    the log table when there are several stores.
+    - title (str): The title of the report.
+    - max_rows (int): The maximum number of rows of the log table.
+    - sampling (str): How table rows are picked, see pick_rows.
+    - chart (bytes): The PNG of level_chart for these rows, if already
+    rendered.
+
+    Returns:
+    bytes: The PDF document.
+    """
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer
+
+    cell_style, title_style = styles().cell, styles().title
+    total = sum(len(rows) for _, rows in selections)
+    with REPORT_SECONDS.time(stage='counts'):
+        starts, size, names, counts = level_histogram(selections)
+        messages, estimated = top_messages(selections)
+    with REPORT_SECONDS.time(stage='rows'):
+        picked = pick_rows(selections, max_rows, sampling)
+        records = decode_rows(selections, sources, picked)
+    if chart is None:
+        chart = _chart(starts, names, counts)
+
+    story = [Paragraph(escape(title), title_style), Spacer(1, 10)]
+    shown = (f"all {total} rows" if len(records) == total
+             else f"{len(records)} of {total} rows "
+                  + ("(the first ones)" if sampling == 'head' else "(sampled evenly)"))
+    story += [Paragraph(f"Log table: {shown}.", cell_style), Spacer(1, 10)]
+    story += [Image(BytesIO(chart), width=400, height=300), Spacer(1, 20)]
+
+    summary, summary_size = _summary_rows(starts, size, names, counts)
+    story.append(Paragraph(f"Level counts per {summary_size} s", title_style))
+    story += _chunked_tables(['bucket'] + names + ['total'], summary,
+                             [150] + [min(80, 450 // max(len(names) + 1, 1))] * (len(names) + 1))
+
+    story.append(Paragraph("Most frequent messages"
+                           + (" (estimated from a sample)" if estimated else ""), title_style))
+    story += _chunked_tables(['message', 'count'],
+                             [[_cell(message), count] for message, count in messages],
+                             [450, 80])
+
+    story.append(Paragraph("Logs", title_style))
+    header = ['timestamp', 'log_level', 'message']
+    col_widths = [150, 80, 300]
+    if len(selections) > 1:
+        header.append('source')
+        col_widths.append(100)
+    rows = [
+        [record['timestamp'], record['log_level'], _cell(record['message'])]
+        + ([record['source']] if len(selections) > 1 else [])
+        for record in records
+    ]
+    story += _chunked_tables(header, rows, col_widths)
+
+    pdf_buffer = BytesIO()
+    with REPORT_SECONDS.time(stage='layout'):
+        SimpleDocTemplate(pdf_buffer, pagesize=(800, 700)).build(story)
+    return pdf_buffer.getvalue()
@@ -0,0 +1,140 @@
+"""
+Full-text search of the parsed messages with the inverted token index.
+
+See logparser.text_index for how the index is built and laid out. A query
+is a list of terms, all of which must match (see parse_query):
+
+    - a single word ('IOException') is looked up in the index and its
+      posting list is the answer,
+    - any other term, or a quoted phrase, matches the rows holding it as a
+      compound token ('10.251.42.84:50010') or holding all of its words and
+      the whole term in the message, which is checked on the rows of the
+      intersected posting lists only.
+
+Matching is case insensitive. Stores parsed before the index existed are
+searched by scanning their messages.
+"""
+import bisect
+from functools import reduce
+import os
+import re
+
+import numpy as np
+
+from logparser.text_index import INDEX_FOLDER, WORD_PATTERN
+
+QUERY_PATTERN = re.compile(r'"([^"]*)"|(\S+)')
+
+# Number of messages decoded at a time to check a phrase.
+VERIFY_CHUNK_ROWS = 10000
+
+
+class TokenIndex:
+    """
+    Memory-mapped inverted index of a store.
+
+    Parameters:
+    - index_folder (str): The 'index' folder of the store.
+    """
+
+    def __init__(self, index_folder):
+        def load(name, dtype):
+            path = os.path.join(index_folder, name)
+            if os.path.getsize(path) == 0:
+                return np.empty(0, dtype=dtype)
+            return np.memmap(path, dtype=dtype, mode='r')
+
+        self.terms = load('terms.bin', 'u1')
+        self.terms_offsets = load('terms.off', '<i8')
+        self.postings_offsets = load('postings.off', '<i8')
+        self.postings_data = load('postings.u4', '<u4')
+
+    def __len__(self):
+        return len(self.terms_offsets)
+
+    def _term(self, position):
+        start = int(self.terms_offsets[position - 1]) if position else 0
+        return bytes(self.terms[start:int(self.terms_offsets[position])])
+
+    def postings(self, token):
+        """Return the ascending row numbers holding a token."""
+        term = token.encode('utf-8')
+        position = bisect.bisect_left(range(len(self)), term, key=self._term)
+        if position == len(self) or self._term(position) != term:
+            return np.empty(0, dtype=np.int64)
+        start = int(self.postings_offsets[position - 1]) if position else 0
+        return self.postings_data[start:int(self.postings_offsets[position])].astype(np.int64)
+
+
+def load_index(store):
+    """Open the token index of a store, or return None if it has none."""
+    try:
+        return TokenIndex(os.path.join(store.store_folder, INDEX_FOLDER))
+    except FileNotFoundError:
+        return None
+
+
+def parse_query(query):
+    """
+    Split a query into its terms: quoted phrases and whitespace separated
+    words.
+    """
+    terms = []
+    for phrase, word in QUERY_PATTERN.findall(query):
+        term = (phrase or word).strip().lower()
+        if WORD_PATTERN.search(term):
+            terms.append(term)
+    return terms
+
+
+def _verify(store, rows, term):
+    # Keep the rows whose message holds the whole term
+    keep = []
+    for start in range(0, len(rows), VERIFY_CHUNK_ROWS):
+        chunk = rows[start:start + VERIFY_CHUNK_ROWS]
+        keep += [term in message.lower() for message in store.messages(chunk)]
+    return rows[np.array(keep, dtype=bool)] if keep else rows[:0]
+
+
+def _term_rows(store, index, term, within):
+    if index is None:
+        rows = np.arange(len(store), dtype=np.int64) if within is None else within
+        return _verify(store, rows, term)
+
+    words = set(WORD_PATTERN.findall(term))
+    if words == {term}:
+        rows = index.postings(term)
+        return rows if within is None else np.intersect1d(rows, within, assume_unique=True)
+
+    exact = index.postings(term)
+    # Intersect the shortest posting lists first
+    lists = sorted((index.postings(word) for word in words), key=len)
+    if within is not None:
+        lists.insert(0, within)
+        exact = np.intersect1d(exact, within, assume_unique=True)
+    candidates = reduce(lambda a, b: np.intersect1d(a, b, assume_unique=True), lists)
+    candidates = np.setdiff1d(candidates, exact, assume_unique=True)
+    return np.union1d(exact, _verify(store, candidates, term))
+
+
+def search_rows(store, terms):
+    """
+    Find the rows of a store whose message matches every query term.
+
+    Parameters:
+    - store (LogStore): The store to search.
+    - terms (list): The query terms, see parse_query.
+
+    Returns:
+    ndarray: The matching row numbers in ascending row order.
+    """
+    index = load_index(store)
+    rows = None
+    for term in terms:
+        rows = _term_rows(store, index, term, rows)
+        if len(rows) == 0:
+            break
+    if rows is None:
+        return np.arange(len(store), dtype=np.int64)
+    # The index can already hold rows being appended to the store
+    return rows[rows < len(store)]
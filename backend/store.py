@@ -0,0 +1,388 @@
+"""
+Read access to the columnar store written by the parsers.
+
+See logparser.columnar for the layout of the store folder.
+"""
+import json
+import os
+
+import numpy as np
+
+from logparser.columnar import MISSING_LEVEL, STORE_FOLDER
+from logparser.pipeline import SEPARATOR_CHARS
+from logparser.rollups import BUCKET_SIZES, ROLLUPS_FILE
+from logparser.sketches import ACCESS_FILE, AccessSketches
+from logparser.templates import TEMPLATES_FILE
+from logparser.timestamps import MISSING_EPOCH, to_epoch_us
+
+# The JSON output the records of a store are read from, beside the store folder.
+JSON_FILE = 'output.json'
+# Files of the time index kept beside the columns of a store.
+TIME_ORDER_FILE = 'time_order.i8'
+TIME_SORTED_FILE = 'time_sorted.i8'
+
+
+def level_matches(name, log_level):
+    """
+    Check a log level against a filter. The match is case insensitive and
+    'WARNING' also matches 'WARN'.
+    """
+    wanted = log_level.lower()
+    return name.lower() == wanted or (wanted == 'warning' and name.lower() == 'warn')
+
+
+def _load_column(store_folder, column, length):
+    # Columns can run past the rows of meta.json while rows are appended,
+    # so only the first `length` values are mapped
+    path = os.path.join(store_folder, column['file'])
+    if length == 0 or os.path.getsize(path) == 0:
+        return np.empty(0, dtype=column['dtype'])
+    return np.memmap(path, dtype=column['dtype'], mode='r')[:length]
+
+
+def _sort_by_time(timestamps):
+    order = np.argsort(timestamps, kind='stable')
+    return order, np.asarray(timestamps)[order]
+
+
+def build_time_index(store_folder):
+    """
+    Sort the rows of a store by timestamp once and persist the result.
+
+    Two int64 files are written beside the columns: the row numbers in
+    ascending timestamp order and the timestamps in that same order, which
+    is what range queries bisect.
+    """
+    store = LogStore(store_folder, load_index=False)
+    order, sorted_timestamps = _sort_by_time(store.timestamps)
+    for file_name, column in ((TIME_ORDER_FILE, order),
+                              (TIME_SORTED_FILE, sorted_timestamps)):
+        temp_path = os.path.join(store_folder, file_name + '.tmp')
+        column.astype('<i8').tofile(temp_path)
+        os.replace(temp_path, os.path.join(store_folder, file_name))
+
+
+def extend_time_index(store_folder, first_row):
+    """
+    Add the rows appended to a store from first_row on to its time index.
+
+    Appended logs are normally later than what is already indexed, and the
+    sorted new rows are then simply appended to the index files. Otherwise
+    the index is rebuilt with build_time_index.
+    """
+    store = LogStore(store_folder, load_index=False)
+    paths = [os.path.join(store_folder, file_name)
+             for file_name in (TIME_ORDER_FILE, TIME_SORTED_FILE)]
+    sizes = {os.path.getsize(path) if os.path.exists(path) else -1 for path in paths}
+    if sizes != {first_row * 8}:
+        build_time_index(store_folder)
+        return
+
+    order, sorted_timestamps = _sort_by_time(store.timestamps[first_row:])
+    if len(order) == 0:
+        return
+    if first_row:
+        last_indexed = np.memmap(paths[1], dtype='<i8', mode='r')[first_row - 1]
+        if sorted_timestamps[0] < last_indexed or sorted_timestamps[0] == MISSING_EPOCH:
+            build_time_index(store_folder)
+            return
+
+    for path, column in zip(paths, (order + first_row, sorted_timestamps)):
+        with open(path, 'ab') as index_file:
+            index_file.write(column.astype('<i8').tobytes())
+
+
+class LogStore:
+    """
+    Memory-mapped columns of a parsed log file.
+
+    Attributes:
+    - timestamps (ndarray): int64 microseconds since the epoch.
+    - level_codes (ndarray): uint8 codes into `log_levels`.
+    - log_levels (list): The distinct log levels of the file.
+    - template_ids (ndarray): uint32 message template ids, or None for a
+    store written before templates were mined.
+    - record_offsets (ndarray): int64 end offsets of the records in the
+    'output.json' beside the store, or None for a store written before
+    they were kept.
+    - time_order (ndarray): The row numbers sorted by timestamp.
+    - sorted_timestamps (ndarray): The timestamps in `time_order` order.
+
+    The time index is read from the store folder when it has been built at
+    ingest, otherwise it is computed in memory.
+    """
+
+    def __init__(self, store_folder, load_index=True):
+        with open(os.path.join(store_folder, 'meta.json'), 'r') as meta_file:
+            meta = json.load(meta_file)
+
+        columns = meta['columns']
+        self.store_folder = store_folder
+        self.rows = meta['rows']
+        self.log_levels = meta['log_levels']
+        self.timestamps = _load_column(store_folder, columns['timestamp'], self.rows)
+        self.level_codes = _load_column(store_folder, columns['log_level'], self.rows)
+        self.message_offsets = _load_column(store_folder, columns['message_offsets'], self.rows)
+        message_bytes = int(self.message_offsets[-1]) if self.rows else 0
+        self.message_data = _load_column(store_folder, columns['message_data'], message_bytes)
+        self.template_ids = None
+        if 'template' in columns:
+            self.template_ids = _load_column(store_folder, columns['template'], self.rows)
+        self.record_offsets = self.json_data = None
+        if 'record_offsets' in columns:
+            self.record_offsets = _load_column(store_folder, columns['record_offsets'], self.rows)
+            json_bytes = int(self.record_offsets[-1]) if self.rows else 0
+            self.json_data = _load_column(
+                os.path.dirname(os.path.normpath(store_folder)),
+                {'file': JSON_FILE, 'dtype': 'u1'}, json_bytes)
+
+        if load_index:
+            self._load_time_index(store_folder)
+
+    def _load_time_index(self, store_folder):
+        index_column = {'dtype': '<i8'}
+        try:
+            self.time_order = _load_column(
+                store_folder, dict(index_column, file=TIME_ORDER_FILE), self.rows)
+            self.sorted_timestamps = _load_column(
+                store_folder, dict(index_column, file=TIME_SORTED_FILE), self.rows)
+        except FileNotFoundError:
+            self.time_order = None
+        # An index that is missing, or not extended yet to appended rows, is
+        # computed in memory
+        if self.time_order is None or len(self.time_order) != self.rows:
+            self.time_order, self.sorted_timestamps = _sort_by_time(self.timestamps)
+
+    def __len__(self):
+        return self.rows
+
+    def time_range(self, start=None, end=None):
+        """
+        Find the rows with start <= timestamp <= end by bisecting the index.
+
+        Parameters:
+        - start (int): Start of the range in epoch microseconds, or None.
+        - end (int): End of the range in epoch microseconds, or None.
+
+        Returns:
+        ndarray: The matching row numbers in ascending timestamp order.
+        Rows without a timestamp are only included when neither bound is set.
+        """
+        low, high = 0, self.rows
+        if start is not None:
+            low = np.searchsorted(self.sorted_timestamps, start, side='left')
+        elif end is not None:
+            low = np.searchsorted(self.sorted_timestamps, MISSING_EPOCH, side='right')
+        if end is not None:
+            high = np.searchsorted(self.sorted_timestamps, end, side='right')
+        return self.time_order[low:max(low, high)]
+
+    def filter_time(self, rows, start=None, end=None):
+        """
+        Keep the row numbers with start <= timestamp <= end, with the same
+        bounds as time_range, for rows not taken from the time index.
+        """
+        if start is None and end is None:
+            return rows
+        timestamps = self.timestamps[rows]
+        keep = timestamps != MISSING_EPOCH
+        if start is not None:
+            keep &= timestamps >= start
+        if end is not None:
+            keep &= timestamps <= end
+        return rows[keep]
+
+    def level_codes_matching(self, log_level):
+        """Return the level codes matching a log level filter."""
+        return [
+            code for code, name in enumerate(self.log_levels)
+            if level_matches(name, log_level)
+        ]
+
+    def filter_level(self, rows, log_level):
+        """Keep the row numbers whose log level matches the filter."""
+        codes = self.level_codes_matching(log_level)
+        return rows[np.isin(self.level_codes[rows], codes)]
+
+    def rollups(self):
+        """Return the level counts saved at ingest (see logparser.rollups)."""
+        with open(os.path.join(self.store_folder, ROLLUPS_FILE), 'r') as rollups_file:
+            return json.load(rollups_file)
+
+    def histogram(self, bucket, start=None, end=None, max_buckets=None):
+        """
+        Return the level histogram saved at ingest for a bucket size.
+
+        Only the buckets overlapping the time window are read from the
+        memory-mapped histogram file, found by bisecting their start times.
+
+        Parameters:
+        - bucket (str): One of BUCKET_SIZES.
+        - start (int): Optional window start in microseconds since the epoch.
+        - end (int): Optional window end in microseconds since the epoch.
+        - max_buckets (int): Optional maximum number of buckets returned.
+        When the window spans more, consecutive buckets are summed into
+        buckets a whole number of times larger.
+
+        Returns:
+        tuple: The bucket start times in epoch seconds, the bucket size in
+        seconds, the level names and an array of counts[bucket, level], or
+        None if the histogram was not kept for this bucket size.
+        """
+        rollups = self.rollups()
+        size = BUCKET_SIZES[bucket]
+        if 'buckets' in rollups:
+            # Saved before the histograms had files of their own
+            buckets = rollups['buckets'][bucket]
+            if buckets is None:
+                return None
+            names = sorted({name for _, counts in buckets for name in counts})
+            rows = np.array([(second, names.index(name), count)
+                             for second, counts in buckets for name, count in counts.items()],
+                            dtype=np.int64).reshape(-1, 3)
+        else:
+            file_name = rollups['histograms'][bucket]
+            if file_name is None:
+                return None
+            names = rollups['histogram_levels']
+            path = os.path.join(self.store_folder, file_name)
+            if os.path.getsize(path) == 0:
+                rows = np.empty((0, 3), dtype=np.int64)
+            else:
+                rows = np.memmap(path, dtype='<i8', mode='r').reshape(-1, 3)
+
+        seconds = rows[:, 0]
+        first = 0 if start is None else np.searchsorted(
+            seconds, (start - size * 1_000_000) // 1_000_000 + 1, 'left')
+        last = len(rows) if end is None else np.searchsorted(
+            seconds, end // 1_000_000, 'right')
+        rows = np.asarray(rows[first:last])
+        # Levels added by an append saving alongside are not named yet
+        rows = rows[rows[:, 1] < len(names)]
+
+        starts, buckets = np.unique(rows[:, 0], return_inverse=True)
+        counts = np.zeros((len(starts), len(names)), dtype=np.int64)
+        np.add.at(counts, (buckets.ravel(), rows[:, 1]), rows[:, 2])
+
+        def bucket_count(size):
+            return int(starts[-1] // size - starts[0] // size) + 1 if len(starts) else 0
+
+        if max_buckets and bucket_count(size) > max_buckets:
+            wide = size * -(-bucket_count(size) // max_buckets)
+            # Buckets are aligned to multiples of their size, which can
+            # take one more
+            while bucket_count(wide) > max_buckets:
+                wide += size
+            size = wide
+            groups = starts // size * size
+            firsts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+            starts = groups[firsts]
+            counts = np.add.reduceat(counts, firsts, axis=0)
+        return starts, size, names, counts
+
+    def access(self):
+        """
+        Return the access log sketches saved at ingest, or None if the log
+        has no client addresses.
+        """
+        try:
+            with open(os.path.join(self.store_folder, ACCESS_FILE), 'r') as access_file:
+                return AccessSketches.from_dict(json.load(access_file))
+        except FileNotFoundError:
+            return None
+
+    def templates(self):
+        """Return the message templates mined at ingest, indexed by id."""
+        if self.template_ids is None:
+            return []
+        with open(os.path.join(self.store_folder, TEMPLATES_FILE), 'r') as templates_file:
+            return json.load(templates_file)['templates']
+
+    def messages(self, rows):
+        """Decode the messages of the given row numbers."""
+        ends = self.message_offsets[rows]
+        starts = np.where(rows > 0, self.message_offsets[np.maximum(rows - 1, 0)], 0)
+        data = self.message_data
+        return [
+            bytes(data[start:end]).decode('utf-8', 'surrogatepass')
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+
+    def levels(self, rows):
+        """Return the log levels of the given row numbers (None if missing)."""
+        names = self.log_levels + [None] * (MISSING_LEVEL + 1 - len(self.log_levels))
+        return [names[code] for code in self.level_codes[rows].tolist()]
+
+    def iso_timestamps(self, rows):
+        """Format the timestamps of the given row numbers as ISO 8601 strings."""
+        moments = self.timestamps[rows].astype('datetime64[us]')
+        # Drop an all-zero fraction like datetime.isoformat() does
+        return [
+            None if text == 'NaT' else text[:-7] if text.endswith('.000000') else text
+            for text in np.datetime_as_string(moments).tolist()
+        ]
+
+    def records(self, rows):
+        """
+        Return the records of the given row numbers exactly as the parser
+        produced them, with every field and the original timestamp text.
+
+        The records are decoded from 'output.json', only the requested ones.
+        Stores written without record offsets give timestamp/log_level/message
+        dicts rebuilt from the columns instead.
+        """
+        if self.record_offsets is None:
+            return self._column_records(rows)
+        ends = self.record_offsets[rows]
+        starts = np.where(rows > 0, self.record_offsets[np.maximum(rows - 1, 0)], 0)
+        data = self.json_data
+        return [
+            json.loads(bytes(data[start + SEPARATOR_CHARS:end]))
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+
+    def _column_records(self, rows):
+        return [
+            {'timestamp': timestamp, 'log_level': log_level, 'message': message}
+            for timestamp, log_level, message in zip(
+                self.iso_timestamps(rows), self.levels(rows), self.messages(rows))
+        ]
+
+    def to_frame(self, rows):
+        """
+        Build a pandas DataFrame with the timestamp, log_level and message
+        columns of the given row numbers.
+        """
+        import pandas as pd
+
+        codes = self.level_codes[rows].astype(np.int16)
+        codes[codes == MISSING_LEVEL] = -1
+        return pd.DataFrame({
+            'timestamp': self.timestamps[rows].astype('datetime64[us]'),
+            'log_level': pd.Categorical.from_codes(codes, self.log_levels),
+            'message': self.messages(rows),
+        })
+
+
+def load_store(output_folder):
+    """
+    Open the columnar store of the parsed logs in the output folder.
+
+    Raises:
+    FileNotFoundError: If no log file has been parsed yet.
+    """
+    return LogStore(os.path.join(output_folder, STORE_FOLDER))
+
+
+def parse_timestamp(timestamp):
+    """
+    Convert a timestamp received in a request to microseconds since the
+    epoch, the unit of the timestamp column. Naive timestamps are UTC.
+
+    Raises:
+    ValueError: If the value is not an ISO 8601 timestamp.
+    """
+    epoch = to_epoch_us(timestamp)
+    if epoch == MISSING_EPOCH:
+        raise ValueError(f"Invalid timestamp: {timestamp}")
+    return epoch
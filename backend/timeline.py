@@ -0,0 +1,90 @@
+"""
+Single time-ordered view over several datasets.
+
+The time index of every store already lists its rows in timestamp order,
+so the merged timeline is a heap-based k-way merge of those row orders
+(heapq.merge). It streams in O(n log k) for k datasets and never
+concatenates or re-sorts the records.
+"""
+from collections import defaultdict
+import heapq
+from itertools import islice
+
+import numpy as np
+
+# Number of rows read from a store, and merged records built, at a time.
+MERGE_BLOCK_ROWS = 10000
+
+
+def _timed_rows(source, store, rows):
+    # (timestamp, source, row) for rows already in ascending timestamp order
+    for start in range(0, len(rows), MERGE_BLOCK_ROWS):
+        block = rows[start:start + MERGE_BLOCK_ROWS]
+        for timestamp, row in zip(store.timestamps[block].tolist(), block.tolist()):
+            yield timestamp, source, row
+
+
+def merge_rows(selections):
+    """
+    Merge the selected rows of several stores into one timestamp order.
+
+    Parameters:
+    - selections (list): (store, rows) pairs, rows being row numbers in
+    ascending timestamp order as returned by LogStore.time_range.
+
+    Returns:
+    iterator: (timestamp, source, row) tuples in ascending timestamp order,
+    source being the index of the store in selections. Equal timestamps
+    keep the order of the selections.
+    """
+    return heapq.merge(*(
+        _timed_rows(source, store, rows)
+        for source, (store, rows) in enumerate(selections)
+    ))
+
+
+def decode_rows(selections, sources, picked):
+    """
+    Build the records of (source, row) pairs picked from several stores.
+
+    The rows of each store are decoded in one go and interleaved back, and
+    every record is tagged with the 'source' of its store.
+
+    Returns:
+    list: Record dicts in the order of picked.
+    """
+    rows_by_source = defaultdict(list)
+    for source, row in picked:
+        rows_by_source[source].append(row)
+    records = {
+        source: iter(selections[source][0].records(np.array(rows, dtype=np.int64)))
+        for source, rows in rows_by_source.items()
+    }
+
+    decoded = []
+    for source, _ in picked:
+        record = next(records[source])
+        record['source'] = sources[source]
+        decoded.append(record)
+    return decoded
+
+
+def merged_batches(selections, sources, batch_rows=MERGE_BLOCK_ROWS):
+    """
+    Yield the merged records of several stores in batches.
+
+    Parameters:
+    - selections (list): (store, rows) pairs, see merge_rows.
+    - sources (list): The source tag of every store in selections.
+    - batch_rows (int): The number of records per batch.
+
+    Yields:
+    list: Record dicts tagged with their source, in ascending timestamp
+    order.
+    """
+    merged = merge_rows(selections)
+    while True:
+        block = [(source, row) for _, source, row in islice(merged, batch_rows)]
+        if not block:
+            return
+        yield decode_rows(selections, sources, block)
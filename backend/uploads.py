@@ -0,0 +1,220 @@
+"""
+Streaming and resumable storage of uploaded log files.
+
+Request bodies are copied to disk in fixed-size chunks, so an upload is
+never held in memory whatever its size. Large files can also be sent with
+a resumable protocol:
+
+    create_upload    -> upload id
+    append_chunk     (repeated, each chunk at the current offset)
+    complete_upload  -> path of the finished file
+
+The partial file and its metadata live in the '.partial' folder of the
+uploads folder until the upload is completed. Every finished upload is
+stored as '<upload id>/<filename>', so uploads of files with the same name
+never replace each other before they are parsed.
+"""
+import json
+import os
+import shutil
+import uuid
+import zlib
+
+from werkzeug.utils import secure_filename
+
+# Size of the chunks copied from a request stream to disk.
+COPY_CHUNK_SIZE = 1024 * 1024
+
+PARTIAL_FOLDER = '.partial'
+
+
+class UploadError(Exception):
+    """Raised when an upload request is not valid."""
+
+
+class UploadTooLarge(UploadError):
+    """Raised when a compressed upload expands past the size limit."""
+
+
+def safe_filename(filename):
+    """
+    Return a filename that is safe to store in the uploads folder.
+
+    Raises:
+    UploadError: If nothing usable is left of the filename.
+    """
+    name = secure_filename(filename or '')
+    if not name:
+        raise UploadError('Invalid file name')
+    return name
+
+
+def _inflate(decompressor, data):
+    # Decompress at most COPY_CHUNK_SIZE bytes at a time, so a small chunk
+    # of a highly compressed body never expands all at once in memory
+    while data:
+        yield decompressor.decompress(data, COPY_CHUNK_SIZE)
+        data = decompressor.unconsumed_tail
+
+
+def copy_stream(stream, file, gzipped=False, max_size=None):
+    """
+    Copy a request stream to an open binary file in chunks.
+
+    Parameters:
+    - stream: The readable request stream.
+    - file: The binary file to write to.
+    - gzipped (bool): Whether the stream is gzip encoded. It is then
+    decompressed on the fly.
+    - max_size (int): The maximum number of bytes to write, if any.
+
+    Returns:
+    int: The number of bytes written.
+
+    Raises:
+    UploadError: If the gzip stream is not valid.
+    UploadTooLarge: If more than max_size bytes would be written.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    written = 0
+    try:
+        while True:
+            data = stream.read(COPY_CHUNK_SIZE)
+            if not data:
+                break
+            for chunk in (_inflate(decompressor, data) if decompressor else [data]):
+                written += len(chunk)
+                if max_size is not None and written > max_size:
+                    raise UploadTooLarge(f'Upload is larger than {max_size} bytes')
+                file.write(chunk)
+        if decompressor:
+            tail = decompressor.flush()
+            written += len(tail)
+            if max_size is not None and written > max_size:
+                raise UploadTooLarge(f'Upload is larger than {max_size} bytes')
+            file.write(tail)
+    except zlib.error as e:
+        raise UploadError(f'Invalid gzip body: {e}')
+    return written
+
+
+def _upload_path(upload_folder, upload_id, filename):
+    # The folder of the upload holds the file under its original name
+    os.makedirs(os.path.join(upload_folder, upload_id), exist_ok=True)
+    return os.path.join(upload_folder, upload_id, filename)
+
+
+def save_stream(stream, upload_folder, filename, gzipped=False, max_size=None):
+    """
+    Save a whole request stream as a file of the uploads folder.
+
+    Parameters:
+    - max_size (int): The maximum size of the saved file, see copy_stream.
+
+    Returns:
+    str: The path of the saved file.
+
+    Raises:
+    UploadError: If the body is not valid or too large; nothing is kept.
+    """
+    file_path = _upload_path(upload_folder, uuid.uuid4().hex, safe_filename(filename))
+    temp_path = file_path + '.part'
+    try:
+        with open(temp_path, 'wb') as file:
+            copy_stream(stream, file, gzipped, max_size)
+    except BaseException:
+        shutil.rmtree(os.path.dirname(file_path), ignore_errors=True)
+        raise
+    os.replace(temp_path, file_path)
+    return file_path
+
+
+def _partial_paths(upload_folder, upload_id):
+    # Upload ids are hex uuids; anything else cannot name a partial upload
+    if not upload_id.isalnum():
+        raise UploadError('Unknown upload')
+    folder = os.path.join(upload_folder, PARTIAL_FOLDER)
+    return (os.path.join(folder, upload_id + '.data'),
+            os.path.join(folder, upload_id + '.json'))
+
+
+def create_upload(upload_folder, filename):
+    """
+    Start a resumable upload.
+
+    Returns:
+    str: The id of the new upload.
+    """
+    filename = safe_filename(filename)
+    upload_id = uuid.uuid4().hex
+    os.makedirs(os.path.join(upload_folder, PARTIAL_FOLDER), exist_ok=True)
+    data_path, meta_path = _partial_paths(upload_folder, upload_id)
+    open(data_path, 'wb').close()
+    with open(meta_path, 'w') as meta_file:
+        json.dump({'filename': filename}, meta_file)
+    return upload_id
+
+
+def upload_status(upload_folder, upload_id):
+    """
+    Return the filename and the number of bytes received of an upload.
+
+    Raises:
+    UploadError: If the upload does not exist.
+    """
+    data_path, meta_path = _partial_paths(upload_folder, upload_id)
+    try:
+        with open(meta_path, 'r') as meta_file:
+            meta = json.load(meta_file)
+        received = os.path.getsize(data_path)
+    except FileNotFoundError:
+        raise UploadError('Unknown upload')
+    return {'upload_id': upload_id, 'filename': meta['filename'], 'received': received}
+
+
+def append_chunk(upload_folder, upload_id, offset, stream, gzipped=False, max_size=None):
+    """
+    Append a chunk to a resumable upload.
+
+    The offset has to match the number of bytes received so far, so a client
+    that lost a response can ask for the status and resume from there.
+
+    Parameters:
+    - max_size (int): The maximum size of the chunk once decompressed, see
+    copy_stream.
+
+    Returns:
+    int: The number of bytes received after this chunk.
+
+    Raises:
+    UploadError: If the upload does not exist, the offset is wrong or the
+    chunk is not valid or too large. A rejected chunk is not kept, so the
+    upload can resume from the same offset.
+    """
+    status = upload_status(upload_folder, upload_id)
+    if offset != status['received']:
+        raise UploadError(f"Expected offset {status['received']}, got {offset}")
+
+    data_path, _ = _partial_paths(upload_folder, upload_id)
+    with open(data_path, 'ab') as file:
+        try:
+            copy_stream(stream, file, gzipped, max_size)
+        except BaseException:
+            file.truncate(offset)
+            raise
+    return os.path.getsize(data_path)
+
+
+def complete_upload(upload_folder, upload_id):
+    """
+    Finish a resumable upload and move it into the uploads folder.
+
+    Returns:
+    tuple: The filename and the path of the finished file.
+    """
+    status = upload_status(upload_folder, upload_id)
+    data_path, meta_path = _partial_paths(upload_folder, upload_id)
+    file_path = _upload_path(upload_folder, upload_id, status['filename'])
+    shutil.move(data_path, file_path)
+    os.remove(meta_path)
+    return status['filename'], file_path
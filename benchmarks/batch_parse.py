@@ -0,0 +1,105 @@
+"""
+Benchmark block parsing of the line formats against their per-line parsers.
+
+Usage (from the repository root):
+    python -m benchmarks.batch_parse --lines 1000000
+
+A synthetic log of every line format is parsed line by line (read_lines
+and the per-line parser) and block by block (read_blocks and parse_blocks,
+which use the format's batch parser). Only reading and parsing is timed,
+not writing the outputs, and the records of both are checked to be equal.
+Records are dropped as they are produced, as the pipeline writes them out.
+
+With --trace-every N a two-line stack trace, which the formats do not
+match, follows every N lines, as in real Java logs: the blocks then parse
+the lines the batch parser matches in one scan and only the stack trace
+lines one at a time.
+
+    python -m benchmarks.batch_parse --lines 1000000 --trace-every 2000
+"""
+import argparse
+from itertools import zip_longest
+import os
+import tempfile
+import time
+
+from benchmarks.generators import (
+    write_clf_log, write_hadoop_log, write_hdfs_log, write_zookeeper_log
+)
+from benchmarks.parallel_check import quiet
+from logparser.clf_parser import parse_clf_log
+from logparser.hadoop_parser import parse_hadoop_log
+from logparser.hdfs_parser import parse_hdfs_log
+from logparser.pipeline import parse_blocks, read_blocks, read_lines
+from logparser.zookeeper_parser import parse_zookeeper_log
+
+
+FORMATS = [
+    ('hdfs', write_hdfs_log, parse_hdfs_log),
+    ('clf', write_clf_log, parse_clf_log),
+    ('hadoop', write_hadoop_log, parse_hadoop_log),
+    ('zookeeper', write_zookeeper_log, parse_zookeeper_log),
+]
+
+STACK_TRACE = (b'java.io.IOException: Connection reset by peer\n'
+               b'\tat org.apache.hadoop.ipc.Client$Connection.run(Client.java:1042)\n')
+
+
+def add_stack_traces(path, every):
+    """Insert STACK_TRACE after every `every` lines of a log."""
+    with open(path, 'rb') as file:
+        lines = file.readlines()
+    with open(path, 'wb') as file:
+        for number, line in enumerate(lines, 1):
+            file.write(line)
+            if number % every == 0:
+                file.write(STACK_TRACE)
+
+
+def per_line(log_path, parse_entry):
+    return (record for record in map(parse_entry, read_lines(log_path)) if record)
+
+
+def by_blocks(log_path, parse_entry):
+    return parse_blocks(read_blocks(log_path), parse_entry)
+
+
+def timed(records):
+    started = time.perf_counter()
+    for _ in records:
+        pass
+    return time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--lines', type=int, default=1_000_000)
+    arg_parser.add_argument('--trace-every', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, write_log, parse_entry in FORMATS:
+            log_path = os.path.join(temp_dir, f'{name}.log')
+            write_log(log_path, args.lines)
+            if args.trace_every:
+                add_stack_traces(log_path, args.trace_every)
+            size_mb = os.path.getsize(log_path) / 1024 / 1024
+
+            # The parsers print the lines they do not match
+            with quiet():
+                line_seconds = timed(per_line(log_path, parse_entry))
+                block_seconds = timed(by_blocks(log_path, parse_entry))
+                identical = all(a == b for a, b in zip_longest(per_line(log_path, parse_entry),
+                                                               by_blocks(log_path, parse_entry)))
+
+            print(f"{name}: {args.lines} lines, {size_mb:.1f} MB")
+            for label, seconds in (('per line', line_seconds), ('blocks', block_seconds)):
+                print(f"  {label:<9} {seconds:7.2f}s "
+                      f"{args.lines / seconds / 1000:8.0f}k lines/s "
+                      f"{size_mb / seconds:7.1f} MB/s")
+            print(f"  speedup {line_seconds / block_seconds:.2f}x, "
+                  f"identical={identical}")
+
+
+if __name__ == '__main__':
+    main()
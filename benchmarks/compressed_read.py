@@ -0,0 +1,81 @@
+"""
+Benchmark reading and parsing compressed HDFS logs against plain text.
+
+Usage (from the repository root):
+    python -m benchmarks.compressed_read --lines 500000
+
+A synthetic HDFS log is generated once and compressed with every supported
+codec (zstd only when a zstd module is installed). For every variant the
+benchmark times a plain line read and a full parse, and checks that the
+parsed output is identical to the output of the plain text file.
+"""
+import argparse
+import bz2
+import filecmp
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.generators import write_hdfs_log
+from logparser.hdfs_parser import parse_hdfs_log
+from logparser.pipeline import read_lines, run_pipeline
+from logparser.sources import zstandard, zstd
+
+CODECS = {
+    'gz': lambda path: gzip.open(path, 'wb', compresslevel=6),
+    'bz2': lambda path: bz2.open(path, 'wb'),
+    'xz': lambda path: lzma.open(path, 'wb', preset=1),
+}
+if zstd is not None:
+    CODECS['zst'] = lambda path: zstd.open(path, 'wb')
+elif zstandard is not None:
+    CODECS['zst'] = lambda path: zstandard.open(path, 'wb')
+
+
+def compress(source_path, codec):
+    target_path = f'{source_path}.{codec}'
+    with open(source_path, 'rb') as source, CODECS[codec](target_path) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    return target_path
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--lines', type=int, default=500_000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        plain_path = os.path.join(temp_dir, 'hdfs.log')
+        write_hdfs_log(plain_path, args.lines)
+        plain_mb = os.path.getsize(plain_path) / 1024 / 1024
+        print(f"{args.lines} lines, {plain_mb:.1f} MB uncompressed")
+
+        variants = [('plain', plain_path)]
+        variants += [(codec, compress(plain_path, codec)) for codec in CODECS]
+
+        for name, path in variants:
+            started = time.perf_counter()
+            for _ in read_lines(path):
+                pass
+            read_seconds = time.perf_counter() - started
+
+            output_folder = os.path.join(temp_dir, f'out-{name}')
+            os.makedirs(output_folder)
+            started = time.perf_counter()
+            run_pipeline(path, output_folder, parse_hdfs_log)
+            parse_seconds = time.perf_counter() - started
+
+            same = filecmp.cmp(os.path.join(temp_dir, 'out-plain', 'output.json'),
+                               os.path.join(output_folder, 'output.json'),
+                               shallow=False)
+            print(f"{name:<6} {os.path.getsize(path) / 1024 / 1024:8.1f} MB "
+                  f"read {plain_mb / read_seconds:8.1f} MB/s "
+                  f"parse {args.lines / parse_seconds:10,.0f} lines/s "
+                  f"identical={same}")
+
+
+if __name__ == '__main__':
+    main()
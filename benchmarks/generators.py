@@ -0,0 +1,146 @@
+"""
+Deterministic synthetic logs in every format the parsers accept.
+
+Every writer takes the path, the number of lines (records for JSON) and a
+seed, and writes the same file for the same arguments, at any size from a
+few thousand lines to tens of millions: lines are written as they are
+generated and the timestamps advance by one second every few lines, as in
+a real burst of log lines.
+
+    write_hdfs_log('hdfs.log', 1_000_000)
+
+generate() writes a log into a folder once and reuses it afterwards, since
+the largest logs take minutes to write.
+"""
+from datetime import datetime, timedelta
+import json
+import os
+import random
+
+LEVELS = ['INFO', 'INFO', 'INFO', 'WARN', 'ERROR']
+JSON_LEVELS = LEVELS + ['DEBUG']
+
+REQUESTS = ['GET /index.html HTTP/1.0', 'GET /images/logo.png HTTP/1.0',
+            'POST /api/login HTTP/1.1', 'GET /p/{} HTTP/1.1']
+STATUSES = [200, 200, 200, 304, 404, 500]
+
+
+def _timestamps(start, lines, lines_per_second, layout):
+    # The formatted time of every line, lines_per_second lines per second
+    # from start
+    for i in range(lines):
+        if i % lines_per_second == 0:
+            text = (start + timedelta(seconds=i // lines_per_second)).strftime(layout)
+        yield text
+
+
+def write_hdfs_log(path, lines, seed=0):
+    """Write a deterministic synthetic HDFS log with the given line count."""
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        for timestamp in _timestamps(datetime(2008, 11, 9), lines, 50, '%y%m%d %H%M%S'):
+            file.write(
+                f"{timestamp} {rng.randint(10, 9999)} {rng.choice(LEVELS)} "
+                f"dfs.DataNode$PacketResponder: Received block "
+                f"blk_{rng.randint(-2**62, 2**62)} of size {rng.randint(1, 2**26)} "
+                f"from /10.251.{rng.randint(0, 255)}.{rng.randint(0, 255)}\n"
+            )
+
+
+def write_clf_log(path, lines, seed=0):
+    """Write a deterministic synthetic CLF access log with the given line count."""
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        for timestamp in _timestamps(datetime(2000, 10, 10), lines, 20, '%d/%b/%Y:%H:%M:%S'):
+            file.write(
+                f"10.{rng.randint(0, 3)}.{rng.randint(0, 255)}.{rng.randint(0, 255)} - - "
+                f"[{timestamp} -0700] "
+                f"\"{rng.choice(REQUESTS).format(rng.randint(0, 9999))}\" "
+                f"{rng.choice(STATUSES)} {rng.randint(100, 99999)}\n"
+            )
+
+
+def write_hadoop_log(path, lines, seed=0):
+    """Write a deterministic synthetic Hadoop log with the given line count."""
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        for timestamp in _timestamps(datetime(2015, 10, 18), lines, 20, '%Y-%m-%d %H:%M:%S'):
+            file.write(
+                f"{timestamp},{rng.randint(0, 999):03d} "
+                f"{rng.choice(LEVELS)} [main] org.apache.hadoop.mapreduce.v2.app.MRAppMaster: "
+                f"Task attempt_{rng.randint(0, 99999)} done on 10.190.{rng.randint(0, 255)}."
+                f"{rng.randint(0, 255)}\n"
+            )
+
+
+def write_zookeeper_log(path, lines, seed=0):
+    """Write a deterministic synthetic Zookeeper log with the given line count."""
+    rng = random.Random(seed)
+    with open(path, "w") as file:
+        for timestamp in _timestamps(datetime(2015, 7, 29), lines, 20, '%Y-%m-%d %H:%M:%S'):
+            file.write(
+                f"{timestamp},{rng.randint(0, 999):03d} - "
+                f"{rng.choice(LEVELS):<5} [QuorumPeer[myid={rng.randint(1, 3)}]/0:0:0:0:0:0:0:0:2181"
+                f":Follower@{rng.randint(100, 999)}] - Expiring session 0x{rng.getrandbits(48):x}\n"
+            )
+
+
+def json_records(records, seed=0):
+    """Yield deterministic synthetic JSON log records."""
+    rng = random.Random(seed)
+    for timestamp in _timestamps(datetime(2023, 1, 1), records, 20, '%Y-%m-%dT%H:%M:%S'):
+        yield {
+            "time": f"{timestamp}.{rng.randint(0, 999):03d}Z",
+            "level": rng.choice(JSON_LEVELS),
+            "service": rng.choice(['api', 'auth', 'billing']),
+            "message": f"request {rng.getrandbits(32):08x} took {rng.randint(1, 5000)} ms",
+            "status": rng.choice([200, 200, 404, 500]),
+        }
+
+
+def write_json_log(path, records, seed=0):
+    """Write deterministic synthetic JSON log records as a top-level array."""
+    with open(path, "w") as file:
+        file.write("[")
+        for i, record in enumerate(json_records(records, seed)):
+            file.write(",\n  " if i else "\n  ")
+            file.write(json.dumps(record))
+        file.write("\n]" if records else "]")
+
+
+def write_ndjson_log(path, records, seed=0):
+    """Write deterministic synthetic JSON log records, one per line."""
+    with open(path, "w") as file:
+        for record in json_records(records, seed):
+            file.write(json.dumps(record) + "\n")
+
+
+# Writer and file extension of every generated format.
+GENERATORS = {
+    'hadoop': (write_hadoop_log, 'log'),
+    'zookeeper': (write_zookeeper_log, 'log'),
+    'hdfs': (write_hdfs_log, 'log'),
+    'clf': (write_clf_log, 'log'),
+    'json': (write_json_log, 'json'),
+    'ndjson': (write_ndjson_log, 'ndjson'),
+}
+
+
+def generate(log_format, lines, folder, seed=0):
+    """
+    Return the path of a synthetic log in a folder, writing it first if it
+    is not there yet.
+
+    Parameters:
+    - log_format (str): A key of GENERATORS.
+    - lines (int): The number of lines, or records for JSON.
+    - folder (str): The folder generated logs are kept in.
+    - seed (int): The seed of the random values.
+    """
+    write_log, extension = GENERATORS[log_format]
+    path = os.path.join(folder, f'{log_format}-{lines}-{seed}.{extension}')
+    if not os.path.exists(path):
+        os.makedirs(folder, exist_ok=True)
+        write_log(path + '.tmp', lines, seed)
+        os.replace(path + '.tmp', path)
+    return path
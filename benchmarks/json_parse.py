@@ -0,0 +1,74 @@
+"""
+Benchmark streaming JSON log parsing against loading the whole document.
+
+Usage (from the repository root):
+    python -m benchmarks.json_parse --records 500000
+
+A synthetic JSON log is written both as a top-level array and as NDJSON.
+The array is parsed the old way, json.load and every value classified by
+its regexes, and both files are parsed by streaming them through
+read_json_records with the key roles learned once. The benchmark reports
+the time and the peak memory (traced with tracemalloc, which also slows
+everything down, so the times are measured in a separate untraced run) and
+checks that all of them give the same records.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generators import write_json_log, write_ndjson_log
+from logparser.json_parser import parse_json_log, parse_json_records, read_json_records
+
+
+def load_all(path):
+    with open(path) as file:
+        return [parse_json_log(log_entry) for log_entry in json.load(file)]
+
+
+def stream(path):
+    return parse_json_records(read_json_records(path))
+
+
+def measure(parse, path):
+    started = time.perf_counter()
+    for _ in parse(path):
+        pass
+    seconds = time.perf_counter() - started
+
+    tracemalloc.start()
+    for _ in parse(path):
+        pass
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--records', type=int, default=500_000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        array_path = os.path.join(temp_dir, 'logs.json')
+        ndjson_path = os.path.join(temp_dir, 'logs.ndjson')
+        write_json_log(array_path, args.records)
+        write_ndjson_log(ndjson_path, args.records)
+
+        for label, parse, path in (('json.load', load_all, array_path),
+                                   ('array', stream, array_path),
+                                   ('ndjson', stream, ndjson_path)):
+            seconds, peak = measure(parse, path)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"{label:<10} {size_mb:7.1f} MB {seconds:7.2f}s "
+                  f"{args.records / seconds / 1000:8.0f}k records/s "
+                  f"{peak / 1024 / 1024:9.1f} MB peak")
+
+        expected = load_all(array_path)
+        print(f"identical={list(stream(array_path)) == expected == list(stream(ndjson_path))}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Check that the parallel parse path produces exactly the serial output.
+
+Usage (from the repository root):
+    python -m benchmarks.parallel_check --lines 200000
+
+A synthetic log of every line-oriented format is generated, with some lines
+the format does not match, blank lines, CRLF line ends, non-ASCII text and
+no newline at the very end. Every log is parsed serially and with several
+worker counts, in chunks small enough to give every worker many ranges, and
+'output.json' and every file of the columnar store (columns, meta.json,
+rollups, templates, access sketches and token index) are compared byte for
+byte with the serial ones. The exit status is 1 if anything differs.
+"""
+import argparse
+from contextlib import contextmanager
+import filecmp
+import os
+import sys
+import tempfile
+
+from benchmarks.generators import GENERATORS
+from logparser.formats import FORMATS
+from logparser.pipeline import run_pipeline
+
+# Formats parsed by the parallel path.
+LINE_FORMATS = [log_format for log_format in FORMATS if log_format.parse_entry]
+
+
+def write_messy_log(log_format, path, lines):
+    """Write a synthetic log with the irregular lines real logs have."""
+    write_log, _ = GENERATORS[log_format]
+    write_log(path, lines)
+    with open(path, 'rb') as file:
+        clean = file.read().splitlines()
+    with open(path, 'wb') as file:
+        for number, line in enumerate(clean):
+            if number % 97 == 0:
+                file.write(b'garbage line that matches no format\n')
+            if number % 101 == 0:
+                file.write(b'\n')
+            if number % 89 == 0:
+                line += ' café 日本'.encode('utf-8')
+            file.write(line + (b'\r\n' if number % 13 == 0 else b'\n'))
+        file.write(b'last line without a newline')
+
+
+@contextmanager
+def quiet():
+    """
+    Send what the body of a with statement prints to /dev/null, the parse
+    worker processes included: the unmatched lines are all reported.
+    """
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def folder_files(folder):
+    """Return the paths of all the files under a folder, relative to it."""
+    return sorted(
+        os.path.relpath(os.path.join(root, name), folder)
+        for root, _, names in os.walk(folder) for name in names
+    )
+
+
+def differences(serial_folder, parallel_folder):
+    """Return the files that differ between two output folders."""
+    serial_files = folder_files(serial_folder)
+    if folder_files(parallel_folder) != serial_files:
+        return ['file list']
+    return [
+        name for name in serial_files
+        if not filecmp.cmp(os.path.join(serial_folder, name),
+                           os.path.join(parallel_folder, name), shallow=False)
+    ]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--lines', type=int, default=200_000)
+    arg_parser.add_argument('--chunk-size', type=int, default=256 * 1024)
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=[2, 3, 4])
+    args = arg_parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for log_format in LINE_FORMATS:
+            log_path = os.path.join(temp_dir, f'{log_format.name}.log')
+            write_messy_log(log_format.name, log_path, args.lines)
+            chunks = -(-os.path.getsize(log_path) // args.chunk_size)
+
+            serial_folder = os.path.join(temp_dir, f'{log_format.name}-serial')
+            os.makedirs(serial_folder)
+            outputs = {}
+            with quiet():
+                run_pipeline(log_path, serial_folder, log_format.parse_entry)
+                for workers in args.workers:
+                    outputs[workers] = os.path.join(temp_dir, f'{log_format.name}-{workers}')
+                    os.makedirs(outputs[workers])
+                    run_pipeline(log_path, outputs[workers], log_format.parse_entry,
+                                 workers, args.chunk_size)
+
+            for workers, parallel_folder in outputs.items():
+                different = differences(serial_folder, parallel_folder)
+                failed = failed or bool(different)
+                print(f"{log_format.name:<10} {chunks:4} chunks  workers={workers:<3} "
+                      + (f"DIFFERENT: {', '.join(different)}" if different else "identical"))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark how ingest throughput scales with the number of workers.
+
+Usage (from the repository root):
+    python -m benchmarks.parallel_parse --lines 2000000
+    python -m benchmarks.parallel_parse --format hadoop --workers 1 2 4 8
+
+A synthetic log is generated once and ingested end to end, 'output.json'
+and the columnar store included, with every worker count. Every run's
+outputs are checked against the serial ones (see benchmarks.parallel_check).
+
+Besides the wall time and the speedup over the serial run, every run
+reports the CPU time of the parsing process itself. The workers run in
+processes of their own, so that is the part of the ingest which does not
+get faster with more workers: the serial time divided by it bounds the
+speedup any number of workers can give (Amdahl's law).
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.generators import GENERATORS
+from benchmarks.parallel_check import LINE_FORMATS, differences, quiet
+from logparser.pipeline import run_pipeline
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--lines', type=int, default=1_000_000)
+    arg_parser.add_argument('--format', default='hdfs',
+                            choices=[log_format.name for log_format in LINE_FORMATS])
+    arg_parser.add_argument('--chunk-size', type=int, default=4 * 1024 * 1024)
+    arg_parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = arg_parser.parse_args()
+
+    log_format = next(log_format for log_format in LINE_FORMATS
+                      if log_format.name == args.format)
+    worker_counts = sorted(set([1] + args.workers))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        log_path = os.path.join(temp_dir, f'{log_format.name}.log')
+        write_log, _ = GENERATORS[log_format.name]
+        write_log(log_path, args.lines)
+        size_mb = os.path.getsize(log_path) / 1024 / 1024
+        print(f"{log_format.name}: {args.lines} lines, {size_mb:.1f} MB, "
+              f"{os.cpu_count()} CPUs")
+
+        serial_seconds = None
+        for workers in worker_counts:
+            output_folder = os.path.join(temp_dir, f'out-{workers}')
+            os.makedirs(output_folder)
+
+            started = time.perf_counter()
+            cpu_started = time.process_time()
+            with quiet():
+                run_pipeline(log_path, output_folder, log_format.parse_entry, workers,
+                             args.chunk_size)
+            seconds = time.perf_counter() - started
+            parent_seconds = time.process_time() - cpu_started
+            serial_seconds = serial_seconds or seconds
+
+            different = differences(os.path.join(temp_dir, 'out-1'), output_folder)
+            print(f"workers={workers:<3} {seconds:8.2f}s "
+                  f"{args.lines / seconds:12,.0f} lines/s "
+                  f"{size_mb / seconds:8.1f} MB/s "
+                  f"speedup={serial_seconds / seconds:5.2f} "
+                  f"parent_cpu={parent_seconds:6.2f}s "
+                  f"max_speedup={serial_seconds / parent_seconds:5.2f} "
+                  f"identical={not different}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the memory of RecordBatches against lists of record dicts.
+
+Usage (from the repository root):
+    python -m benchmarks.record_batch --lines 500000
+
+Synthetic HDFS and CLF logs are parsed into a list of dicts and into
+RecordBatches. For both the benchmark reports the memory they hold (traced
+with tracemalloc, which also slows the build down), the size and the time
+of a pickle round trip (what a parallel parse worker sends back), and
+checks that the batches give back the same records.
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.generators import write_clf_log, write_hdfs_log
+from logparser.batch import batch_records
+from logparser.clf_parser import parse_clf_log
+from logparser.hdfs_parser import parse_hdfs_log
+from logparser.pipeline import parse_lines, read_lines
+
+def measure(build):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    seconds = time.perf_counter() - started
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, held, seconds
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--lines', type=int, default=500_000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name, write_log, parse_entry in (('hdfs', write_hdfs_log, parse_hdfs_log),
+                                             ('clf', write_clf_log, parse_clf_log)):
+            log_path = os.path.join(temp_dir, f'{name}.log')
+            write_log(log_path, args.lines)
+            size_mb = os.path.getsize(log_path) / 1024 / 1024
+            print(f"{name}: {args.lines} lines, {size_mb:.1f} MB")
+
+            dicts, dict_bytes, dict_seconds = measure(
+                lambda: list(parse_lines(read_lines(log_path), parse_entry)))
+            batches, batch_bytes, batch_seconds = measure(
+                lambda: list(batch_records(parse_lines(read_lines(log_path), parse_entry))))
+
+            same = [record for batch in batches for record in batch.records()] == dicts
+            for label, value, held, seconds in (('dicts', dicts, dict_bytes, dict_seconds),
+                                                ('batches', batches, batch_bytes, batch_seconds)):
+                started = time.perf_counter()
+                pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                pickle.loads(pickled)
+                pickle_seconds = time.perf_counter() - started
+                print(f"  {label:<8} {held / 1024 / 1024:9.1f} MB held "
+                      f"{held / args.lines:7.1f} B/record "
+                      f"{len(pickled) / 1024 / 1024:9.1f} MB pickled "
+                      f"{pickle_seconds:6.2f}s pickle round trip "
+                      f"{seconds:7.2f}s build (traced)")
+            print(f"  memory ratio {dict_bytes / batch_bytes:.1f}x, identical={same}")
+            del dicts, batches
+
+
+if __name__ == '__main__':
+    main()
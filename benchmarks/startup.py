@@ -0,0 +1,84 @@
+"""
+Benchmark the startup time and idle memory of a backend process.
+
+Usage (from the repository root):
+    python -m benchmarks.startup --runs 5
+
+backend.application is imported in fresh interpreters, the way every
+gunicorn worker starts, and the benchmark reports the median import time,
+the peak RSS of the process once the app is ready and which of the heavy
+report and analytics libraries were loaded. With --warm the process then
+builds a chart and a PDF report of a small synthetic log, to show what the
+first report request adds.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Libraries only the reports and the analytics use.
+HEAVY_MODULES = ('matplotlib', 'reportlab', 'pandas')
+
+# Run in the fresh interpreter, from a scratch working folder.
+PROBE = """
+import json, resource, sys, time
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+started = time.perf_counter()
+from backend.application import app
+result = {'seconds': time.perf_counter() - started, 'peak_rss_mb': peak_rss_mb(),
+          'loaded': [name for name in HEAVY_MODULES if name in sys.modules]}
+if WARM:
+    from benchmarks.generators import write_hdfs_log
+    write_hdfs_log('warm.log', 2000)
+    client = app.test_client()
+    with open('warm.log', 'rb') as file:
+        job_id = client.post('/upload', data={'file': (file, 'warm.log')}).get_json()['job_id']
+    while client.get('/jobs/' + job_id).get_json()['state'] not in ('done', 'failed'):
+        time.sleep(0.05)
+    started = time.perf_counter()
+    client.post('/generate_pdf', json={'start_timestamp': '', 'end_timestamp': ''})
+    result['first_report_seconds'] = time.perf_counter() - started
+    result['report_peak_rss_mb'] = peak_rss_mb()
+print(json.dumps(result))
+"""
+
+
+def probe(warm):
+    """Import the backend in a fresh interpreter and return its metrics."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = f"WARM = {warm!r}\nHEAVY_MODULES = {HEAVY_MODULES!r}\n" + PROBE
+    with tempfile.TemporaryDirectory() as work_dir:
+        output = subprocess.run(
+            [sys.executable, '-c', code], cwd=work_dir, check=True, capture_output=True,
+            text=True, env=dict(os.environ, PYTHONPATH=root)
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--runs', type=int, default=5)
+    arg_parser.add_argument('--warm', action='store_true',
+                            help='also build a first report after starting')
+    args = arg_parser.parse_args()
+
+    runs = [probe(args.warm) for _ in range(args.runs)]
+    print(f"import backend.application: "
+          f"{statistics.median(run['seconds'] for run in runs):6.3f}s median, "
+          f"{statistics.median(run['peak_rss_mb'] for run in runs):6.1f} MB peak RSS, "
+          f"loaded: {', '.join(runs[0]['loaded']) or 'none'}")
+    if args.warm:
+        print(f"first report:               "
+              f"{statistics.median(run['first_report_seconds'] for run in runs):6.3f}s median, "
+              f"{statistics.median(run['report_peak_rss_mb'] for run in runs):6.1f} MB peak RSS")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+"""
+Reproducible benchmark suite of the parsers and the backend endpoints.
+
+Usage (from the repository root):
+    python -m benchmarks.suite --lines 100000 --output results.json
+    python -m benchmarks.suite --lines 100000 --baseline results.json
+
+Synthetic logs of every format (see benchmarks.generators) are generated
+once into --data-dir and reused by later runs, from 10k lines up to tens of
+millions. Every scenario runs in a fresh process, so that its peak RSS is
+its own, on every selected format:
+
+    parse                     the format's parser, as the backend runs it
+    upload                    POST /upload, until the parse job is done
+    get_parsed_log_file_path  GET /get_parsed_log_file_path
+    generate_pdf              POST /generate_pdf over the whole log
+
+The endpoint scenarios run the Flask app with its test client, in a working
+folder shared by the scenarios of a format: the upload leaves the dataset
+the later scenarios read.
+
+The results are saved as JSON. With --baseline, scenarios whose time or
+peak RSS grew by more than --tolerance over the baseline (run with the same
+number of lines) are flagged, and the exit status is 1.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.generators import GENERATORS, generate
+
+SCENARIOS = {}
+
+# Metrics compared against the baseline; lower is better for all of them.
+COMPARED_METRICS = ('seconds', 'peak_rss_mb')
+# Time differences below this many seconds are never flagged, they are noise.
+MIN_SECONDS_CHANGE = 0.05
+# Seconds between two polls of a parse job.
+POLL_SECONDS = 0.05
+
+
+def scenario(name):
+    """Decorator registering a scenario function(log_path) -> dict of metrics."""
+    def register(function):
+        SCENARIOS[name] = function
+        return function
+    return register
+
+
+def _test_client():
+    # Imported in the scenario process, after it moved to its working folder
+    from backend.application import app
+    return app.test_client()
+
+
+@scenario('parse')
+def parse_scenario(log_path):
+    from logparser.formats import sniff_format
+    from logparser.sources import open_log
+
+    with open_log(log_path) as source:
+        log_format = sniff_format(source, log_path.rsplit('.', 1)[-1])
+        os.makedirs('output', exist_ok=True)
+        started = time.perf_counter()
+        records = log_format.parse(source, 'output')
+        seconds = time.perf_counter() - started
+    return {'seconds': seconds, 'records': records}
+
+
+@scenario('upload')
+def upload_scenario(log_path):
+    client = _test_client()
+    started = time.perf_counter()
+    with open(log_path, 'rb') as file:
+        response = client.post('/upload', data={'file': (file, os.path.basename(log_path))})
+    if response.status_code != 202:
+        raise RuntimeError(f"/upload answered {response.status_code}: {response.get_data(True)}")
+    job_id = response.get_json()['job_id']
+    while True:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['state'] in ('done', 'failed'):
+            break
+        time.sleep(POLL_SECONDS)
+    seconds = time.perf_counter() - started
+    if job['state'] == 'failed':
+        raise RuntimeError(f"Parse job failed: {job.get('error')}")
+    return {'seconds': seconds, 'records': job['result']['records']}
+
+
+@scenario('get_parsed_log_file_path')
+def get_parsed_scenario(log_path):
+    client = _test_client()
+    started = time.perf_counter()
+    response = client.get('/get_parsed_log_file_path')
+    size = sum(len(chunk) for chunk in response.response)
+    seconds = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"/get_parsed_log_file_path answered {response.status_code}")
+    return {'seconds': seconds, 'response_mb': size / 1024 / 1024}
+
+
+@scenario('generate_pdf')
+def generate_pdf_scenario(log_path):
+    client = _test_client()
+    started = time.perf_counter()
+    response = client.post('/generate_pdf', json={'start_timestamp': '', 'end_timestamp': ''})
+    seconds = time.perf_counter() - started
+    if response.status_code != 200:
+        raise RuntimeError(f"/generate_pdf answered {response.status_code}: {response.get_data(True)}")
+    return {'seconds': seconds, 'response_mb': len(response.data) / 1024 / 1024}
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def _run_scenario(name, log_path, work_dir):
+    os.chdir(work_dir)
+    metrics = SCENARIOS[name](log_path)
+    metrics['peak_rss_mb'] = _peak_rss_mb()
+    return metrics
+
+
+def run_scenario(name, log_path, work_dir):
+    """Run a scenario in a fresh process and return its metrics."""
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_scenario, name, os.path.abspath(log_path),
+                               work_dir).result()
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare results with a baseline.
+
+    Returns:
+    list: (key, metric, baseline value, value) of every metric that grew
+    by more than tolerance, a fraction of the baseline value.
+    """
+    regressions = []
+    for key, metrics in results['results'].items():
+        before = baseline['results'].get(key)
+        if before is None or before.get('lines') != metrics['lines']:
+            continue
+        for metric in COMPARED_METRICS:
+            if metric not in before or metric not in metrics:
+                continue
+            change = metrics[metric] - before[metric]
+            if metric == 'seconds' and change < MIN_SECONDS_CHANGE:
+                continue
+            if change > before[metric] * tolerance:
+                regressions.append((key, metric, before[metric], metrics[metric]))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--lines', type=int, default=100_000,
+                            help='lines (records for JSON) of every generated log')
+    arg_parser.add_argument('--formats', default=','.join(GENERATORS),
+                            help='comma separated formats, of: ' + ', '.join(GENERATORS))
+    arg_parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help='comma separated scenarios, of: ' + ', '.join(SCENARIOS))
+    arg_parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(),
+                                                               'logfileanalyzer-benchmarks'),
+                            help='folder the generated logs are kept in')
+    arg_parser.add_argument('--output', help='file the results are saved to, as JSON')
+    arg_parser.add_argument('--baseline', help='results of an earlier run to compare with')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='growth over the baseline flagged as a regression')
+    args = arg_parser.parse_args()
+
+    formats = args.formats.split(',')
+    scenarios = args.scenarios.split(',')
+    for name in formats:
+        if name not in GENERATORS:
+            arg_parser.error(f"unknown format '{name}'")
+    for name in scenarios:
+        if name not in SCENARIOS:
+            arg_parser.error(f"unknown scenario '{name}'")
+
+    results = {
+        'meta': {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'lines': args.lines,
+        },
+        'results': {},
+    }
+    for log_format in formats:
+        log_path = generate(log_format, args.lines, args.data_dir)
+        size_mb = os.path.getsize(log_path) / 1024 / 1024
+        work_dir = tempfile.mkdtemp(prefix=f'benchmark-{log_format}-')
+        try:
+            for name in scenarios:
+                metrics = run_scenario(name, log_path, work_dir)
+                metrics.update(lines=args.lines, size_mb=size_mb,
+                               lines_per_second=args.lines / metrics['seconds'],
+                               mb_per_second=size_mb / metrics['seconds'])
+                results['results'][f'{name}/{log_format}'] = metrics
+                print(f"{name + '/' + log_format:<36} {metrics['seconds']:8.2f}s "
+                      f"{metrics['lines_per_second']:12,.0f} lines/s "
+                      f"{metrics['mb_per_second']:8.1f} MB/s "
+                      f"{metrics['peak_rss_mb']:8.1f} MB peak RSS")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for key, metric, before, after in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.2f} -> {after:.2f} "
+                  f"(+{(after - before) / before:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions over {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Microbenchmark of the cached timestamp parsers against plain strptime.
+
+Usage (from the repository root):
+    python -m benchmarks.timestamps --count 200000
+
+Timestamps are generated in bursts (many lines per second, as in real logs)
+and every fast result is checked against the strptime result.
+"""
+import argparse
+from datetime import datetime, timedelta
+import time
+
+from logparser.timestamps import (
+    CLF_FORMAT, HADOOP_FORMAT, HDFS_FORMAT, clf_to_iso, hadoop_to_iso,
+    hdfs_to_iso
+)
+
+
+def strptime_hadoop(timestamp):
+    return datetime.strptime(timestamp, HADOOP_FORMAT).isoformat()
+
+
+def strptime_hdfs(timestamp):
+    return datetime.strptime(timestamp, HDFS_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def strptime_clf(timestamp):
+    return datetime.strptime(timestamp, CLF_FORMAT).isoformat()
+
+
+def burst_timestamps(count, lines_per_second=20):
+    start = datetime(2015, 10, 18, 23, 50)
+    for i in range(count):
+        yield start + timedelta(seconds=i // lines_per_second,
+                                milliseconds=i % 1000)
+
+
+def time_function(function, values):
+    started = time.perf_counter()
+    results = [function(value) for value in values]
+    return time.perf_counter() - started, results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--count', type=int, default=200_000)
+    args = arg_parser.parse_args()
+
+    moments = list(burst_timestamps(args.count))
+    cases = [
+        ('hadoop/zookeeper', strptime_hadoop, hadoop_to_iso,
+         [m.strftime("%Y-%m-%d %H:%M:%S,") + f"{m.microsecond // 1000:03d}"
+          for m in moments]),
+        ('hdfs', strptime_hdfs, hdfs_to_iso,
+         [m.strftime("%y%m%d %H%M%S") for m in moments]),
+        ('clf', strptime_clf, clf_to_iso,
+         [m.strftime("%d/%b/%Y:%H:%M:%S -0700") for m in moments]),
+    ]
+
+    for name, reference, fast, values in cases:
+        reference_seconds, expected = time_function(reference, values)
+        fast_seconds, actual = time_function(fast, values)
+        print(f"{name:<17} strptime {args.count / reference_seconds:12,.0f}/s "
+              f"cached {args.count / fast_seconds:12,.0f}/s "
+              f"speedup={reference_seconds / fast_seconds:5.1f}x "
+              f"identical={expected == actual}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,10 @@ import React, { useState, useRef } from 'react';
 import './App.css';
 import Dashboard from './components/Dashboard';
 
+// Files larger than this are sent in chunks of this size.
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+const MAX_CHUNK_RETRIES = 3;
+
 /**
  * Main component for the Log File Analyzer web app.
  */
@@ -11,26 +15,105 @@ function App() {
   const [selectedFileName, setSelectedFileName] = useState('');
   const fileInputRef = useRef(null);
   const [isUploaded, setIsUploaded] = useState(false);
+  const [jobStatus, setJobStatus] = useState(null);
+  const [appendOnly, setAppendOnly] = useState(false);
+  const [datasetId, setDatasetId] = useState(null);
 
   /**
-   * Handles the change event, that is, checks the size of the uploaded file.
+   * Handles the change event, that is, stores the selected file.
    * @param {Object} e - The change event.
    */
   const handleFileChange = (e) => {
     const selectedFile = e.target.files[0];
-    // Check if the uploaded file is less than or equal to 10 MB.
-    if (selectedFile && selectedFile.size > 10 * 1024 * 1024) {
-      alert('File size exceeds the limit of 10 MB. Please select a smaller file.');
-      return;
-    }
-
     setFile(selectedFile);
     setSelectedFileName(selectedFile ? selectedFile.name : '');
   };
 
+  /**
+   * Polls the parse job of an upload until it is done, showing its progress,
+   * and opens the dashboard on the parsed dataset once the logs are parsed.
+   * @param {string} jobId - The id returned by the /upload API.
+   */
+  const waitForJob = async (jobId) => {
+    while (true) {
+      const response = await fetch(`http://localhost:5000/jobs/${jobId}`);
+      const status = await response.json();
+      setJobStatus(status);
+
+      if (status.state === 'done') {
+        setJobStatus(null);
+        setDatasetId(status.result.id);
+        setIsUploaded(true);
+        return;
+      }
+      if (status.state === 'failed' || !response.ok) {
+        setJobStatus(null);
+        alert(`Error: ${status.error}`);
+        return;
+      }
+      await new Promise(resolve => setTimeout(resolve, 1000));
+    }
+  };
+
+  /**
+   * Sends a large file in chunks with the resumable upload API. A chunk that
+   * fails is retried from the offset the server reports.
+   * @param {File} largeFile - The file to upload.
+   * @param {string} query - The query string of the upload completion.
+   * @returns {Response} The response of the upload completion.
+   */
+  const uploadInChunks = async (largeFile, query) => {
+    const serverURL = 'http://localhost:5000/uploads';
+    const started = await fetch(serverURL, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: largeFile.name }),
+    });
+    if (!started.ok) {
+      return started;
+    }
+    const { upload_id: uploadId } = await started.json();
+
+    let offset = 0;
+    let retries = 0;
+    while (offset < largeFile.size) {
+      try {
+        const response = await fetch(`${serverURL}/${uploadId}?offset=${offset}`, {
+          method: 'PUT',
+          body: largeFile.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+        });
+        const status = await response.json();
+        if (!response.ok && response.status !== 409) {
+          throw new Error(status.error);
+        }
+        // On a conflict the server reports where to resume from
+        offset = status.received;
+        retries = 0;
+      } catch (error) {
+        if (++retries > MAX_CHUNK_RETRIES) {
+          throw error;
+        }
+        const status = await (await fetch(`${serverURL}/${uploadId}`)).json();
+        offset = status.received;
+      }
+      setJobStatus({
+        filename: largeFile.name,
+        state: 'uploading',
+        lines_parsed: 0,
+        bytes_parsed: offset,
+        bytes_total: largeFile.size,
+        lines_per_second: 0,
+      });
+    }
+
+    return fetch(`${serverURL}/${uploadId}/complete${query}`, { method: 'POST' });
+  };
+
   /**
    * Handles the file, stores the input file to formData and calls the /upload
-   * API.
+   * API. Files larger than a chunk go through the resumable upload API.
+   * With "only new lines" checked, only what was appended to the log since
+   * its last upload is parsed.
    */
   const handleUpload = async () => {
     if (!file) {
@@ -40,22 +123,25 @@ function App() {
 
     const formData = new FormData();
     formData.append('file', file);
+    const query = appendOnly ? '?mode=append' : '';
 
     try {
-      const response = await fetch('http://localhost:5000/upload', {
-        method: 'POST',
-        body: formData,
-      });
+      const response = file.size > UPLOAD_CHUNK_SIZE
+        ? await uploadInChunks(file, query)
+        : await fetch(`http://localhost:5000/upload${query}`, {
+          method: 'POST',
+          body: formData,
+        });
 
       const result = await response.json();
 
       if (response.ok) {
-        alert(result.message);
         setFile(null); // Clear the selected file after successful upload
         setSelectedFileName(''); // Clear the selected file name
-        setIsUploaded(true);
+        // The file is parsed in the background, wait for it to finish
+        await waitForJob(result.job_id);
       } else {
-        alert(`Error: ${result.error}. Only .log and .json files are supported.`);
+        alert(`Error: ${result.error}. Only .log, .json and .ndjson files (optionally .gz, .bz2, .xz or .zst compressed) are supported.`);
       }
     } catch (error) {
       console.error('Error uploading file:', error);
@@ -99,11 +185,29 @@ function App() {
         <center>
         <div >
           <button onClick={handleUpload} className="selected-file-box">Upload</button>
+          <label>
+            <input
+              type="checkbox"
+              checked={appendOnly}
+              onChange={(e) => setAppendOnly(e.target.checked)}
+            />
+            Only new lines
+          </label>
         </div>
         </center>
       )}
 
 
+      {jobStatus && (
+        <center>
+          <p>
+            Parsing {jobStatus.filename}: {jobStatus.state}, {jobStatus.lines_parsed} lines
+            ({Math.round(100 * jobStatus.bytes_parsed / Math.max(jobStatus.bytes_total, 1))}%,
+            {' '}{jobStatus.lines_per_second} lines/s)
+          </p>
+        </center>
+      )}
+
       {uploadedFiles.length > 0 && (
         <div>
           <h2>Uploaded Files:</h2>
@@ -124,7 +228,7 @@ function App() {
       {isUploaded && (
         <div>
         <button onClick={handleBack}>Back</button>
-          <Dashboard/>
+          <Dashboard datasetId={datasetId} />
           
         </div>
 
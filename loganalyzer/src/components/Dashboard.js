@@ -3,45 +3,118 @@ import TableComponent from './TableComponent';
 import LineChart from './LineChartComponent';
 import LogLevelFreq from './LogLevelFreq';
 
-const Dashboard = () => {
+// Number of logs fetched from the server per page.
+const PAGE_SIZE = 500;
+
+/**
+ * Dashboard of one parsed dataset.
+ * @param {string} datasetId - The id of the dataset, returned by the upload.
+ */
+const Dashboard = ({ datasetId }) => {
   const [logs, setLogs] = useState([]);
-  const [originalLogs, setOriginalLogs] = useState([]);
+  const [filters, setFilters] = useState({});
+  const [cursor, setCursor] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(0);
+  const [stats, setStats] = useState({ levels: {}, buckets: [] });
+  const [bucket, setBucket] = useState('minute');
+  // Why the last page could not be fetched, shown above the previous page.
+  const [pageError, setPageError] = useState(null);
 
-  useEffect(() => {
-    const fetchData = async () => {
-      try {
-        const response = await fetch('http://localhost:5000/get_parsed_log_file_path');
-        const data = await response.json();
-        setOriginalLogs(data);
-        setLogs(data);
-      } catch (error) {
-        console.error('Error fetching data:', error);
+  /**
+   * Builds the query string of the dataset and the start, end and level
+   * filters.
+   */
+  const filterParams = (activeFilters, params) => {
+    if (datasetId) params.append('dataset', datasetId);
+    if (activeFilters.start) params.append('start', activeFilters.start);
+    if (activeFilters.end) params.append('end', activeFilters.end);
+    if (activeFilters.level) params.append('level', activeFilters.level);
+    return params;
+  };
+
+  /**
+   * Fetches the level counts and the histogram matching the filters.
+   */
+  const fetchStats = async (statsFilters, statsBucket) => {
+    const params = filterParams(statsFilters, new URLSearchParams({ bucket: statsBucket }));
+
+    try {
+      const response = await fetch(`http://localhost:5000/stats?${params}`);
+      if (response.ok) {
+        setStats(await response.json());
       }
-    };
+    } catch (error) {
+      console.error('Error fetching stats:', error);
+    }
+  };
 
-    fetchData();
+  /**
+   * Fetches one page of logs matching the filters, starting at the cursor.
+   * With a message query the page comes from the full-text search.
+   * If the request fails, the previous page stays and the error is shown.
+   */
+  const fetchPage = async (pageFilters, pageCursor) => {
+    const params = filterParams(pageFilters, new URLSearchParams({ cursor: pageCursor, limit: PAGE_SIZE }));
+    if (pageFilters.q) params.append('q', pageFilters.q);
+    const endpoint = pageFilters.q ? 'search' : 'logs';
+
+    try {
+      const response = await fetch(`http://localhost:5000/${endpoint}?${params}`);
+      const data = await response.json().catch(() => ({}));
+      if (!response.ok) {
+        setPageError(data.error || `The server answered ${response.status} ${response.statusText}`);
+        return;
+      }
+      setLogs(data.records);
+      setCursor(pageCursor);
+      setNextCursor(data.next_cursor);
+      setTotal(data.total);
+      setPageError(null);
+    } catch (error) {
+      console.error('Error fetching data:', error);
+      setPageError(`Could not fetch the logs: ${error.message}`);
+    }
+  };
+
+  useEffect(() => {
+    fetchPage({}, 0);
   }, []);
 
+  useEffect(() => {
+    fetchStats(filters, bucket);
+  }, [filters, bucket]);
+
   /**
-   * Updates the logs to be displayed whenever filters are added.
+   * Shows the first page of logs matching new filters.
    */
-  const updateLogs = (newLogs) => {
-    setLogs(newLogs);
+  const updateFilters = (newFilters) => {
+    setFilters(newFilters);
+    fetchPage(newFilters, 0);
+  };
+
+  const pagination = {
+    cursor,
+    total,
+    pageSize: PAGE_SIZE,
+    onNext: nextCursor !== null ? () => fetchPage(filters, nextCursor) : null,
+    onPrevious: cursor > 0 ? () => fetchPage(filters, Math.max(cursor - PAGE_SIZE, 0)) : null,
   };
 
   return (
     <div>
       
       <center><h1>Dashboard</h1></center>
-      <TableComponent logs={logs} setLogs={updateLogs} originalLogs={originalLogs} />
+      {pageError && <p style={{ color: 'red' }}>{pageError}</p>}
+      <TableComponent logs={logs} setFilters={updateFilters} pagination={pagination} datasetId={datasetId} />
       <div style={{ display: 'flex', justifyContent: 'space-between', marginBottom: '20px', marginTop: '20px' }}>
-        <LogLevelFreq logs={logs} logLevel="INFO" />
-        <LogLevelFreq logs={logs} logLevel="WARNING" />
-        <LogLevelFreq logs={logs} logLevel="ERROR" />
-        <LogLevelFreq logs={logs} logLevel="DEBUG" />
-        <LogLevelFreq logs={logs} logLevel="FATAL" />
+        <LogLevelFreq levels={stats.levels} logLevel="INFO" />
+        <LogLevelFreq levels={stats.levels} logLevel="WARNING" />
+        <LogLevelFreq levels={stats.levels} logLevel="ERROR" />
+        <LogLevelFreq levels={stats.levels} logLevel="DEBUG" />
+        <LogLevelFreq levels={stats.levels} logLevel="FATAL" />
       </div>
-      <LineChart logs={logs} />
+      <LineChart buckets={stats.buckets} bucket={bucket} setBucket={setBucket} />
     </div>
   );
 };
@@ -1,30 +1,33 @@
-import React, { useRef, useEffect,useState } from 'react';
+import React, { useRef, useEffect } from 'react';
 import Chart from 'chart.js/auto';
 
+const LOG_LEVEL_COLORS = {
+  INFO: 'rgba(75, 192, 192, 1)',
+  DEBUG: 'rgba(54, 162, 235, 1)',
+  WARN: 'rgba(255, 206, 86, 1)',
+  WARNING: 'rgba(255, 206, 86, 1)',
+  ERROR: 'rgba(255, 99, 132, 1)',
+  FATAL: 'rgba(153, 102, 255, 1)',
+};
+
 /**
- * Line chart component that shows the line chart with various log
- * levels on the Y-axis and timestamps on the X-axis.
+ * Line chart component that shows, for every log level, the number of logs
+ * per time bucket. The buckets are pre-aggregated by the server.
  */
-const LineChart = ({ logs }) => {
+const LineChart = ({ buckets, bucket, setBucket }) => {
   const chartRef = useRef(null);
-  const [hoveredLog, setHoveredLog] = useState(null);
 
   useEffect(() => {
-    // Sort logs based on timestamp before rendering the chart
-    const sortedLogs = logs.slice().sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
-
-    if (chartRef.current && sortedLogs.length > 0) {
-      const labels = sortedLogs.map(log => log.timestamp);
-      const data = sortedLogs.map(log => {
-        const logLevelToValue = {
-          INFO: 1,
-          DEBUG: 2,
-          WARN: 3,
-          ERROR: 4,
-          FATAL: 5,
-        };
-        return logLevelToValue[log.log_level] || 0;
-      });
+    if (chartRef.current) {
+      const labels = buckets.map(entry => entry.timestamp);
+      const logLevels = [...new Set(buckets.flatMap(entry => Object.keys(entry.counts)))];
+      const datasets = logLevels.map(logLevel => ({
+        label: logLevel,
+        data: buckets.map(entry => entry.counts[logLevel] || 0),
+        borderColor: LOG_LEVEL_COLORS[logLevel] || 'rgba(128, 128, 128, 1)',
+        borderWidth: 1,
+        fill: false,
+      }));
 
       const ctx = chartRef.current.getContext('2d');
 
@@ -37,56 +40,32 @@ const LineChart = ({ logs }) => {
         type: 'line',
         data: {
           labels: labels,
-          datasets: [{
-            label: 'Log Levels',
-            data: data,
-            borderColor: 'rgba(75, 192, 192, 1)',
-            borderWidth: 1,
-            fill: false,
-          }],
+          datasets: datasets,
         },
         options: {
           scales: {
             y: {
-              ticks: {
-                reverse: true,
-                stepSize: 1,
-                callback: value => {
-                  const valueToLogLevel = {
-                    1: 'INFO',
-                    2: 'DEBUG',
-                    3: 'WARN',
-                    4: 'ERROR',
-                    5: 'FATAL',
-                  };
-                  return valueToLogLevel[value] || '';
-                },
-              },
-            },
-          },
-          plugins: {
-            tooltip: {
-              callbacks: {
-                label: (context) => {
-                  // Retrieve the corresponding log object for the hovered point
-                  const index = context.dataIndex;
-                  const hoveredLog = sortedLogs[index];
-                  setHoveredLog(hoveredLog);
-                  return `${hoveredLog.message}`;  // Return an empty string to prevent the default label
-                },
+              beginAtZero: true,
+              title: {
+                display: true,
+                text: `Logs per ${bucket}`,
               },
             },
           },
-        
         },
-        
       });
     }
-  }, [logs]);
+  }, [buckets, bucket]);
 
   return (
     <div>
       <h3>Line Chart</h3>
+      <label>Bucket:</label>
+      <select value={bucket} onChange={(e) => setBucket(e.target.value)}>
+        <option value="second">Second</option>
+        <option value="minute">Minute</option>
+        <option value="hour">Hour</option>
+      </select>
       <canvas ref={chartRef} width={800} height={400}></canvas>
     </div>
   );
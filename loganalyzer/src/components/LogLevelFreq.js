@@ -2,17 +2,17 @@ import React from 'react';
 import './LogLevelFreq.css'
 
 /**
- * Log level frequency component that keeps track of the count
- * of log levels.
+ * Log level frequency component that shows the count of a log level,
+ * as rolled up by the server in its level counts.
  */
-const LogLevelFreq = ({ logs, logLevel }) => {
-  // Filter logs based on the specified log level
-  const filteredLogs = logs.filter(log => log.log_level === logLevel || (logLevel === 'WARNING' && log.log_level === 'WARN'));
+const LogLevelFreq = ({ levels, logLevel }) => {
+  // WARNING also counts the logs using the short WARN level
+  const count = (levels[logLevel] || 0) + (logLevel === 'WARNING' ? (levels.WARN || 0) : 0);
 
   return (
     <div className='log-level-freq-card'>
       <h3>{logLevel}</h3>
-      <p>Count: {filteredLogs.length}</p>
+      <p>Count: {count}</p>
     </div>
   );
 };
@@ -1,59 +1,41 @@
-import React, { useEffect, useState } from 'react';
+import React, { useState } from 'react';
 import './TableComponent.css';
 
 /**
- * Table component that shows all the logs in the following columns:
+ * Table component that shows one page of logs in the following columns:
  * - Timestamp
  * - Log Level
  * - Log message
  */
-const TableComponent = ({ logs, setLogs, originalLogs }) => {
+const TableComponent = ({ logs, setFilters, pagination, datasetId }) => {
   const [startTimestamp, setStartTimestamp] = useState('');
   const [endTimestamp, setEndTimestamp] = useState('');
   const [selectedLogLevel, setSelectedLogLevel] = useState(''); // Default to an empty string for showing all log levels
-
-  useEffect(() => {
-    // Sort original logs based on timestamp before setting in state
-    const sortedOriginalLogs = originalLogs.slice().sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
-    
-    console.log("helllo");
-    setLogs(sortedOriginalLogs);
-  }, []);
+  const [query, setQuery] = useState('');
 
   /**
-   * Handles the event of search button getting clicked.
+   * Handles the event of search button getting clicked. The filters are
+   * applied on the server, which sends back the first matching page.
    */
   const handleSearch = () => {
-    // Filter logs based on the timestamp range
-    const filteredLogs = originalLogs.filter(log => {
-      const logTimestamp = new Date(log.timestamp).getTime();
-      const startTimestampMillis = new Date(startTimestamp).getTime();
-      const endTimestampMillis = new Date(endTimestamp).getTime();
-      
-      const isWithinTimestampRange =
-      (!startTimestamp || logTimestamp >= startTimestampMillis) &&
-      (!endTimestamp || logTimestamp <= endTimestampMillis)
-
-      const isMatchingLogLevel = !selectedLogLevel || (log.log_level && log.log_level.toLowerCase()) === selectedLogLevel.toLowerCase() || (selectedLogLevel === 'WARNING' && log.log_level === 'WARN');
-      
-      return isWithinTimestampRange && isMatchingLogLevel;
+    setFilters({
+      start: startTimestamp,
+      end: endTimestamp,
+      level: selectedLogLevel,
+      q: query,
     });
-
-    // Sort filtered logs based on timestamp before updating the state
-    const sortedFilteredLogs = filteredLogs.slice().sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
-    // Update the state with the filtered logs
-    setLogs(sortedFilteredLogs);
   };
 
   /**
    * Handles the clear filter button click event.
    */
   const handleClearFilter = () => {
-    // Clear filter values and reset logs to the original state
+    // Clear filter values and show the first page of all logs again
     setStartTimestamp('');
     setEndTimestamp('');
     setSelectedLogLevel('');
-    setLogs(originalLogs);
+    setQuery('');
+    setFilters({});
   };
 
   const handleDownload = async () => {
@@ -69,6 +51,7 @@ const TableComponent = ({ logs, setLogs, originalLogs }) => {
       body: JSON.stringify({
         start_timestamp: startTimestamp,
         end_timestamp: endTimestamp,
+        dataset: datasetId,
       }),
     });
 
@@ -97,7 +80,6 @@ const TableComponent = ({ logs, setLogs, originalLogs }) => {
 
   return (
     <>
-    {console.log("---------------------" + originalLogs[originalLogs.length-1])}
       <div className='search-bar'>
           <label>Start Timestamp:</label>
           <input type="datetime-local" value={startTimestamp} onChange={(e) => setStartTimestamp(e.target.value)} />
@@ -113,6 +95,9 @@ const TableComponent = ({ logs, setLogs, originalLogs }) => {
             <option value="WARNING">WARNING</option>
             <option value="ERROR">ERROR</option>
           </select> 
+
+          <label>Message:</label>
+          <input type="text" value={query} placeholder='words or "a phrase"' onChange={(e) => setQuery(e.target.value)} />
       </div>
 
       <div className='filter-buttons'>
@@ -140,6 +125,15 @@ const TableComponent = ({ logs, setLogs, originalLogs }) => {
           </tbody>
         </table>
       </div>
+      <div className='pagination'>
+        <button onClick={pagination.onPrevious} disabled={!pagination.onPrevious}>Previous</button>
+        <span>
+          {pagination.total > 0
+            ? `${pagination.cursor + 1} - ${pagination.cursor + logs.length} of ${pagination.total}`
+            : '0 of 0'}
+        </span>
+        <button onClick={pagination.onNext} disabled={!pagination.onNext}>Next</button>
+      </div>
     </>
   );
 };
@@ -0,0 +1,282 @@
+"""
+Compact column-wise batches of parsed records.
+
+A parsed record is a dict with its own copy of every key and a string
+object per value, which costs a few hundred bytes per line. A RecordBatch
+holds the same records as array-backed columns instead, with the layout of
+the columnar store (see logparser.columnar):
+
+    timestamp     int64 epoch microseconds, plus the text in a text column
+    log_level     uint8 codes into a dictionary of the distinct levels
+    ip_address    uint32 codes into a dictionary of the distinct values
+    message       int64 end offsets into one utf-8 byte buffer
+    other fields  int64 for integers, text columns for strings
+
+Batches pickle to a small number of flat buffers, which is what the
+parallel parser sends back from its worker processes, and records() gives
+back dicts equal to the ones that were added, keys in the same order.
+
+A batch is prepared before it is written (see RecordBatch.prepare): what
+the writers derive from the records is computed from the batch as a whole
+where it was built, in a worker process when the log is parsed in parallel.
+That is the JSON text of the records, their masked messages, token posting
+lists and rollups, so that writing a batch is a few appends of whole
+buffers plus a template cache lookup per record.
+"""
+from array import array
+from itertools import accumulate
+import json
+
+from logparser.rollups import Rollups
+from logparser.templates import mask
+from logparser.text_index import INDEXED_FIELDS, batch_postings, tokenize_values
+from logparser.timestamps import to_epoch_us
+
+# Number of records per batch.
+BATCH_ROWS = 65536
+
+# String fields with few distinct values, stored dictionary-encoded.
+DICTIONARY_FIELDS = {'log_level': 'B', 'ip_address': 'I'}
+
+# Written before every record of the JSON array of 'output.json' but the
+# first, which gets "[\n  " instead.
+JSON_SEPARATOR = ",\n  "
+
+# Values json.dumps writes the same with and without indent.
+FLAT_TYPES = {str, int, float, bool, type(None)}
+# Encodes flat records with every key on a line of its own, see record_json.
+_flat_encoder = json.JSONEncoder(separators=(",\n    ", ": "))
+
+
+def record_json(record, default=None):
+    """
+    Return a record as it is written in the JSON array of 'output.json':
+    `json.dumps(record, indent=2, default=default)` indented by two more
+    spaces.
+
+    Records whose values are all flat are encoded by the C encoder, which
+    only runs without indent; the indented layout is then put around its
+    output. Any other record goes through the pure Python indenting encoder.
+    """
+    if record and all(type(value) in FLAT_TYPES for value in record.values()):
+        return "{\n    " + _flat_encoder.encode(record)[1:-1] + "\n  }"
+    return json.dumps(record, indent=2, default=default).replace("\n", "\n  ")
+
+
+class TextColumn:
+    """Strings as end offsets into one utf-8 buffer; None is kept aside."""
+
+    def __init__(self):
+        self.offsets = array('q')
+        self.data = bytearray()
+        self.missing = set()
+
+    @staticmethod
+    def accepts(value):
+        return value is None or type(value) is str
+
+    def append(self, value):
+        if value is None:
+            self.missing.add(len(self.offsets))
+        else:
+            self.data += value.encode('utf-8', 'surrogatepass')
+        self.offsets.append(len(self.data))
+
+    def values(self):
+        data = bytes(self.data)
+        values, start = [], 0
+        for end in self.offsets:
+            values.append(data[start:end].decode('utf-8', 'surrogatepass'))
+            start = end
+        for row in self.missing:
+            values[row] = None
+        return values
+
+
+class DictionaryColumn:
+    """Hashable values as integer codes into a list of the distinct values."""
+
+    def __init__(self, typecode):
+        self.codes = array(typecode)
+        self.dictionary = []
+        self.lookup = {}
+        self.max_codes = 2 ** (8 * self.codes.itemsize)
+
+    def accepts(self, value):
+        if type(value) not in (str, type(None)):
+            return False
+        return value in self.lookup or len(self.dictionary) < self.max_codes
+
+    def append(self, value):
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.append(code)
+
+    def values(self):
+        dictionary = self.dictionary
+        return [dictionary[code] for code in self.codes]
+
+
+class IntColumn:
+    """Integers that fit in int64."""
+
+    def __init__(self):
+        self.numbers = array('q')
+
+    @staticmethod
+    def accepts(value):
+        return type(value) is int and -2 ** 63 <= value < 2 ** 63
+
+    def append(self, value):
+        self.numbers.append(value)
+
+    def values(self):
+        return self.numbers.tolist()
+
+
+class ObjectColumn:
+    """Any other values, kept as they are."""
+
+    def __init__(self):
+        self.objects = []
+
+    @staticmethod
+    def accepts(value):
+        return True
+
+    def append(self, value):
+        self.objects.append(value)
+
+    def values(self):
+        return self.objects
+
+
+def _column_for(key, value):
+    if key in DICTIONARY_FIELDS:
+        return DictionaryColumn(DICTIONARY_FIELDS[key])
+    if TextColumn.accepts(value):
+        return TextColumn()
+    if IntColumn.accepts(value):
+        return IntColumn()
+    return ObjectColumn()
+
+
+class RecordBatch:
+    """
+    Records sharing the same keys, stored column by column.
+
+    Parameters:
+    - first_record (dict): The first record, which fixes the keys and the
+    column types of the batch.
+
+    Attributes:
+    - keys (tuple): The record keys, in order.
+    - columns (dict): The column of every key.
+    - timestamps (array): int64 epoch microseconds of the 'timestamp'
+    field, MISSING_EPOCH where missing or invalid.
+    - postings (dict): The token posting lists of the records (see
+    logparser.text_index.batch_postings), once the batch is prepared.
+    - masked (list): The message of every record with its variables masked
+    (see logparser.templates.mask), once the batch is prepared.
+    - json_text (str): The records as JSON array elements, each one after
+    a JSON_SEPARATOR, once the batch is prepared.
+    - json_ends (array): int64 end of every record in json_text.
+    - rollups (Rollups): The level counts and histograms of the records
+    (see logparser.rollups), once the batch is prepared.
+    """
+
+    def __init__(self, first_record):
+        self.keys = tuple(first_record)
+        self.columns = {key: _column_for(key, value) for key, value in first_record.items()}
+        self.timestamps = array('q')
+        self.rows = 0
+        self.postings = None
+        self.masked = None
+        self.json_text = None
+        self.json_ends = None
+        self.rollups = None
+        self.append(first_record)
+
+    def __len__(self):
+        return self.rows
+
+    def append(self, record):
+        """
+        Add a record, if it fits the batch.
+
+        Returns:
+        bool: False, with nothing added, when the record has other keys
+        than the batch or a value its column cannot hold.
+        """
+        if tuple(record) != self.keys:
+            return False
+        columns = self.columns
+        for key, value in record.items():
+            if not columns[key].accepts(value):
+                return False
+        for key, value in record.items():
+            columns[key].append(value)
+        self.timestamps.append(to_epoch_us(record.get('timestamp')))
+        self.rows += 1
+        return True
+
+    def values(self, key):
+        """Return the values of a field, None for the records without it."""
+        column = self.columns.get(key)
+        return column.values() if column else [None] * self.rows
+
+    def prepare(self, default=None):
+        """
+        Compute what the writers need from the records, see the module
+        docstring.
+
+        Parameters:
+        - default (callable): Serializer for values json cannot handle
+        natively.
+        """
+        texts = [record_json(record, default) for record in self.records()]
+        self.json_text = JSON_SEPARATOR + JSON_SEPARATOR.join(texts)
+        self.json_ends = array('q', accumulate(len(JSON_SEPARATOR) + len(text) for text in texts))
+
+        token_columns = []
+        for field in INDEXED_FIELDS:
+            column = self.columns.get(field)
+            if isinstance(column, DictionaryColumn):
+                # Every distinct value is tokenized once
+                tokens = tokenize_values(column.dictionary)
+                token_columns.append([tokens[code] for code in column.codes])
+            elif column is not None:
+                token_columns.append(tokenize_values(column.values()))
+        self.postings = batch_postings(token_columns) if token_columns else {}
+        self.masked = [mask(message or '') for message in self.values('message')]
+
+        self.rollups = Rollups()
+        for epoch, log_level in zip(self.timestamps, self.values('log_level')):
+            self.rollups.add(epoch, log_level)
+
+    def records(self):
+        """Return the records of the batch as dicts."""
+        keys = self.keys
+        return [
+            dict(zip(keys, values))
+            for values in zip(*(self.columns[key].values() for key in keys))
+        ]
+
+
+def batch_records(records, batch_rows=BATCH_ROWS):
+    """
+    Pack records into RecordBatches of at most batch_rows records.
+
+    A new batch is started whenever a record does not fit the current one,
+    so the records keep their order across the batches.
+    """
+    batch = None
+    for record in records:
+        if batch is None or len(batch) >= batch_rows or not batch.append(record):
+            if batch is not None:
+                yield batch
+            batch = RecordBatch(record)
+    if batch is not None:
+        yield batch
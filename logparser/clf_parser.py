@@ -1,8 +1,12 @@
-from datetime import datetime
 import re
 import json
+from logparser.metrics import stage
+from logparser.pipeline import block_parser, match_block, run_pipeline
+from logparser.timestamps import clf_to_iso, convert_distinct
 
 log_entry_pattern = re.compile(r'(\S+) - - \[([^\]]+)\] "(\S+ .*?)" (\d+) (\d+)')
+# log_entry_pattern for a whole block of lines, see parse_clf_lines
+block_pattern = re.compile(r'^(\S+) - - \[([^\]\n]+)\] "(\S+ .*?)" (\d+) (\d+)', re.MULTILINE)
 
 # log_entry_pattern = re.compile(r'(\S+) (-|\w+) (-|\w+) \[([^\]]+)\] "(\S+ .*?)" (\d+) (\d+)')
 def is_clf_log_entry(log_entry):
@@ -17,50 +21,56 @@ def parse_clf_log(log_entry):
         request = match.group(3)
         status_code = int(match.group(4))
         size = int(match.group(5))
-        log_level = ''
-        if status_code >= 200 and status_code <= 299:
-            log_level = 'INFO'
-        elif status_code >= 300 and status_code <= 399:
-            log_level = 'WARN'
-        else:
-            log_level = 'ERROR'
         return {
             "ip_address": ip_address,
             "timestamp": convert_to_iso_format(timestamp),
             "message": request,
-            "log_level": log_level,
+            "log_level": status_log_level(status_code),
+            "status": status_code,
             "size": size
         }
     else:
         print(f"Failed to match log entry: {log_entry}")
         return None
 
-def convert_to_iso_format(timestamp):
-    # Parse the timestamp using the format
-    timestamp_datetime = datetime.strptime(timestamp, "%d/%b/%Y:%H:%M:%S %z")
-
-    # Convert to ISO format
-    iso_format = timestamp_datetime.isoformat()
-
-    return iso_format
+@block_parser(parse_clf_log)
+def parse_clf_lines(lines):
+    # Batch version of parse_clf_log: one regex scan for all lines,
+    # timestamps, statuses and levels converted once per distinct value
+    matches, unmatched = match_block(block_pattern, lines)
+    with stage('timestamps'):
+        timestamps = convert_distinct(convert_to_iso_format, [match[1] for match in matches])
+    status_codes = {status: int(status) for status in {match[3] for match in matches}}
+    log_levels = {status: status_log_level(code) for status, code in status_codes.items()}
+    return [
+        {
+            "ip_address": ip_address,
+            "timestamp": timestamps[timestamp],
+            "message": request,
+            "log_level": log_levels[status],
+            "status": status_codes[status],
+            "size": int(size)
+        }
+        for ip_address, timestamp, request, status, size in matches
+    ], unmatched
 
-def clf_parser(input_file_path, output_file_path):
+def status_log_level(status_code):
+    if status_code >= 200 and status_code <= 299:
+        return 'INFO'
+    elif status_code >= 300 and status_code <= 399:
+        return 'WARN'
+    else:
+        return 'ERROR'
 
-    parsed_data_list = []
+def convert_to_iso_format(timestamp):
+    # Slice the fixed-layout timestamp, falling back to strptime if needed
+    return clf_to_iso(timestamp)
 
+def clf_parser(input_file_path, output_file_path, workers=1, progress=None):
     try:
-        with open(input_file_path, "r") as file:
-            # Read each line from the log file
-            for line in file:
-                # Parse the log entry
-                parsed_data = parse_clf_log(line.strip())
-                
-                if parsed_data:
-                    parsed_data_list.append(parsed_data)
-
-        # Save the parsed data to a JSON file
-        with open(output_file_path + '/output.json', "w") as json_file:
-            json.dump(parsed_data_list, json_file, indent=2)
+        # Stream each line through the parser straight into the JSON file
+        return run_pipeline(input_file_path, output_file_path, parse_clf_log, workers,
+                            progress=progress)
 
     except FileNotFoundError:
         print(f"File '{input_file_path}' not found.")
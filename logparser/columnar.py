@@ -0,0 +1,268 @@
+"""
+Columnar binary store written next to 'output.json'.
+
+The store is a folder of raw little-endian column files plus a small
+'meta.json' describing them:
+
+    timestamp.i8   int64 microseconds since the epoch (MISSING_EPOCH if none)
+    log_level.u1   uint8 code into meta['log_levels'] (MISSING_LEVEL if none)
+    message.off    int64 end offset of every message in message.bin
+    message.bin    utf-8 bytes of all messages back to back (lone surrogates
+                   of JSON logs are kept with 'surrogatepass')
+    record.off     int64 end offset of every record in the '../output.json'
+                   the store was written with
+    template.u4    uint32 template id of every message
+    templates.json the message templates (see logparser.templates)
+    rollups.json   level counts, and the per-second, minute and hour
+    rollups.*.i8   histograms (see logparser.rollups)
+    access.json    sketches of access log records, only for records with an
+                   'ip_address' (see logparser.sketches)
+    index/         inverted token index of the messages (see logparser.text_index)
+
+The files can be memory-mapped with numpy (`np.memmap(path, '<i8')`), so the
+backend never has to decode JSON or parse dates to filter and report on the
+parsed logs. The records themselves, with the timestamp text and every field
+the parser produced, are only decoded from 'output.json' for the rows a
+request returns.
+"""
+from array import array
+import json
+import os
+import shutil
+import sys
+
+from logparser.batch import TextColumn
+from logparser.rollups import Rollups
+from logparser.sketches import ACCESS_FILE, AccessSketches
+from logparser.templates import TEMPLATES_FILE, TemplateMiner
+from logparser.text_index import INDEX_FOLDER, IndexWriter
+
+STORE_FOLDER = 'store'
+
+# Level code of records without a log level.
+MISSING_LEVEL = 255
+
+# The number of rows buffered in memory before they are appended to disk.
+FLUSH_ROWS = 65536
+
+COLUMNS = {
+    'timestamp': ('timestamp.i8', '<i8'),
+    'log_level': ('log_level.u1', 'u1'),
+    'message_offsets': ('message.off', '<i8'),
+    'message_data': ('message.bin', 'u1'),
+    'template': ('template.u4', '<u4'),
+    'record_offsets': ('record.off', '<i8'),
+}
+
+
+def read_meta(store_folder):
+    """Return the contents of the 'meta.json' of a store, or None if missing."""
+    try:
+        with open(os.path.join(store_folder, 'meta.json'), 'r') as meta_file:
+            return json.load(meta_file)
+    except FileNotFoundError:
+        return None
+
+
+class ColumnarWriter:
+    """
+    Appends parsed records to a columnar store folder.
+
+    The columns are written to a temporary folder which replaces the store
+    folder when the writer is closed, so readers never see a partial store.
+
+    With append=True the records are added to the end of an existing store
+    instead. The column files are extended in place and 'meta.json' is
+    replaced last; readers only look at the first meta['rows'] rows, so
+    they see either the old or the new rows, never a partial write.
+    """
+
+    def __init__(self, store_folder, append=False):
+        self.store_folder = store_folder
+        self.append = append
+        self.log_levels = {}
+        self.rows = 0
+        self.message_end = 0
+        # End of the last record in 'output.json'
+        self.record_end = 0
+
+        if append:
+            meta = read_meta(store_folder)
+            self.rollups = Rollups.load(store_folder)
+            with open(os.path.join(store_folder, TEMPLATES_FILE), 'r') as templates_file:
+                self.templates = TemplateMiner.from_dict(json.load(templates_file))
+            try:
+                with open(os.path.join(store_folder, ACCESS_FILE), 'r') as access_file:
+                    self.access = AccessSketches.from_dict(json.load(access_file))
+            except FileNotFoundError:
+                self.access = AccessSketches()
+            self.log_levels = {level: code for code, level in enumerate(meta['log_levels'])}
+            self.rows = meta['rows']
+            self.temp_folder = store_folder
+            self.files = {
+                name: open(os.path.join(store_folder, file_name), 'r+b')
+                for name, (file_name, _) in COLUMNS.items()
+            }
+            if self.rows:
+                self.files['message_offsets'].seek((self.rows - 1) * 8)
+                self.message_end = int.from_bytes(
+                    self.files['message_offsets'].read(8), 'little')
+                self.files['record_offsets'].seek((self.rows - 1) * 8)
+                self.record_end = int.from_bytes(
+                    self.files['record_offsets'].read(8), 'little')
+            self.committed_sizes = self._column_sizes()
+            # Drop anything left behind by an append that did not finish
+            for name, file in self.files.items():
+                file.truncate(self.committed_sizes[name])
+                file.seek(0, os.SEEK_END)
+            self.index = IndexWriter(os.path.join(store_folder, INDEX_FOLDER), self.rows)
+        else:
+            self.rollups = Rollups()
+            self.templates = TemplateMiner()
+            self.access = AccessSketches()
+            self.temp_folder = store_folder + '.tmp'
+            shutil.rmtree(self.temp_folder, ignore_errors=True)
+            os.makedirs(self.temp_folder)
+            self.files = {
+                name: open(os.path.join(self.temp_folder, file_name), 'wb')
+                for name, (file_name, _) in COLUMNS.items()
+            }
+            self.index = IndexWriter(os.path.join(self.temp_folder, INDEX_FOLDER))
+        self._reset_buffers()
+
+    def _column_sizes(self):
+        return {
+            'timestamp': self.rows * 8,
+            'log_level': self.rows,
+            'message_offsets': self.rows * 8,
+            'message_data': self.message_end,
+            'template': self.rows * 4,
+            'record_offsets': self.rows * 8,
+        }
+
+    def _reset_buffers(self):
+        self.timestamps = array('q')
+        self.level_codes = array('B')
+        self.message_offsets = array('q')
+        self.message_data = bytearray()
+        self.template_ids = array('I')
+        self.record_offsets = array('q')
+
+    def write_batch(self, batch, record_ends):
+        """
+        Append the records of a prepared RecordBatch (see logparser.batch).
+
+        The columns of the batch are appended whole; only the template of
+        every message and the access log sketches are looked up record by
+        record.
+
+        Parameters:
+        - batch (RecordBatch): The prepared batch.
+        - record_ends (array): The offset in 'output.json' right after every
+        record, see JsonArrayWriter.write_batch.
+        """
+        rows = len(batch)
+        levels = batch.columns.get('log_level')
+        if levels is None:
+            self.level_codes.frombytes(bytes([MISSING_LEVEL]) * rows)
+        else:
+            # Translate the codes of the batch into the codes of the store
+            table = bytearray(range(256))
+            for batch_code, level in enumerate(levels.dictionary):
+                code = MISSING_LEVEL
+                if level:
+                    code = self.log_levels.get(level)
+                    if code is None:
+                        code = len(self.log_levels)
+                        if code >= MISSING_LEVEL:
+                            raise ValueError("Too many distinct log levels")
+                        self.log_levels[level] = code
+                table[batch_code] = code
+            self.level_codes.frombytes(levels.codes.tobytes().translate(table))
+
+        messages = batch.columns.get('message')
+        if isinstance(messages, TextColumn):
+            data, offsets = messages.data, messages.offsets
+        else:
+            data = bytearray()
+            offsets = array('q')
+            for message in batch.values('message'):
+                data += (message or '').encode('utf-8', 'surrogatepass')
+                offsets.append(len(data))
+        self.message_offsets.extend(map(self.message_end.__add__, offsets))
+        self.message_data += data
+        self.message_end += len(data)
+
+        self.timestamps.extend(batch.timestamps)
+        self.template_ids.extend(map(self.templates.add_masked, batch.masked))
+        self.record_offsets.extend(record_ends)
+        self.rollups.merge(batch.rollups)
+        self.index.add_postings(self.rows, batch.postings)
+        if 'ip_address' in batch.columns:
+            for epoch, ip_address, request, status, size in zip(
+                    batch.timestamps, batch.values('ip_address'), batch.values('message'),
+                    batch.values('status'), batch.values('size')):
+                if ip_address is not None:
+                    self.access.add(epoch, ip_address, request, status, size)
+        self.rows += rows
+
+        if len(self.timestamps) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        for column in (self.timestamps, self.message_offsets, self.template_ids,
+                       self.record_offsets):
+            if sys.byteorder == 'big':
+                column.byteswap()
+        self.timestamps.tofile(self.files['timestamp'])
+        self.level_codes.tofile(self.files['log_level'])
+        self.message_offsets.tofile(self.files['message_offsets'])
+        self.files['message_data'].write(self.message_data)
+        self.template_ids.tofile(self.files['template'])
+        self.record_offsets.tofile(self.files['record_offsets'])
+        self._reset_buffers()
+
+    def close(self):
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.index.close()
+
+        meta = {
+            'rows': self.rows,
+            'log_levels': list(self.log_levels),
+            'columns': {name: {'file': file_name, 'dtype': dtype}
+                        for name, (file_name, dtype) in COLUMNS.items()},
+        }
+        # The rollups, templates and sketches go first, 'meta.json' makes the
+        # new rows visible
+        self.rollups.save(self.temp_folder)
+        summaries = [(TEMPLATES_FILE, self.templates.to_dict(), None)]
+        if self.access.rows:
+            summaries.append((ACCESS_FILE, self.access.to_dict(), None))
+        for file_name, content, indent in summaries + [('meta.json', meta, 2)]:
+            temp_path = os.path.join(self.temp_folder, file_name + '.tmp')
+            with open(temp_path, 'w') as json_file:
+                json.dump(content, json_file, indent=indent)
+            os.replace(temp_path, os.path.join(self.temp_folder, file_name))
+
+        if self.append:
+            return
+
+        # Swap the finished store in place of the previous one
+        old_folder = self.store_folder + '.old'
+        shutil.rmtree(old_folder, ignore_errors=True)
+        if os.path.exists(self.store_folder):
+            os.rename(self.store_folder, old_folder)
+        os.rename(self.temp_folder, self.store_folder)
+        shutil.rmtree(old_folder, ignore_errors=True)
+
+    def abort(self):
+        self.index.abort()
+        if self.append:
+            for name, file in self.files.items():
+                file.truncate(self.committed_sizes[name])
+        for file in self.files.values():
+            file.close()
+        if not self.append:
+            shutil.rmtree(self.temp_folder, ignore_errors=True)
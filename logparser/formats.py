@@ -0,0 +1,189 @@
+"""
+Registry of the supported log formats and a sniffer that picks one.
+
+Every format is a LogFormat subclass registered with @register_format. The
+sniffer reads one sample block from the start of an opened file, scores
+every registered format against the lines of the sample and hands the same
+open file to the parser of the best scoring format:
+
+    with open_log(path) as source:
+        log_format = sniff_format(source, 'log')
+        log_format.parse(source, output_folder)
+
+Adding a format therefore only needs a new registered class.
+"""
+import json
+
+from logparser import clf_parser, hadoop_parser, hdfs_parser, zookeeper_parser
+from logparser.json_parser import json_parser
+
+# Bytes looked at to guess the format of a file.
+SAMPLE_SIZE = 64 * 1024
+# Maximum number of sample lines scored per format.
+SAMPLE_LINES = 50
+
+_json_decoder = json.JSONDecoder()
+
+FORMATS = []
+
+
+def register_format(format_class):
+    """Class decorator adding a LogFormat to the registry."""
+    FORMATS.append(format_class())
+    return format_class
+
+
+class LogFormat:
+    """
+    A log format the backend can parse.
+
+    Attributes:
+    - name (str): The name of the format.
+    - pattern: The compiled regex matching one log line, if line-oriented.
+    - parse_entry (callable): The per-line parser, if line-oriented.
+    - default_for (tuple): File extensions that fall back to this format
+    when no format recognizes the sample.
+    """
+    name = None
+    pattern = None
+    parse_entry = None
+    default_for = ()
+
+    def score(self, sample, lines):
+        """
+        Return how well the sample fits the format, between 0 and 1.
+
+        The default is the share of sample lines matched by the pattern.
+        """
+        if not lines or self.pattern is None:
+            return 0
+        return sum(1 for line in lines if self.pattern.match(line)) / len(lines)
+
+    def parse(self, source, output_folder, workers=1, progress=None):
+        """
+        Parse an opened log file into the output folder.
+
+        Returns:
+        int: The number of parsed records, or None if parsing failed.
+        """
+        raise NotImplementedError
+
+
+@register_format
+class HadoopFormat(LogFormat):
+    name = 'hadoop'
+    pattern = hadoop_parser.log_entry_pattern
+    parse_entry = staticmethod(hadoop_parser.parse_hadoop_log)
+
+    def parse(self, source, output_folder, workers=1, progress=None):
+        return hadoop_parser.hadoop_parser(source, output_folder, workers, progress)
+
+
+@register_format
+class ZookeeperFormat(LogFormat):
+    name = 'zookeeper'
+    pattern = zookeeper_parser.log_entry_pattern
+    parse_entry = staticmethod(zookeeper_parser.parse_zookeeper_log)
+
+    def parse(self, source, output_folder, workers=1, progress=None):
+        return zookeeper_parser.zookeeper_parser(source, output_folder, workers, progress)
+
+
+@register_format
+class HdfsFormat(LogFormat):
+    name = 'hdfs'
+    pattern = hdfs_parser.log_entry_pattern
+    parse_entry = staticmethod(hdfs_parser.parse_hdfs_log)
+
+    def parse(self, source, output_folder, workers=1, progress=None):
+        return hdfs_parser.hdfs_parser(source, output_folder, workers, progress)
+
+
+@register_format
+class ClfFormat(LogFormat):
+    name = 'clf'
+    pattern = clf_parser.log_entry_pattern
+    parse_entry = staticmethod(clf_parser.parse_clf_log)
+    default_for = ('log',)
+
+    def parse(self, source, output_folder, workers=1, progress=None):
+        return clf_parser.clf_parser(source, output_folder, workers, progress)
+
+
+@register_format
+class JsonFormat(LogFormat):
+    name = 'json'
+    default_for = ('json', 'ndjson', 'jsonl')
+
+    def score(self, sample, lines):
+        # The JSON parser reads a top-level array of log objects, or one
+        # object per line (NDJSON). Text logs can start with '[' too, as in
+        # '[2023-01-01 12:00:00] INFO ...', so the first object has to
+        # decode, followed by what comes after an object in either layout.
+        # A first object larger than the sample scores 0 and is left to
+        # the file extension.
+        text = sample.lstrip()
+        if text.startswith('['):
+            text = text[1:].lstrip()
+            if text.startswith(']'):
+                return 1
+            follows = (',', ']')
+        elif text.startswith('{'):
+            follows = ('{',)
+        else:
+            return 0
+        try:
+            first, end = _json_decoder.raw_decode(text)
+        except ValueError:
+            return 0
+        rest = text[end:].lstrip()
+        return 1 if isinstance(first, dict) and (not rest or rest.startswith(follows)) else 0
+
+    def parse(self, source, output_folder, workers=1, progress=None):
+        return json_parser(source, output_folder, progress)
+
+
+def sample_lines(source):
+    """
+    Return the start of an opened file as text and as a list of lines.
+
+    The sample is peeked from the buffered stream, so nothing is consumed
+    and the parser still reads the file from its first byte.
+    """
+    data = source.binary.peek(SAMPLE_SIZE)[:SAMPLE_SIZE]
+    sample = data.decode('utf-8', errors='replace')
+    lines = sample.splitlines()
+    if len(lines) > 1 and not sample.endswith('\n'):
+        # The last line was most likely cut off by the sample size
+        lines.pop()
+    lines = [line.strip() for line in lines if line.strip()]
+    return sample, lines[:SAMPLE_LINES]
+
+
+def sniff_format(source, file_extension=None):
+    """
+    Pick the registered format that fits the start of an opened file best.
+
+    Parameters:
+    - source (LogSource): The file, opened with open_log.
+    - file_extension (str): The extension of the file, used when no format
+    recognizes the sample.
+
+    Returns:
+    LogFormat: The best scoring format, or None if nothing fits.
+    """
+    sample, lines = sample_lines(source)
+
+    best_format, best_score = None, 0
+    for log_format in FORMATS:
+        score = log_format.score(sample, lines)
+        # Earlier registered formats win ties
+        if score > best_score:
+            best_format, best_score = log_format, score
+    if best_format:
+        return best_format
+
+    for log_format in FORMATS:
+        if file_extension in log_format.default_for:
+            return log_format
+    return None
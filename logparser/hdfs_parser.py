@@ -1,12 +1,17 @@
-from datetime import datetime
 import re
 import json
+from logparser.metrics import stage
+from logparser.pipeline import block_parser, match_block, run_pipeline
+from logparser.sources import open_log
+from logparser.timestamps import convert_distinct, hdfs_to_iso
 
 log_entry_pattern = re.compile(r'^(\d{6} \d{6}) (\d+) (\w+) (.+)$')
+# log_entry_pattern for a whole block of lines, see parse_hdfs_lines
+block_pattern = re.compile(r'^(\d{6} \d{6}) \d+ (\w+) (.+)$', re.MULTILINE)
 
 def is_hdfs_log_file(input_file_path):
     try:
-        with open(input_file_path, "r") as file:
+        with open_log(input_file_path) as file:
             for line in file:
                 # Parse the log entry
                 return bool(log_entry_pattern.match(line.strip()))
@@ -26,7 +31,7 @@ def parse_hdfs_log(log_entry):
         log_level = match.group(3)
         message = match.group(4)
 
-        formatted_date_time = datetime.strptime(unformatted_date_time, "%y%m%d %H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+        formatted_date_time = hdfs_to_iso(unformatted_date_time)
 
         return {
             "timestamp": formatted_date_time,
@@ -37,22 +42,23 @@ def parse_hdfs_log(log_entry):
         print(f"Failed to match log entry: {log_entry}")
         return None
 
-def hdfs_parser(input_file_path, output_file_path):
-    parsed_data_list = []
+@block_parser(parse_hdfs_log)
+def parse_hdfs_lines(lines):
+    # Batch version of parse_hdfs_log: one regex scan for all lines,
+    # timestamps converted once per second
+    matches, unmatched = match_block(block_pattern, lines)
+    with stage('timestamps'):
+        timestamps = convert_distinct(hdfs_to_iso, [match[0] for match in matches])
+    return [
+        {"timestamp": timestamps[timestamp], "log_level": log_level, "message": message}
+        for timestamp, log_level, message in matches
+    ], unmatched
 
+def hdfs_parser(input_file_path, output_file_path, workers=1, progress=None):
     try:
-        with open(input_file_path, "r") as file:
-            # Read each line from the log file
-            for line in file:
-                # Parse the log entry
-                parsed_data = parse_hdfs_log(line.strip())
-                
-                if parsed_data:
-                    parsed_data_list.append(parsed_data)
-
-        # Save the parsed data to a JSON file
-        with open(output_file_path + '/output.json', "w") as json_file:
-            json.dump(parsed_data_list, json_file, indent=2)
+        # Stream each line through the parser straight into the JSON file
+        return run_pipeline(input_file_path, output_file_path, parse_hdfs_log, workers,
+                            progress=progress)
 
     except FileNotFoundError:
         print(f"File '{input_file_path}' not found.")
@@ -0,0 +1,206 @@
+"""
+Incremental ingestion of line-oriented logs that keep growing.
+
+After every ingest a checkpoint of the source is saved as 'checkpoint.json'
+in the output folder:
+
+    source       name of the ingested file
+    inode        device and inode of the file when it was read
+    fingerprint  hash of the first bytes of the file
+    offset       number of bytes of the file read so far
+    partial      the last line, if it did not end with a newline yet
+    rows         number of records in the store after the ingest
+
+The checkpoint is also saved at the end of a full parse of an uncompressed
+line-oriented log (see run_pipeline), so the first append after an upload
+already only parses the new lines. When the same log is ingested again and
+its first bytes still match, only the bytes after the offset are parsed and
+appended to the existing outputs and rollups, so following a live log costs
+time proportional to the new data. A file that was truncated or rotated, or a different file, is parsed
+from the start and replaces the outputs.
+"""
+import hashlib
+import json
+import os
+
+from logparser.columnar import COLUMNS, STORE_FOLDER, read_meta
+from logparser.metrics import current_ingest
+from logparser.pipeline import PROGRESS_LINES, parse_lines, write_records
+from logparser.sources import open_log
+
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# Number of bytes at the start of a file that identify it.
+FINGERPRINT_SIZE = 4096
+
+
+def _fingerprint(file, size):
+    file.seek(0)
+    return hashlib.sha1(file.read(size)).hexdigest()
+
+
+def read_checkpoint(output_folder):
+    """Return the checkpoint saved in an output folder, or None."""
+    try:
+        with open(os.path.join(output_folder, CHECKPOINT_FILE), 'r') as checkpoint_file:
+            return json.load(checkpoint_file)
+    except FileNotFoundError:
+        return None
+
+
+def write_checkpoint(output_folder, checkpoint):
+    checkpoint_path = os.path.join(output_folder, CHECKPOINT_FILE)
+    temp_path = checkpoint_path + '.tmp'
+    with open(temp_path, 'w') as checkpoint_file:
+        json.dump(checkpoint, checkpoint_file)
+    os.replace(temp_path, checkpoint_path)
+
+
+def save_checkpoint(source_path, file, output_folder, offset, partial, rows):
+    """
+    Save the checkpoint of a log parsed up to an offset.
+
+    Parameters:
+    - source_path (str): The path of the log.
+    - file (file): The log opened in binary mode.
+    - output_folder (str): The folder of the outputs.
+    - offset (int): The number of bytes of the log parsed.
+    - partial (bytes): The unterminated last line, not parsed yet.
+    - rows (int): The number of records in the store.
+    """
+    fingerprint_size = min(FINGERPRINT_SIZE, offset)
+    file_stat = os.fstat(file.fileno())
+    write_checkpoint(output_folder, {
+        'source': os.path.basename(source_path),
+        'inode': [file_stat.st_dev, file_stat.st_ino],
+        'fingerprint': _fingerprint(file, fingerprint_size),
+        'fingerprint_size': fingerprint_size,
+        'offset': offset,
+        'partial': partial.decode('utf-8', 'surrogateescape'),
+        'rows': rows,
+    })
+
+
+def checkpoint_parse(input_file_path, output_folder, offset, rows):
+    """
+    Save the checkpoint of an uncompressed log parsed in full.
+
+    A log whose last line did not end with a newline gets no checkpoint:
+    that line was parsed as it was, so appending the rest of it could not
+    continue it, and the next append parses the log from the start.
+
+    Parameters:
+    - input_file_path (str): The path of the log.
+    - output_folder (str): The folder of the outputs.
+    - offset (int): The number of bytes of the log parsed.
+    - rows (int): The number of records written.
+    """
+    with open(input_file_path, 'rb') as file:
+        if offset:
+            file.seek(offset - 1)
+            if file.read(1) != b'\n':
+                return
+        save_checkpoint(input_file_path, file, output_folder, offset, b'', rows)
+
+
+def continues_checkpoint(source, checkpoint, output_folder):
+    """
+    Check whether an opened file is the checkpointed log with data added.
+
+    The file has to have the same name, be at least as large as the bytes
+    read before and start with the same bytes. The inode is not required
+    to match, so a re-uploaded copy of a grown log is picked up too.
+    """
+    if checkpoint is None or checkpoint['source'] != os.path.basename(source.path):
+        return False
+    if os.fstat(source.raw.fileno()).st_size < checkpoint['offset']:
+        return False
+    # The store must still hold exactly the rows the checkpoint describes
+    meta = read_meta(os.path.join(output_folder, STORE_FOLDER))
+    if meta is None or meta['rows'] != checkpoint['rows']:
+        return False
+    # A store written before a column existed is rebuilt
+    if set(meta['columns']) != set(COLUMNS):
+        return False
+    fingerprint = _fingerprint(source.raw, checkpoint['fingerprint_size'])
+    return fingerprint == checkpoint['fingerprint']
+
+
+class AppendedLines:
+    """
+    Iterates over the complete lines of a binary file after an offset.
+
+    Once iterated, `offset` is the position reached in the file,
+    `lines_read` the number of complete lines and `partial` holds the bytes
+    of an unterminated last line.
+    """
+
+    def __init__(self, file, offset, partial=b'', progress=None):
+        self.file = file
+        self.offset = offset
+        self.partial = partial
+        self.progress = progress
+        self.lines_read = 0
+
+    def __iter__(self):
+        self.file.seek(self.offset)
+        for line in self.file:
+            self.offset += len(line)
+            if not line.endswith(b'\n'):
+                self.partial += line
+                break
+            line, self.partial = self.partial + line, b''
+            yield line.decode('utf-8').strip()
+            self.lines_read += 1
+            if self.progress and self.lines_read % PROGRESS_LINES == 0:
+                self.progress(self.offset, self.lines_read)
+        if self.progress:
+            self.progress(self.offset, self.lines_read)
+
+
+def ingest_appended(input_file, output_folder, parse_entry, progress=None):
+    """
+    Parse what was appended to a log file since it was last ingested.
+
+    Only complete lines are parsed: an unterminated last line is kept in
+    the checkpoint and parsed once the rest of it has been written.
+
+    Parameters:
+    - input_file (str or LogSource): The path to the uncompressed log
+    file, or the file already opened with open_log.
+    - output_folder (str): The folder of the outputs and the checkpoint.
+    - parse_entry (callable): The per-line parser of the log format.
+    - progress (callable): Optional progress(bytes_read, lines_read) callback.
+
+    Returns:
+    tuple: The row number of the first new record (0 when the outputs were
+    rebuilt from the start of the file) and the number of new records.
+
+    Raises:
+    ValueError: If the file is compressed.
+    """
+    with open_log(input_file) as source:
+        if source.compression:
+            raise ValueError("Compressed logs cannot be ingested incrementally")
+
+        checkpoint = read_checkpoint(output_folder)
+        append = continues_checkpoint(source, checkpoint, output_folder)
+        if append:
+            offset = checkpoint['offset']
+            partial = checkpoint['partial'].encode('utf-8', 'surrogateescape')
+            first_row = checkpoint['rows']
+        else:
+            offset, partial, first_row = 0, b'', 0
+
+        lines = AppendedLines(source.raw, offset, partial, progress)
+        count = write_records(parse_lines(lines, parse_entry), output_folder,
+                              append=append)
+
+        stats = current_ingest()
+        if stats:
+            stats.lines += lines.lines_read
+            stats.bytes += lines.offset - offset
+
+        save_checkpoint(source.path, source.raw, output_folder, lines.offset,
+                        lines.partial, first_row + count)
+    return first_row, count
@@ -1,18 +1,76 @@
+from collections import Counter, defaultdict
+from itertools import chain, islice
 import json
 import re
 from datetime import datetime
 import os
+from logparser.metrics import current_ingest
+from logparser.pipeline import PROGRESS_LINES, write_records
+from logparser.sources import open_log
+
+# Timstamp pattern with time zone offset 0
+timestamp_pattern_with_offset_0 = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z)?')
+# Timstamp pattern without time zone offset
+timestamp_pattern_without_offset = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d{3})?')
+# Log level pattern for finding log level in values.
+log_level_pattern = re.compile(r'(INFO|Info|info|DEBUG|Debug|debug|ERROR|Error|error|WARNING|Warning|warning|WARN|Warn|warn)')
+
+# Keys whose string values are the message, unless they look like a
+# timestamp or a log level.
+MESSAGE_KEYS = ('message', 'content', 'description')
+# Number of records whose values decide the role of every key.
+LEARN_RECORDS = 100
+# Number of characters read at a time from a JSON log.
+READ_CHARS = 1024 * 1024
+
+WHITESPACE_PATTERN = re.compile(r'[ \t\n\r]*')
+# Delimiter after an array element: the comma, or the end of the array.
+ARRAY_DELIMITER_PATTERN = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+# Characters a number cut off at the end of a chunk could go on with.
+NUMBER_TAIL_PATTERN = re.compile(r'[0-9.eE+-]*')
+
+_decoder = json.JSONDecoder()
+
+
+def value_role(key, value):
+    """
+    Return the field a string value of a record goes to: 'timestamp',
+    'log_level', 'message', or None for any other value.
+    """
+    if timestamp_pattern_with_offset_0.match(value) or timestamp_pattern_without_offset.match(value):
+        return 'timestamp'
+    if log_level_pattern.match(value):
+        return 'log_level'
+    if key in MESSAGE_KEYS:
+        return 'message'
+    return None
+
+
+def learn_roles(log_entries):
+    """
+    Learn the role of every key from the string values of some records.
+
+    A key takes the role (see value_role) its values have most often, so
+    that a message which happens to start with 'Error' does not become the
+    log level.
+
+    Returns:
+    dict: The role of every key with string values.
+    """
+    votes = defaultdict(Counter)
+    for log_entry in log_entries:
+        for key, value in log_entry.items():
+            if isinstance(value, str):
+                votes[key][value_role(key, value)] += 1
+    return {key: counts.most_common(1)[0][0] for key, counts in votes.items()}
+
+
 """
 This function parses the log and extracts timestamp, log level and the message from the log.
+With roles (see learn_roles) the field of every value is looked up by its key; keys missing
+from roles are classified by their first string value and added to it.
 """
-def parse_json_log(log_entry):
-    # Timstamp pattern with time zone offset 0
-    timestamp_pattern_with_offset_0 = re.compile(r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z)?')
-    # Timstamp pattern without time zone offset
-    timestamp_pattern_without_offset = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d{3})?')
-    # Log level pattern for finding log level in values.
-    log_level_pattern = re.compile(r'(INFO|Info|info|DEBUG|Debug|debug|ERROR|Error|error|WARNING|Warning|warning|WARN|Warn|warn)')
-
+def parse_json_log(log_entry, roles=None):
     parsed_log = {
         "timestamp": None,
         "log_level": None,
@@ -21,21 +79,177 @@ def parse_json_log(log_entry):
 
     for key, value in log_entry.items():
         if isinstance(value, str):
-            if timestamp_pattern_with_offset_0.match(value) or timestamp_pattern_without_offset.match(value):
-                # print(f"{key}, {value}")
-                # parsed_log["timestamp"] = datetime.fromisoformat(value)
-                parsed_log["timestamp"] = value
-            elif log_level_pattern.match(value):
-                parsed_log["log_level"] = value
-            elif key == 'message' or key == 'content' or key == 'description':
-                # print(f"key is {key}")
-                parsed_log["message"] = value
+            if roles is None:
+                role = value_role(key, value)
+            elif key in roles:
+                role = roles[key]
+            else:
+                role = roles[key] = value_role(key, value)
+
+            if role:
+                parsed_log[role] = value
             else:
                 if not parsed_log["message"]:
                     parsed_log["not_message"] = value
 
     return parsed_log
 
+def parse_json_records(log_entries):
+    """
+    Parse JSON records, with the roles of their keys learned from the first
+    LEARN_RECORDS of them.
+    """
+    log_entries = iter(log_entries)
+    first_entries = list(islice(log_entries, LEARN_RECORDS))
+    roles = learn_roles(first_entries)
+    for log_entry in chain(first_entries, log_entries):
+        yield parse_json_log(log_entry, roles)
+
+
+class _JsonText:
+    """The text of a JSON document, read in chunks and consumed from the front."""
+
+    def __init__(self, file):
+        self.file = file
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+        self.read_chars = READ_CHARS
+
+    def more(self):
+        """Read the next chunk, or return False at the end of the file."""
+        chunk = self.file.read(self.read_chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character, '' at the end."""
+        while True:
+            self.pos = WHITESPACE_PATTERN.match(self.text, self.pos).end()
+            if self.pos < len(self.text) or not self.more():
+                return self.text[self.pos:self.pos + 1]
+
+    def decode(self):
+        """Decode the JSON value starting at the current position."""
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                # A number could go on in the next chunk
+                if (self.eof or type(value) not in (int, float)
+                        or not NUMBER_TAIL_PATTERN.fullmatch(self.text, end)):
+                    self.pos = end
+                    self.read_chars = READ_CHARS
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Read larger chunks while a value does not fit, so a huge
+            # value is not decoded over and over
+            if self.more():
+                self.read_chars *= 2
+
+    def error(self, message):
+        return json.JSONDecodeError(message, self.text, self.pos)
+
+
+def _json_values(text, array):
+    # The values of a sequence, or the elements of an array up to its end.
+    # Values followed by a complete delimiter are decoded straight from the
+    # buffer; the last one of every chunk goes through the careful path.
+    # The scanner raw_decode wraps, without its extra frame per value
+    scan_once = _decoder.scan_once
+    delimiter_pattern = ARRAY_DELIMITER_PATTERN if array else WHITESPACE_PATTERN
+    while True:
+        buffer, pos = text.text, text.pos
+        while True:
+            try:
+                value, end = scan_once(buffer, pos)
+            except (StopIteration, json.JSONDecodeError):
+                break
+            delimiter = delimiter_pattern.match(buffer, end)
+            if (delimiter is None or delimiter.end() == len(buffer)
+                    or (delimiter.end() == end and type(value) in (int, float))):
+                break
+            yield value
+            pos = delimiter.end()
+            if array and delimiter.group(1) == ']':
+                text.pos = pos
+                return
+
+        text.pos = pos
+        if not text.peek() and not array:
+            return
+        yield text.decode()
+        if array:
+            separator = text.peek()
+            text.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                text.pos -= 1
+                raise text.error("Expecting ',' delimiter")
+        text.peek()
+
+
+def _json_document(text):
+    # The records of a top-level array, or of a sequence of values
+    if text.peek() != '[':
+        yield from _json_values(text, array=False)
+        return
+    text.pos += 1
+    if text.peek() == ']':
+        text.pos += 1
+    else:
+        yield from _json_values(text, array=True)
+    if text.peek():
+        raise text.error("Extra data")
+
+
+def read_json_records(input_file, progress=None):
+    """
+    Yield the records of a JSON log one at a time, without loading the
+    whole document.
+
+    Two layouts are read:
+    - a top-level array of records, as written by json.dump, decoded one
+      element at a time,
+    - newline-delimited JSON (NDJSON), one record per line. Any sequence of
+      whitespace separated JSON values is accepted.
+
+    The layout is told by the first character: a log starting with '[' is a
+    top-level array. NDJSON whose first record is an array is therefore
+    read as one, its elements yielded as records, and the records after it
+    raise json.JSONDecodeError ("Extra data").
+
+    Parameters:
+    - input_file (str or LogSource): The path to the log file, or the file
+    already opened with open_log.
+    - progress (callable): Optional progress(bytes_read, records_read)
+    callback, called every PROGRESS_LINES records and at the end.
+
+    Raises:
+    json.JSONDecodeError: If the document is not valid JSON, with the
+    position within the chunk being decoded.
+    """
+    with open_log(input_file) as file:
+        count = 0
+        for record in _json_document(_JsonText(file)):
+            yield record
+            count += 1
+            if progress and count % PROGRESS_LINES == 0:
+                progress(file.bytes_read(), count)
+        if progress:
+            progress(file.bytes_read(), count)
+
+        stats = current_ingest()
+        if stats:
+            stats.lines += count
+            stats.bytes += file.bytes_read()
+
 """
 This function converts serializes the timestamp
 """
@@ -44,7 +258,7 @@ def datetime_serializer(obj):
         return obj.isoformat()
     raise TypeError("Type not serializable")
 
-def json_parser(input_file_path, output_file_path):
+def json_parser(input_file_path, output_file_path, progress=None):
     # Path to your JSON log file
     # log_file_path = 'sample_log.json'
     # log_file_path = input_file_path
@@ -52,8 +266,6 @@ def json_parser(input_file_path, output_file_path):
     # # output_json_file_path = './output/output.json'
     # output_json_file_path = output_file_path
 
-    parsed_logs = []
-
     # try:
     #     with open(log_file_path, 'r') as file:
     #         logs = json.load(file)
@@ -75,14 +287,12 @@ def json_parser(input_file_path, output_file_path):
     #     print(f"An unexpected error occurred: {e}")
 
     try:
-        with open(input_file_path, 'r') as file:
-            logs = json.load(file)
-            for log_entry in logs:
-                parsed_logs.append(parse_json_log(log_entry))
-
-        with open(output_file_path+"/output.json", 'w') as output_file:
-            json.dump(parsed_logs, output_file, indent=2, default=datetime_serializer)
-            print(f"Parsed logs saved to {output_file_path}")
+        # Decode and parse the entries lazily so they are written out as
+        # they are produced
+        parsed_logs = parse_json_records(read_json_records(input_file_path, progress))
+        count = write_records(parsed_logs, output_file_path, default=datetime_serializer)
+        print(f"Parsed logs saved to {output_file_path}")
+        return count
 
     except FileNotFoundError:
         print(f"File '{input_file_path}' not found.")
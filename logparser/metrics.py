@@ -0,0 +1,341 @@
+"""
+Lightweight counters, gauges and latency histograms, exposed in the
+Prometheus text format.
+
+Metrics are created once, at import time, on the module wide REGISTRY and
+updated in place under a lock, so recording a value costs a dict lookup and
+an addition. REGISTRY.render() returns the text a Prometheus server scrapes:
+
+    REQUESTS = REGISTRY.counter('requests_total', 'Requests answered.', ('route',))
+    REQUESTS.inc(route='/logs')
+
+The parse pipeline reports what an ingest did through an IngestStats, made
+current for the thread running the ingest by track_ingest. The stages of the
+pipeline add the time they spend with `with stage(name):` and count the
+lines and bytes they read; when no ingest is tracked (a parse worker
+process, a benchmark) they record nothing. An ingest adds to the metrics
+once, when it ends:
+
+    logparser_lines_read_total         lines read (records for JSON)
+    logparser_bytes_read_total         bytes read from the file on disk
+    logparser_records_written_total    records written to the outputs
+    logparser_unmatched_lines_total    lines read but not written
+    logparser_stage_seconds            seconds per ingest in every stage
+    logparser_ingest_lines_per_second  throughput of the last ingest
+    logparser_ingest_bytes_per_second
+"""
+import bisect
+from contextlib import contextmanager
+import math
+import threading
+import time
+
+# Upper bounds in seconds of the latency histogram buckets, from a few
+# milliseconds to ten minutes.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60,
+                   120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _labels_text(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """
+    A named metric with one value per combination of label values.
+
+    Parameters:
+    - name (str): The metric name.
+    - documentation (str): The help text of the metric.
+    - labels (tuple): The names of its labels, all of which have to be given
+    whenever the metric is updated.
+    """
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} takes the labels {', '.join(self.labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def value(self, **labels):
+        """Return the current value for the given label values, or None."""
+        with self.lock:
+            return self.values.get(self._key(labels))
+
+    def samples(self):
+        """Yield (name suffix, label pairs, value) of every sample."""
+        with self.lock:
+            values = sorted(self.values.items())
+        if not values and not self.labels:
+            values = [((), 0)]
+        for key, value in values:
+            yield '', list(zip(self.labels, key)), value
+
+    def render(self):
+        """Return the metric in the Prometheus text format."""
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.metric_type}']
+        for suffix, pairs, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_labels_text(pairs)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that is set to whatever it currently is."""
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class CallbackMetric(Metric):
+    """
+    A metric without labels whose value is read from a callback when it is
+    rendered, for counters kept elsewhere.
+    """
+
+    def __init__(self, name, documentation, callback, metric_type='gauge'):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self.metric_type = metric_type
+
+    def samples(self):
+        yield '', [], self.callback()
+
+
+class Histogram(Metric):
+    """
+    Counts of observed values in cumulative buckets, with their sum.
+
+    Parameters:
+    - buckets (tuple): The increasing upper bounds of the buckets; a +Inf
+    bucket is always added.
+    """
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [[0] * (len(self.buckets) + 1), 0]
+            counts[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the body of a with statement."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self.lock:
+            values = sorted((key, (list(counts), total))
+                            for key, (counts, total) in self.values.items())
+        for key, (counts, total) in values:
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield '_bucket', pairs + [('le', _format_value(float(bound)))], cumulative
+            yield '_sum', pairs, total
+            yield '_count', pairs, cumulative
+
+
+class Registry:
+    """
+    The metrics of a process, rendered together.
+
+    Creating a metric that already exists with the same type returns the
+    existing one, so a module can be imported more than once.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_add(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None and type(existing) is type(metric):
+                return existing
+            if existing is not None:
+                raise ValueError(f"Metric '{metric.name}' is already registered "
+                                 f"as a {existing.metric_type}")
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labels=()):
+        return self._get_or_add(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=()):
+        return self._get_or_add(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_add(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name, documentation, callback, metric_type='gauge'):
+        """Register a CallbackMetric, replacing an earlier one of the same name."""
+        metric = CallbackMetric(name, documentation, callback, metric_type)
+        with self.lock:
+            self.metrics[name] = metric
+        return metric
+
+    def render(self):
+        """Return all the metrics in the Prometheus text format."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return ''.join(metric.render() + '\n' for metric in metrics)
+
+
+REGISTRY = Registry()
+
+LINES_READ = REGISTRY.counter(
+    'logparser_lines_read_total', 'Lines read from log files, records for JSON logs.',
+    ('format',))
+BYTES_READ = REGISTRY.counter(
+    'logparser_bytes_read_total', 'Bytes of log files read from disk.', ('format',))
+RECORDS_WRITTEN = REGISTRY.counter(
+    'logparser_records_written_total', 'Parsed records written to the outputs.',
+    ('format',))
+UNMATCHED_LINES = REGISTRY.counter(
+    'logparser_unmatched_lines_total', 'Lines read that did not match the log format.',
+    ('format',))
+INGESTS = REGISTRY.counter(
+    'logparser_ingests_total', 'Ingests of log files by result.', ('format', 'result'))
+STAGE_SECONDS = REGISTRY.histogram(
+    'logparser_stage_seconds',
+    'Seconds an ingest spent in every parse stage; timestamps is part of parse '
+    'and total covers the whole ingest.',
+    ('format', 'stage'))
+LINES_PER_SECOND = REGISTRY.gauge(
+    'logparser_ingest_lines_per_second', 'Lines read per second by the last ingest.',
+    ('format',))
+BYTES_PER_SECOND = REGISTRY.gauge(
+    'logparser_ingest_bytes_per_second', 'Bytes read per second by the last ingest.',
+    ('format',))
+
+_local = threading.local()
+
+
+class IngestStats:
+    """
+    What one ingest read and wrote, and the time it spent in every stage.
+
+    Attributes:
+    - log_format (str): The name of the log format being parsed.
+    - lines (int): The number of lines read, records for JSON logs.
+    - bytes (int): The number of bytes read from the file on disk.
+    - records (int): The number of records written.
+    - seconds (dict): The seconds spent in every stage.
+    """
+
+    def __init__(self, log_format):
+        self.log_format = log_format
+        self.lines = 0
+        self.bytes = 0
+        self.records = 0
+        self.seconds = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage_name, seconds):
+        self.seconds[stage_name] = self.seconds.get(stage_name, 0) + seconds
+
+    def finish(self, result):
+        """Add the ingest to the metrics; result is 'done' or 'failed'."""
+        total = time.perf_counter() - self.started
+        log_format = self.log_format
+        LINES_READ.inc(self.lines, format=log_format)
+        BYTES_READ.inc(self.bytes, format=log_format)
+        RECORDS_WRITTEN.inc(self.records, format=log_format)
+        UNMATCHED_LINES.inc(max(self.lines - self.records, 0), format=log_format)
+        INGESTS.inc(format=log_format, result=result)
+        for stage_name, seconds in self.seconds.items():
+            STAGE_SECONDS.observe(seconds, format=log_format, stage=stage_name)
+        STAGE_SECONDS.observe(total, format=log_format, stage='total')
+        if total:
+            LINES_PER_SECOND.set(self.lines / total, format=log_format)
+            BYTES_PER_SECOND.set(self.bytes / total, format=log_format)
+
+
+def current_ingest():
+    """Return the IngestStats tracked on this thread, or None."""
+    return getattr(_local, 'ingest', None)
+
+
+@contextmanager
+def track_ingest(log_format='unknown'):
+    """
+    Track the ingest run in the body of a with statement on this thread.
+
+    The ingest counts as failed if the body raises. The format can be set
+    on the IngestStats once it is known.
+
+    Example:
+    >>> with track_ingest('hdfs') as stats:
+    ...     log_format.parse(source, output_folder)
+    """
+    stats = IngestStats(log_format)
+    _local.ingest = stats
+    result = 'failed'
+    try:
+        yield stats
+        result = 'done'
+    finally:
+        _local.ingest = None
+        stats.finish(result)
+
+
+@contextmanager
+def stage(stage_name):
+    """
+    Add the time spent in the body of a with statement to a stage of the
+    ingest tracked on this thread, if there is one.
+    """
+    stats = current_ingest()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(stage_name, time.perf_counter() - started)
@@ -0,0 +1,132 @@
+"""
+Multi-core parsing for large line-oriented log files.
+
+The file is split into byte ranges whose boundaries fall right after a
+newline, the ranges are parsed in a process pool and the parsed records are
+yielded back in file order. Only a bounded number of ranges is in flight at
+any time, so memory stays proportional to chunk_size * workers.
+
+The worker processes are started from a fork server (or spawned where
+there is none), never forked from the parsing process itself: that runs
+in a thread of a multithreaded backend, and a forked child could inherit
+locks other threads held at the time (logging, the metrics, the job state)
+and deadlock on them.
+"""
+from collections import deque
+import io
+import multiprocessing
+import os
+
+from logparser.metrics import current_ingest, stage
+from logparser.pipeline import parse_lines, prepare_batches, split_lines
+
+# Size of the byte range handed to a worker process in one go.
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+# How the worker processes are started, see the module docstring.
+START_METHOD = ('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods()
+                else 'spawn')
+
+
+def split_byte_ranges(input_file_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split a file into (start, end) byte ranges aligned to line boundaries.
+
+    Every range except the last ends right after a newline, so no line is
+    ever split between two ranges.
+
+    Parameters:
+    - input_file_path (str): The path to the log file.
+    - chunk_size (int): The approximate size of every range in bytes.
+
+    Returns:
+    list: The (start, end) byte offsets of the ranges, in file order.
+    """
+    file_size = os.path.getsize(input_file_path)
+    ranges = []
+
+    with open(input_file_path, "rb") as file:
+        start = 0
+        while start < file_size:
+            end = start + chunk_size
+            if end >= file_size:
+                end = file_size
+            else:
+                # Move the boundary forward to the end of the current line
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+
+    return ranges
+
+
+def parse_byte_range(input_file_path, start, end, parse_entry):
+    """
+    Parse the lines in one byte range of a file.
+
+    The range is decoded the same way `open(input_file_path, "r")` decodes
+    the whole file, so the records are identical to the serial path.
+
+    Returns:
+    tuple: The parsed records of the range in file order, packed in
+    RecordBatches (see logparser.batch) which are far smaller to send back
+    from a worker process than dicts and already prepared to be written,
+    and the number of lines in the range.
+    """
+    with open(input_file_path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+
+    lines = split_lines(io.TextIOWrapper(io.BytesIO(data)).read())
+    return list(prepare_batches(parse_lines(lines, parse_entry))), len(lines)
+
+
+def parallel_parse(input_file_path, parse_entry, workers,
+                   chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Parse a log file in a process pool and yield the records in file order,
+    in prepared RecordBatches.
+
+    Parameters:
+    - input_file_path (str): The path to the log file.
+    - parse_entry (callable): The per-line parser. It has to be a module
+    level function so that it can be sent to the worker processes.
+    - workers (int): The number of worker processes.
+    - chunk_size (int): The approximate size of a byte range in bytes.
+    - progress (callable): Optional progress(bytes_read, lines_read)
+    callback, called whenever a range has been parsed.
+    """
+    ranges = split_byte_ranges(input_file_path, chunk_size)
+    lines_read = 0
+    stats = current_ingest()
+
+    def collect(result, start, end):
+        nonlocal lines_read
+        # The workers are not tracked: the time waited for them stands in
+        # for reading and parsing
+        with stage('workers'):
+            batches, line_count = result.get()
+        lines_read += line_count
+        if stats:
+            stats.lines += line_count
+            stats.bytes += end - start
+        if progress:
+            progress(end, lines_read)
+        return batches
+
+    with multiprocessing.get_context(START_METHOD).Pool(workers) as pool:
+        pending = deque()
+        for start, end in ranges:
+            # Keep a couple of ranges per worker queued, but no more, so the
+            # parsed results never pile up faster than they are written.
+            if len(pending) >= workers * 2:
+                yield from collect(*pending.popleft())
+            pending.append((pool.apply_async(
+                parse_byte_range,
+                (input_file_path, start, end, parse_entry)
+            ), start, end))
+
+        while pending:
+            yield from collect(*pending.popleft())
@@ -0,0 +1,513 @@
+"""
+Streaming parse pipeline shared by all the log parsers.
+
+Every parser is built from the same stages:
+
+    read_blocks -> parse_blocks -> prepare_batches -> write_records
+
+Each stage is a generator (or consumes one), so a block of lines is read,
+matched, normalized and written before the next block is looked at. The
+memory used while parsing therefore stays flat no matter how large the
+input file is.
+
+prepare_batches packs the records into RecordBatches and computes from
+every batch as a whole what the writers derive from its records (see
+logparser.batch), so that writing stays a few appends per batch. The
+parallel parser prepares its batches in the worker processes.
+
+Line formats parse a whole block at a time when they register a batch
+version of their per-line parser with block_parser: the block is matched
+with one regex scan and its fields are converted column by column, which
+saves most of the interpreter work spent on every line.
+
+The stages add the time they take and what they read and wrote to the
+ingest tracked on their thread, if any (see logparser.metrics).
+"""
+from array import array
+from itertools import chain, islice
+import os
+import re
+import time
+
+from logparser.batch import JSON_SEPARATOR, RecordBatch, batch_records, record_json
+from logparser.columnar import STORE_FOLDER, ColumnarWriter
+from logparser.metrics import current_ingest, stage
+from logparser.sources import LogSource, is_compressed, open_log
+
+
+# Number of lines read between two progress reports.
+PROGRESS_LINES = 10000
+# Number of characters read at a time by read_blocks.
+BLOCK_CHARS = 4 * 1024 * 1024
+# Number of lines parsed at a time by parse_lines.
+BLOCK_LINES = 10000
+
+# Characters written before every record of a JSON array, "[\n  " or ",\n  ".
+SEPARATOR_CHARS = len(JSON_SEPARATOR)
+
+# Batch versions of the per-line parsers, see block_parser.
+BLOCK_PARSERS = {}
+# The block patterns extended to match every line, see match_block.
+LINE_PATTERNS = {}
+
+
+def read_lines(input_file, progress=None):
+    """
+    Yield the stripped lines of a log file one at a time.
+
+    Compressed files are decompressed while they are read (see
+    logparser.sources).
+
+    Parameters:
+    - input_file (str or LogSource): The path to the log file, or the file
+    already opened with open_log.
+    - progress (callable): Optional progress(bytes_read, lines_read)
+    callback, called every PROGRESS_LINES lines and at the end of the file.
+    """
+    with open_log(input_file) as file:
+        lines_read = 0
+        for line in file:
+            yield line.strip()
+            lines_read += 1
+            if progress and lines_read % PROGRESS_LINES == 0:
+                progress(file.bytes_read(), lines_read)
+        if progress:
+            progress(file.bytes_read(), lines_read)
+
+
+def split_lines(text):
+    """
+    Split decoded text into stripped lines, the lines iterating over the
+    file would give.
+
+    Example:
+    >>> split_lines(' a\\n\\nb \\n')
+    ['a', '', 'b']
+    """
+    lines = text.split('\n')
+    if not lines[-1]:
+        lines.pop()
+    return list(map(str.strip, lines))
+
+
+def read_blocks(input_file, progress=None):
+    """
+    Yield the stripped lines of a log file in lists of about BLOCK_CHARS
+    characters.
+
+    Parameters:
+    - input_file (str or LogSource): The path to the log file, or the file
+    already opened with open_log.
+    - progress (callable): Optional progress(bytes_read, lines_read)
+    callback, called after every block.
+    """
+    with open_log(input_file) as file:
+        lines_read = 0
+        partial = ''
+        while True:
+            with stage('read'):
+                text = file.read(BLOCK_CHARS)
+                # Keep the unterminated end of the block for the next one
+                end = text.rfind('\n') + 1
+                lines = split_lines(partial + text[:end]) if end else None
+            if not text:
+                break
+            if lines is None:
+                partial += text
+                continue
+            partial = text[end:]
+            lines_read += len(lines)
+            yield lines
+            if progress:
+                progress(file.bytes_read(), lines_read)
+        if partial:
+            lines_read += 1
+            yield split_lines(partial)
+        if progress:
+            progress(file.bytes_read(), lines_read)
+
+        stats = current_ingest()
+        if stats:
+            stats.lines += lines_read
+            stats.bytes += file.bytes_read()
+
+
+def block_parser(parse_entry):
+    """
+    Register a function as the batch version of a per-line parser.
+
+    The function takes a list of stripped lines and returns a tuple
+    (records, unmatched): the records of the lines matching the format,
+    exactly the ones parse_entry would return for them, and the lines it did
+    not match as match_block gives them. Those are parsed one at a time with
+    parse_entry, which reports the lines that failed, and their records, if
+    any, put in their place.
+
+    Example:
+    >>> @block_parser(parse_hdfs_log)
+    ... def parse_hdfs_lines(lines):
+    ...     ...
+    """
+    def register(parse_block):
+        BLOCK_PARSERS[parse_entry] = parse_block
+        return parse_block
+    return register
+
+
+def match_block(block_pattern, lines):
+    """
+    Match all the lines of a block with one scan of a pattern.
+
+    The pattern is compiled with re.MULTILINE, starts with '^' and must not
+    match a newline (no '\\s', '[^\\n]' in negated classes), so that it
+    matches every line at most once, exactly as it matches the line alone.
+    It has at least two groups, the first never empty, which tells the
+    lines it matches from the others in the same scan.
+
+    Returns:
+    tuple: (matches, unmatched), the groups of the match of every line the
+    pattern matches, and a (position, line) tuple for every other line,
+    position being the number of matched lines before it.
+    """
+    # The pattern or nothing: every line is matched once, the lines the
+    # pattern does not match with all their groups empty
+    line_pattern = LINE_PATTERNS.get(block_pattern)
+    if line_pattern is None:
+        line_pattern = re.compile('^(?:' + block_pattern.pattern[1:] + '|)', block_pattern.flags)
+        LINE_PATTERNS[block_pattern] = line_pattern
+    if not lines:
+        return [], []
+    line_matches = line_pattern.findall('\n'.join(lines))
+    missed = ('',) * block_pattern.groups
+    unmatched_count = line_matches.count(missed)
+    if not unmatched_count:
+        return line_matches, []
+
+    matches = []
+    unmatched = []
+    start = 0
+    for _ in range(unmatched_count):
+        index = line_matches.index(missed, start)
+        matches += line_matches[start:index]
+        unmatched.append((len(matches), lines[index]))
+        start = index + 1
+    matches += line_matches[start:]
+    return matches, unmatched
+
+
+def merge_unmatched(records, unmatched, parse_entry):
+    """
+    Parse the lines a block parser did not match with parse_entry and put
+    their records, if any, among the others in line order.
+
+    Parameters:
+    - records (list): The records of the matched lines.
+    - unmatched (list): (position, line) tuples, see match_block.
+    - parse_entry (callable): The per-line parser.
+    """
+    merged = []
+    start = 0
+    for position, line in unmatched:
+        merged.extend(records[start:position])
+        start = position
+        parsed_data = parse_entry(line)
+        if parsed_data:
+            merged.append(parsed_data)
+    merged.extend(records[start:])
+    return merged
+
+
+def parse_blocks(blocks, parse_entry):
+    """
+    Parse lists of lines and yield the parsed records.
+
+    Blocks go through the batch parser registered for parse_entry (see
+    block_parser), if there is one, and only the lines it does not match
+    are parsed one at a time.
+
+    Parameters:
+    - blocks (iterable): Lists of log lines to parse.
+    - parse_entry (callable): Returns a record dict for a line, or None if
+    the line does not match the log format.
+    """
+    parse_block = BLOCK_PARSERS.get(parse_entry)
+    for lines in blocks:
+        with stage('parse'):
+            if parse_block:
+                records, unmatched = parse_block(lines)
+                if unmatched:
+                    records = merge_unmatched(records, unmatched, parse_entry)
+            else:
+                records = [parsed_data for parsed_data in map(parse_entry, lines) if parsed_data]
+        yield from records
+
+
+def parse_lines(lines, parse_entry):
+    """
+    Run every line through a parser function and yield the parsed records.
+
+    The lines are parsed BLOCK_LINES at a time by parse_blocks.
+
+    Parameters:
+    - lines (iterable): The log lines to parse.
+    - parse_entry (callable): Returns a record dict for a line, or None if
+    the line does not match the log format.
+    """
+    lines = iter(lines)
+    blocks = iter(lambda: list(islice(lines, BLOCK_LINES)), [])
+    return parse_blocks(blocks, parse_entry)
+
+
+def prepare_batches(records, default=None):
+    """
+    Pack parsed records into RecordBatches and prepare them to be written
+    (see RecordBatch.prepare).
+
+    The time spent preparing is added to the stage 'prepare' of the tracked
+    ingest.
+
+    Parameters:
+    - records (iterable): The parsed records.
+    - default (callable): Serializer for values json cannot handle natively.
+    """
+    for batch in batch_records(records):
+        with stage('prepare'):
+            batch.prepare(default)
+        yield batch
+
+
+class JsonArrayWriter:
+    """
+    Incrementally writes records as a JSON array.
+
+    The output is byte for byte what `json.dump(records, file, indent=2)`
+    would produce, but only one record, or the JSON text of one prepared
+    RecordBatch, is held in memory at a time.
+
+    The writer counts the characters it writes, which are also the bytes:
+    json.dumps escapes everything outside ASCII. write returns the offset
+    right after the record (write_batch those of all the records of the
+    batch), and every record is preceded by a separator of
+    SEPARATOR_CHARS characters, so the records can be read back one at a
+    time from the file (see backend.store).
+    """
+
+    def __init__(self, file, default=None, continued=False, position=0):
+        self.file = file
+        self.default = default
+        self.count = 0
+        # Whether the file already holds the open, non-empty array written
+        # by an earlier run
+        self.continued = continued
+        self.position = position
+
+    def write(self, record):
+        text = record_json(record, self.default)
+        self.file.write("[\n  " if not (self.count or self.continued) else JSON_SEPARATOR)
+        self.file.write(text)
+        self.count += 1
+        self.position += SEPARATOR_CHARS + len(text)
+        return self.position
+
+    def write_batch(self, batch):
+        """
+        Write the prepared JSON text of a RecordBatch.
+
+        Returns:
+        array: The offset right after every record of the batch.
+        """
+        text = batch.json_text
+        if not (self.count or self.continued):
+            text = "[\n  " + text[SEPARATOR_CHARS:]
+        self.file.write(text)
+        record_ends = array('q', map(self.position.__add__, batch.json_ends))
+        self.count += len(batch)
+        self.position += len(text)
+        return record_ends
+
+    def close(self):
+        self.file.write("\n]" if self.count or self.continued else "[]")
+
+
+class JsonOutput:
+    """
+    Writes records to 'output.json' in an output folder.
+
+    The records go to a temporary file which replaces 'output.json' only
+    when the output is closed, so a failed parse never leaves a truncated
+    output file behind.
+
+    With append=True the records are added to the array of the existing
+    'output.json' in place, after its first `end` bytes: the offset right
+    after the last record the store holds. Whatever an interrupted append
+    left past it is dropped, and aborting restores the closed array.
+    """
+
+    def __init__(self, output_folder, default=None, append=False, end=0):
+        self.output_path = output_folder + '/output.json'
+        self.temp_path = self.output_path + '.tmp'
+        self.append = append and os.path.exists(self.output_path)
+        self.end = end
+
+        if self.append:
+            # Reopen the array by cutting it after its last committed record
+            with open(self.output_path, 'rb+') as file:
+                file.truncate(end)
+            # No newline translation, so that offsets are positions in the file
+            self.file = open(self.output_path, "a", newline="")
+            self.writer = JsonArrayWriter(self.file, default=default,
+                                          continued=end > 0, position=end)
+        else:
+            self.file = open(self.temp_path, "w", newline="")
+            self.writer = JsonArrayWriter(self.file, default=default)
+
+    def write(self, record):
+        """Write a record and return the offset in the file right after it."""
+        return self.writer.write(record)
+
+    def write_batch(self, batch):
+        """
+        Write a prepared RecordBatch and return the offsets in the file right
+        after its records.
+        """
+        return self.writer.write_batch(batch)
+
+    def close(self):
+        self.writer.close()
+        self.file.close()
+        if not self.append:
+            os.replace(self.temp_path, self.output_path)
+
+    def abort(self):
+        self.file.close()
+        if self.append:
+            with open(self.output_path, 'rb+') as file:
+                file.truncate(self.end)
+                file.seek(0, os.SEEK_END)
+                file.write(b"\n]" if self.end else b"[]")
+        else:
+            os.remove(self.temp_path)
+
+
+def write_records(records, output_folder, default=None, append=False):
+    """
+    Write records to the output folder as they are produced.
+
+    Every record is written to 'output.json' and to the columnar store
+    (see logparser.columnar), which keeps the offset of the record in
+    'output.json'. Both are only replaced once the whole input has been
+    parsed, 'output.json' first, so the rows of the store never point past
+    the end of the file.
+
+    The time spent writing each output, but not producing the records, is
+    added to the stages 'write_store' and 'write_json' of the tracked ingest.
+
+    Parameters:
+    - records (iterable): The parsed records, or RecordBatches of records
+    already prepared (see prepare_batches), but not a mix of both.
+    - output_folder (str): The folder in which the outputs are stored.
+    - default (callable): Serializer for values json cannot handle natively.
+    - append (bool): Add the records to the existing outputs instead of
+    replacing them.
+
+    Returns:
+    int: The number of records written.
+    """
+    records = iter(records)
+    first = next(records, None)
+    batches = chain([first] if first is not None else [], records)
+    if not isinstance(first, RecordBatch):
+        batches = prepare_batches(batches, default)
+
+    # The store is opened first: it checks an existing store can be appended
+    # to before 'output.json' is reopened, and knows where its records end
+    store = ColumnarWriter(os.path.join(output_folder, STORE_FOLDER), append=append)
+    json_output = JsonOutput(output_folder, default=default, append=append,
+                             end=store.record_end)
+    outputs = [json_output, store]
+    count = 0
+    store_seconds = json_seconds = 0
+    clock = time.perf_counter
+
+    try:
+        for batch in batches:
+            started = clock()
+            record_ends = json_output.write_batch(batch)
+            written = clock()
+            store.write_batch(batch, record_ends)
+            json_seconds += written - started
+            store_seconds += clock() - written
+            count += len(batch)
+    except BaseException:
+        for output in outputs:
+            output.abort()
+        raise
+
+    with stage('close'):
+        for output in outputs:
+            output.close()
+
+    stats = current_ingest()
+    if stats:
+        stats.records += count
+        stats.add('write_store', store_seconds)
+        stats.add('write_json', json_seconds)
+    return count
+
+
+def run_pipeline(input_file, output_folder, parse_entry, workers=1,
+                 chunk_size=None, progress=None):
+    """
+    Stream a line-oriented log file through a parser into 'output.json'.
+
+    Parameters:
+    - input_file (str or LogSource): The path to the log file, or the file
+    already opened with open_log.
+    - output_folder (str): The folder in which 'output.json' is stored.
+    - parse_entry (callable): The per-line parser of the log format.
+    - workers (int): The number of processes to parse with. Files smaller
+    than a single chunk and compressed files are always parsed serially.
+    - chunk_size (int): The size of the byte ranges handed to the workers.
+    - progress (callable): Optional progress(bytes_read, lines_read) callback.
+
+    Returns:
+    int: The number of records written.
+
+    Notes:
+    - The checkpoint of an uncompressed log is saved with the outputs, so
+    that lines appended to it later can be parsed alone (see
+    logparser.incremental).
+    """
+    # Imported here since logparser.parallel and logparser.incremental
+    # build on this module
+    from logparser.incremental import checkpoint_parse
+    from logparser.parallel import DEFAULT_CHUNK_SIZE, parallel_parse
+
+    if isinstance(input_file, LogSource):
+        input_file_path = input_file.path
+        compressed = input_file.compression is not None
+    else:
+        input_file_path = input_file
+        compressed = is_compressed(input_file_path)
+
+    # Both paths report the bytes parsed in the end, which the checkpoint
+    # records: the log may have grown since
+    bytes_parsed = 0
+
+    def parsed(bytes_read, lines_read):
+        nonlocal bytes_parsed
+        bytes_parsed = bytes_read
+        if progress:
+            progress(bytes_read, lines_read)
+
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    if workers > 1 and os.path.getsize(input_file_path) > chunk_size and not compressed:
+        # The workers read their byte ranges themselves
+        records = parallel_parse(input_file_path, parse_entry, workers,
+                                 chunk_size, parsed)
+    else:
+        records = parse_blocks(read_blocks(input_file, parsed), parse_entry)
+    count = write_records(records, output_folder)
+    if not compressed:
+        checkpoint_parse(input_file_path, output_folder, bytes_parsed, count)
+    return count
@@ -0,0 +1,222 @@
+"""
+Level counts and time-bucket histograms computed while a log is parsed.
+
+The rollups are saved in the columnar store, so the dashboard cards and
+charts can be drawn from aggregated numbers instead of the raw records:
+
+    rollups.json         rows, {level: count}, the level names of the
+                         histograms and the file of every histogram
+    rollups.second.i8    int64 (bucket start in epoch seconds, level, count)
+    rollups.minute.i8    triples, one per non-zero count, in (start, level)
+    rollups.hour.i8      order; level indexes 'histogram_levels'
+
+A log spanning days has hundreds of thousands of per-second buckets, so
+every histogram is a file of its own that can be memory-mapped with numpy
+and bisected by start time (see backend.store), and 'rollups.json' stays
+small. Level names are only ever added to the end of 'histogram_levels',
+so a histogram file written by an append running alongside a reader
+holds no level the reader cannot name, except new ones, which it skips.
+"""
+from array import array
+from collections import Counter
+import json
+import os
+import sys
+
+from logparser.timestamps import MISSING_EPOCH
+
+ROLLUPS_FILE = 'rollups.json'
+# Histogram of every bucket size, see the module docstring.
+HISTOGRAM_FILE = 'rollups.{}.i8'
+
+# Bucket sizes that can be asked for, in seconds.
+BUCKET_SIZES = {'second': 1, 'minute': 60, 'hour': 3600}
+
+# Number of distinct (second, level) counters kept before the per-second
+# histogram is dropped in favour of the per-minute one, to bound memory.
+MAX_SECOND_COUNTERS = 86400 * 4
+
+
+class Rollups:
+    """
+    Streaming per-level counts and per-second/minute/hour level histograms.
+
+    Only one counter is updated per record: per-second counts are kept while
+    they fit in MAX_SECOND_COUNTERS and the coarser histograms are derived
+    from them when the rollups are saved.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.level_counts = Counter()
+        self.second_counts = Counter()
+        self.minute_counts = None
+        # Level names of the saved histograms, in the order they were added
+        self.histogram_levels = []
+
+    @classmethod
+    def load(cls, store_folder):
+        """
+        Load the rollups saved in a store folder, so that more records can
+        be counted into them.
+        """
+        with open(os.path.join(store_folder, ROLLUPS_FILE), 'r') as rollups_file:
+            saved = json.load(rollups_file)
+        rollups = cls()
+        rollups.rows = saved['rows']
+        rollups.level_counts = Counter(saved['levels'])
+        if 'buckets' in saved:
+            # Saved before the histograms had files of their own
+            histograms = saved['buckets']
+            histogram_levels = None
+        else:
+            histograms = saved['histograms']
+            histogram_levels = saved['histogram_levels']
+            rollups.histogram_levels = histogram_levels
+
+        def counts(bucket):
+            if histogram_levels is None:
+                return _from_histogram(histograms[bucket])
+            return _read_histogram(os.path.join(store_folder, histograms[bucket]),
+                                   histogram_levels)
+
+        if histograms['second'] is None:
+            rollups.second_counts = None
+            rollups.minute_counts = counts('minute')
+        else:
+            rollups.second_counts = counts('second')
+        return rollups
+
+    def add(self, epoch, log_level):
+        """
+        Count a record.
+
+        Parameters:
+        - epoch (int): The record timestamp in microseconds since the epoch.
+        - log_level (str): The record log level, or None.
+        """
+        self.rows += 1
+        if not log_level:
+            return
+        self.level_counts[log_level] += 1
+        if epoch == MISSING_EPOCH:
+            return
+
+        second = epoch // 1_000_000
+        if self.minute_counts is None:
+            self.second_counts[second, log_level] += 1
+            if len(self.second_counts) > MAX_SECOND_COUNTERS:
+                self.minute_counts = _coarsen(self.second_counts, 60)
+                self.second_counts = None
+        else:
+            self.minute_counts[second - second % 60, log_level] += 1
+
+    def merge(self, other):
+        """
+        Add the rollups of the records that follow, as if their records had
+        been counted one by one (see logparser.batch).
+        """
+        self.rows += other.rows
+        self.level_counts.update(other.level_counts)
+        if self.minute_counts is None and other.minute_counts is None:
+            self.second_counts.update(other.second_counts)
+            if len(self.second_counts) > MAX_SECOND_COUNTERS:
+                self.minute_counts = _coarsen(self.second_counts, 60)
+                self.second_counts = None
+            return
+        if self.minute_counts is None:
+            self.minute_counts = _coarsen(self.second_counts, 60)
+            self.second_counts = None
+        if other.minute_counts is None:
+            self.minute_counts.update(_coarsen(other.second_counts, 60))
+        else:
+            self.minute_counts.update(other.minute_counts)
+
+    def save(self, store_folder):
+        """
+        Save the rollups in a store folder, the histograms first and
+        'rollups.json' last, every file replaced at once.
+        """
+        if self.minute_counts is None:
+            minute_counts = _coarsen(self.second_counts, 60)
+        else:
+            minute_counts = self.minute_counts
+        hour_counts = _coarsen(minute_counts, 3600)
+
+        # New levels go after the ones readers may already know
+        histogram_levels = self.histogram_levels + sorted(
+            {log_level for _, log_level in minute_counts} - set(self.histogram_levels))
+        codes = {log_level: code for code, log_level in enumerate(histogram_levels)}
+
+        histograms = {}
+        for bucket, counts in (('second', self.second_counts), ('minute', minute_counts),
+                               ('hour', hour_counts)):
+            file_name = HISTOGRAM_FILE.format(bucket)
+            path = os.path.join(store_folder, file_name)
+            if counts is None:
+                histograms[bucket] = None
+                continue
+            _write_histogram(path, counts, codes)
+            histograms[bucket] = file_name
+
+        _replace_json(os.path.join(store_folder, ROLLUPS_FILE), {
+            'rows': self.rows,
+            'levels': dict(self.level_counts),
+            'histogram_levels': histogram_levels,
+            'histograms': histograms,
+        })
+        self.histogram_levels = histogram_levels
+        if histograms['second'] is None:
+            # Dropped once the log spans too long a time
+            try:
+                os.remove(os.path.join(store_folder, HISTOGRAM_FILE.format('second')))
+            except FileNotFoundError:
+                pass
+
+
+def _coarsen(counts, size):
+    coarse = Counter()
+    for (second, log_level), count in counts.items():
+        coarse[second - second % size, log_level] += count
+    return coarse
+
+
+def _write_histogram(path, counts, codes):
+    # {(second, level): count} -> int64 (second, level code, count) rows
+    rows = array('q')
+    for (second, log_level), count in sorted(counts.items(),
+                                             key=lambda item: (item[0][0], codes[item[0][1]])):
+        rows.extend((second, codes[log_level], count))
+    if sys.byteorder == 'big':
+        rows.byteswap()
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as histogram_file:
+        rows.tofile(histogram_file)
+    os.replace(temp_path, path)
+
+
+def _read_histogram(path, histogram_levels):
+    rows = array('q')
+    with open(path, 'rb') as histogram_file:
+        rows.frombytes(histogram_file.read())
+    if sys.byteorder == 'big':
+        rows.byteswap()
+    counts = Counter()
+    for second, code, count in zip(rows[0::3], rows[1::3], rows[2::3]):
+        counts[second, histogram_levels[code]] = count
+    return counts
+
+
+def _replace_json(path, content):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as json_file:
+        json.dump(content, json_file)
+    os.replace(temp_path, path)
+
+
+def _from_histogram(buckets):
+    counts = Counter()
+    for second, level_counts in buckets:
+        for log_level, count in level_counts.items():
+            counts[second, log_level] = count
+    return counts
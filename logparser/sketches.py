@@ -0,0 +1,467 @@
+"""
+Fixed-memory summaries of access logs computed while they are parsed.
+
+Every record of a web access log carries the client address, the request,
+the status and the response size. Rather than keeping every row to answer
+"who are the busiest clients" or "how large are the responses", an ingest
+feeds them into small sketches whose size does not depend on the number of
+lines:
+
+    top clients and paths  Space-Saving heavy hitters (Metwally et al., 2005)
+    distinct clients       HyperLogLog (Flajolet et al., 2007), overall and
+                           per time bucket
+    response sizes         DDSketch quantiles (Masson et al., VLDB 2019)
+    statuses               exact counts, there are only a few hundred codes
+
+Every sketch merges with another one built with the same parameters, and
+the merge summarizes the union of both streams, so sketches of byte ranges,
+appended chunks or several files can be combined. The sketches are saved as
+'access.json' in the columnar store.
+"""
+import base64
+from collections import Counter
+import hashlib
+import math
+
+from logparser.timestamps import MISSING_EPOCH
+
+ACCESS_FILE = 'access.json'
+
+# Counters kept by a Space-Saving sketch after it is pruned; up to twice as
+# many are held between two prunes.
+TOP_CAPACITY = 1000
+# HyperLogLog precision of the distinct clients of the whole log, 2 ** 14
+# one-byte registers for a standard error of 0.8%.
+HLL_PRECISION = 14
+# HyperLogLog precision of every time bucket, 2 KB for a 2.3% error.
+BUCKET_PRECISION = 11
+# Initial size in seconds of the distinct client buckets. The size doubles
+# whenever there would be more than MAX_DISTINCT_BUCKETS buckets.
+DISTINCT_BUCKET_SECONDS = 3600
+MAX_DISTINCT_BUCKETS = 2048
+# Relative error of the response size quantiles, and the number of DDSketch
+# bins kept before the lowest ones are folded together.
+SIZE_RELATIVE_ACCURACY = 0.01
+MAX_SIZE_BINS = 2048
+# Client addresses whose hash is remembered, to hash every address once.
+MAX_CACHED_HASHES = 100000
+# Quantiles reported by AccessSketches.summary.
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+# 2 ** -rank of every possible register value.
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+def hash64(value):
+    """Return a 64-bit hash of a string, the same in every process."""
+    digest = hashlib.blake2b(value.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def request_path(request):
+    """
+    Return the path of an HTTP request line, without its query string, or
+    None if the text is not a request line.
+
+    Example:
+    >>> request_path('GET /search?q=logs HTTP/1.1')
+    '/search'
+    """
+    parts = request.split(' ', 2)
+    if len(parts) < 2 or not parts[1]:
+        return None
+    return parts[1].split('?', 1)[0]
+
+
+class SpaceSaving:
+    """
+    Approximate counts of the most frequent values of a stream.
+
+    Up to 2 * capacity counters are kept. When there are more, only the
+    capacity largest ones are kept, and a value seen afterwards starts
+    counting from the largest dropped count, its error. The count of a
+    value is never below its true count, and at most its error above it.
+
+    Parameters:
+    - capacity (int): The number of counters kept after a prune.
+    """
+
+    def __init__(self, capacity=TOP_CAPACITY):
+        self.capacity = capacity
+        # value -> [count, error]
+        self.counts = {}
+        self.floor = 0
+
+    def add(self, value, count=1):
+        entry = self.counts.get(value)
+        if entry is not None:
+            entry[0] += count
+            return
+        self.counts[value] = [self.floor + count, self.floor]
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        ranked = sorted(self.counts.items(), key=lambda item: item[1][0], reverse=True)
+        self.floor = max(self.floor, ranked[self.capacity][1][0])
+        self.counts = dict(ranked[:self.capacity])
+
+    def merge(self, other):
+        """Add the counts of another sketch, as if its values had been added."""
+        for value, entry in self.counts.items():
+            if value not in other.counts:
+                entry[0] += other.floor
+                entry[1] += other.floor
+        for value, (count, error) in other.counts.items():
+            entry = self.counts.get(value)
+            if entry is None:
+                self.counts[value] = [count + self.floor, error + self.floor]
+            else:
+                entry[0] += count
+                entry[1] += error
+        self.floor += other.floor
+        if len(self.counts) > 2 * self.capacity:
+            self._prune()
+
+    def top(self, k):
+        """Return the k values with the largest counts, as dicts."""
+        ranked = sorted(self.counts.items(), key=lambda item: item[1][0], reverse=True)
+        return [{'value': value, 'count': count, 'error': error}
+                for value, (count, error) in ranked[:k]]
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'floor': self.floor,
+            'counts': [[value, count, error] for value, (count, error) in self.counts.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, saved):
+        sketch = cls(saved['capacity'])
+        sketch.floor = saved['floor']
+        sketch.counts = {value: [count, error] for value, count, error in saved['counts']}
+        return sketch
+
+
+class HyperLogLog:
+    """
+    Approximate count of the distinct values of a stream.
+
+    Parameters:
+    - precision (int): The log2 of the number of registers; the standard
+    error is about 1.04 / sqrt(2 ** precision).
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add_hash(self, hashed):
+        """Add a value by its hash64."""
+        bits = 64 - self.precision
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        index = hashed >> bits
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLogs of different precisions")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def copy(self):
+        sketch = HyperLogLog(self.precision)
+        sketch.registers = bytearray(self.registers)
+        return sketch
+
+    def count(self):
+        """Return the estimated number of distinct values."""
+        registers = self.registers
+        m = len(registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m \
+            / sum(map(_INVERSE_POWERS.__getitem__, registers))
+        zeros = registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_dict(self):
+        return {'precision': self.precision,
+                'registers': base64.b64encode(self.registers).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, saved):
+        sketch = cls(saved['precision'])
+        sketch.registers = bytearray(base64.b64decode(saved['registers']))
+        return sketch
+
+
+class DDSketch:
+    """
+    Quantiles of non-negative values with a bounded relative error.
+
+    Every positive value is counted in the bin ceil(log_gamma(value)), so
+    the quantiles are within relative_accuracy of the true values. When
+    there are more than max_bins bins the lowest ones are folded together,
+    which only loses accuracy on the smallest values.
+
+    Parameters:
+    - relative_accuracy (float): The relative error of the quantiles.
+    - max_bins (int): The maximum number of bins kept.
+    """
+
+    def __init__(self, relative_accuracy=SIZE_RELATIVE_ACCURACY, max_bins=MAX_SIZE_BINS):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_bins = max_bins
+        self.bins = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        bins = self.bins
+        bins[key] = bins.get(key, 0) + 1
+        if len(bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        keys = sorted(self.bins)
+        folded = len(keys) - self.max_bins
+        self.bins[keys[folded]] += sum(self.bins.pop(key) for key in keys[:folded])
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge DDSketches of different accuracies")
+        for key, count in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        if len(self.bins) > self.max_bins:
+            self._collapse()
+
+    def quantile(self, q):
+        """Return the estimated q-quantile, or None if nothing was added."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if rank < seen:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.bins) / (self.gamma + 1)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'zeros': self.zeros,
+            'count': self.count,
+            'bins': [[key, count] for key, count in sorted(self.bins.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, saved):
+        sketch = cls(saved['relative_accuracy'], saved['max_bins'])
+        sketch.zeros = saved['zeros']
+        sketch.count = saved['count']
+        sketch.bins = {key: count for key, count in saved['bins']}
+        return sketch
+
+
+def _count_quantile(counts, q):
+    # The q-quantile of values given with their exact counts
+    total = sum(counts.values())
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if rank < seen:
+            return value
+
+
+class AccessSketches:
+    """
+    The sketches of the records of an access log.
+
+    Records are added with add; the sketches of two logs are combined with
+    merge.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.clients = SpaceSaving()
+        self.paths = SpaceSaving()
+        self.distinct_clients = HyperLogLog(HLL_PRECISION)
+        self.bucket_seconds = DISTINCT_BUCKET_SECONDS
+        # bucket start in epoch seconds -> HyperLogLog of its clients
+        self.bucket_clients = {}
+        self.statuses = Counter()
+        self.sizes = DDSketch()
+        self.hashes = {}
+
+    def add(self, epoch, ip_address, request=None, status=None, size=None):
+        """
+        Add an access log record.
+
+        Parameters:
+        - epoch (int): The record timestamp in microseconds since the epoch.
+        - ip_address (str): The client address.
+        - request (str): The request line, if any.
+        - status: The response status code, if any.
+        - size (int): The response size in bytes, if any. Values that are
+        not numbers are left out.
+        """
+        self.rows += 1
+        self.clients.add(ip_address)
+        path = request_path(request) if request else None
+        if path is not None:
+            self.paths.add(path)
+
+        hashed = self.hashes.get(ip_address)
+        if hashed is None:
+            if len(self.hashes) >= MAX_CACHED_HASHES:
+                self.hashes.clear()
+            hashed = self.hashes[ip_address] = hash64(ip_address)
+        self.distinct_clients.add_hash(hashed)
+        if epoch != MISSING_EPOCH:
+            second = epoch // 1_000_000
+            bucket = second - second % self.bucket_seconds
+            sketch = self.bucket_clients.get(bucket)
+            if sketch is None:
+                sketch = self.bucket_clients[bucket] = HyperLogLog(BUCKET_PRECISION)
+            sketch.add_hash(hashed)
+            if len(self.bucket_clients) > MAX_DISTINCT_BUCKETS:
+                self._coarsen(self.bucket_seconds * 2)
+
+        if status is not None:
+            self.statuses[str(status)] += 1
+        if isinstance(size, (int, float)):
+            self.sizes.add(size)
+
+    def _coarsen(self, bucket_seconds):
+        # Merge the buckets into buckets of a larger size, a multiple of the
+        # current one
+        buckets = self.bucket_clients
+        self.bucket_clients = {}
+        self.bucket_seconds = bucket_seconds
+        self._merge_buckets(buckets, copy=False)
+
+    def _merge_buckets(self, buckets, copy=True):
+        size = self.bucket_seconds
+        for start, sketch in buckets.items():
+            bucket = start - start % size
+            existing = self.bucket_clients.get(bucket)
+            if existing is None:
+                self.bucket_clients[bucket] = sketch.copy() if copy else sketch
+            else:
+                existing.merge(sketch)
+        if len(self.bucket_clients) > MAX_DISTINCT_BUCKETS:
+            self._coarsen(size * 2)
+
+    def merge(self, other):
+        """Add the sketches of another access log to these ones."""
+        self.rows += other.rows
+        self.clients.merge(other.clients)
+        self.paths.merge(other.paths)
+        self.distinct_clients.merge(other.distinct_clients)
+        # Bucket sizes are the initial size times a power of two, so the
+        # smaller one divides the larger one
+        if other.bucket_seconds > self.bucket_seconds:
+            self._coarsen(other.bucket_seconds)
+        self._merge_buckets(other.bucket_clients)
+        self.statuses.update(other.statuses)
+        self.sizes.merge(other.sizes)
+
+    def summary(self, top=10, start=None, end=None):
+        """
+        Return what the sketches tell about the access log.
+
+        Parameters:
+        - top (int): The number of top clients and paths.
+        - start (int): Optional window start in microseconds since the epoch.
+        - end (int): Optional window end in microseconds since the epoch.
+
+        Returns:
+        dict: The top clients and paths with their counts and errors, the
+        distinct client count (within the window if given, to the bucket
+        size), the distinct clients of every bucket overlapping the window,
+        the status counts and the status and size quantiles.
+
+        Notes:
+        - The window only applies to the distinct clients; the other
+        sketches cover the whole log.
+        """
+        size = self.bucket_seconds
+        buckets = [
+            (second, sketch) for second, sketch in sorted(self.bucket_clients.items())
+            if (start is None or (second + size) * 1_000_000 > start)
+            and (end is None or second * 1_000_000 <= end)
+        ]
+        if start is None and end is None:
+            distinct = self.distinct_clients.count()
+        elif buckets:
+            window = buckets[0][1].copy()
+            for _, sketch in buckets[1:]:
+                window.merge(sketch)
+            distinct = window.count()
+        else:
+            distinct = 0
+
+        statuses = {int(code): count for code, count in self.statuses.items() if code.isdigit()}
+        return {
+            'rows': self.rows,
+            'top_clients': self.clients.top(top),
+            'top_paths': self.paths.top(top),
+            'distinct_clients': distinct,
+            'bucket_seconds': size,
+            'distinct_clients_per_bucket': [[second, sketch.count()] for second, sketch in buckets],
+            'statuses': dict(sorted(self.statuses.items())),
+            'status_quantiles': {f'p{round(q * 100)}': _count_quantile(statuses, q)
+                                 for q in QUANTILES},
+            'size_quantiles': {f'p{round(q * 100)}': self.sizes.quantile(q) for q in QUANTILES},
+        }
+
+    def to_dict(self):
+        """Return the sketches in the layout saved to 'access.json'."""
+        return {
+            'rows': self.rows,
+            'clients': self.clients.to_dict(),
+            'paths': self.paths.to_dict(),
+            'distinct_clients': self.distinct_clients.to_dict(),
+            'bucket_seconds': self.bucket_seconds,
+            'bucket_clients': [[second, sketch.to_dict()]
+                               for second, sketch in sorted(self.bucket_clients.items())],
+            'statuses': dict(self.statuses),
+            'sizes': self.sizes.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, saved):
+        """Rebuild the sketches from a saved 'access.json'."""
+        sketches = cls()
+        sketches.rows = saved['rows']
+        sketches.clients = SpaceSaving.from_dict(saved['clients'])
+        sketches.paths = SpaceSaving.from_dict(saved['paths'])
+        sketches.distinct_clients = HyperLogLog.from_dict(saved['distinct_clients'])
+        sketches.bucket_seconds = saved['bucket_seconds']
+        sketches.bucket_clients = {second: HyperLogLog.from_dict(sketch)
+                                   for second, sketch in saved['bucket_clients']}
+        sketches.statuses = Counter(saved['statuses'])
+        sketches.sizes = DDSketch.from_dict(saved['sizes'])
+        return sketches
@@ -0,0 +1,134 @@
+"""
+Opening of input log files, compressed or not.
+
+Rotated logs are usually stored compressed. The compression is detected
+from the magic bytes at the start of the file (not its name) and the
+content is decompressed while it is streamed, so a compressed log never
+needs a decompressed copy on disk.
+
+Supported: gzip, bz2, xz and zstd (zstd needs the optional 'zstandard'
+package on Pythons without the compression.zstd module).
+"""
+import bz2
+import gzip
+import io
+import lzma
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Size of the read buffers of both the raw file and the decompressed stream.
+READ_BUFFER_SIZE = 1024 * 1024
+
+MAGIC_BYTES = {
+    'gzip': b'\x1f\x8b',
+    'bz2': b'BZh',
+    'xz': b'\xfd7zXZ\x00',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+
+# File name extensions of compressed logs.
+COMPRESSED_EXTENSIONS = {'gz', 'bz2', 'xz', 'zst'}
+
+
+def detect_compression(header):
+    """
+    Return the compression of a file from its first bytes, or None.
+
+    Example:
+    >>> detect_compression(b'\\x1f\\x8b\\x08\\x00')
+    'gzip'
+    """
+    for compression, magic in MAGIC_BYTES.items():
+        if header.startswith(magic):
+            return compression
+    return None
+
+
+def is_compressed(input_file_path):
+    """Check whether a file is compressed in one of the supported formats."""
+    with open(input_file_path, "rb") as file:
+        return detect_compression(file.read(8)) is not None
+
+
+def _decompress(raw, compression):
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(raw, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(raw, mode='rb')
+    if zstd is not None:
+        return zstd.ZstdFile(raw, mode='rb')
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_size=READ_BUFFER_SIZE)
+    raise ValueError("Reading zstd compressed logs needs the 'zstandard' package")
+
+
+class LogSource:
+    """
+    An open input log file, decompressed on the fly if needed.
+
+    Attributes:
+    - path (str): The path of the file.
+    - compression (str): The detected compression, or None.
+    - binary: A buffered binary stream of the (decompressed) content.
+    - text: A text stream of the content, decoded the same way
+    `open(path, "r")` decodes a plain file.
+    """
+
+    def __init__(self, input_file_path):
+        self.path = input_file_path
+        self.raw = open(input_file_path, "rb", buffering=READ_BUFFER_SIZE)
+        self.compression = detect_compression(self.raw.peek(8)[:8])
+        if self.compression:
+            self.binary = io.BufferedReader(
+                _decompress(self.raw, self.compression), buffer_size=READ_BUFFER_SIZE)
+        else:
+            self.binary = self.raw
+        self.text = io.TextIOWrapper(self.binary)
+
+    def bytes_read(self):
+        """Return how many bytes of the file on disk have been read."""
+        return self.raw.tell()
+
+    def read(self, size=-1):
+        return self.text.read(size)
+
+    def __iter__(self):
+        return iter(self.text)
+
+    def close(self):
+        self.text.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_log(input_file):
+    """
+    Open a log file, compressed or not, for reading text.
+
+    The returned LogSource can be iterated over line by line and read like
+    a text file. A LogSource that is already open is returned as it is, so
+    a file opened once to sniff its format can be handed on to a parser.
+
+    Example:
+    >>> with open_log('hadoop.log.gz') as file:
+    ...     for line in file:
+    ...         pass
+    """
+    if isinstance(input_file, LogSource):
+        return input_file
+    return LogSource(input_file)
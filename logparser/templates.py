@@ -0,0 +1,209 @@
+"""
+Online log template mining with Drain (He et al., ICWS 2017).
+
+Most messages of a log are a few hundred templates filled with variable
+block ids, addresses and sizes:
+
+    Received block blk_-1608999687919862906 of size 91178 from /10.250.10.6
+    Received block <*> of size <*> from /<*>
+
+Every message is assigned the id of its template while the log is parsed.
+Obvious variables are masked first (see MASKS), where the records are
+prepared to be written (see logparser.batch) and so in the worker processes
+of a parallel parse, then the masked message is routed
+down a fixed-depth parse tree: by its number of tokens, then by its first
+TREE_DEPTH - 2 tokens. The leaf holds the templates seen so far on that
+path; the message joins the most similar one when at least
+SIMILARITY_THRESHOLD of their tokens are equal, and the tokens that differ
+become wildcards. Otherwise it starts a new template.
+
+Template ids never change once assigned, only the template text gets more
+general, so the ids can be stored with the records while the log is still
+being parsed. The final templates are saved as 'templates.json' in the
+columnar store.
+"""
+import re
+
+WILDCARD = '<*>'
+
+# Depth of the parse tree: the root, the token count and TREE_DEPTH - 2
+# levels of leading tokens.
+TREE_DEPTH = 4
+# Share of equal tokens for a message to join a template.
+SIMILARITY_THRESHOLD = 0.5
+# Children of a tree node before further tokens are routed to a wildcard.
+MAX_CHILDREN = 100
+# Masked messages remembered with their template, to skip the tree search.
+MAX_CACHED_MESSAGES = 100000
+
+TEMPLATES_FILE = 'templates.json'
+
+# Variables masked before mining, most specific first: block ids, IPv4
+# addresses with an optional port, hex and decimal numbers.
+MASKS = [
+    r'blk_-?\d+',
+    r'\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?',
+    r'\b0x[0-9a-fA-F]+\b',
+    r'(?<![\w.])[-+]?\d+(?:\.\d+)?(?![\w.])',
+]
+# Every mask starts with one of these characters; checking it first spares
+# trying all the masks at every position of a message.
+MASK_PATTERN = re.compile(r'(?=[b\d+-])(?:' + '|'.join(MASKS) + ')')
+
+HAS_DIGIT = re.compile(r'\d')
+
+
+def mask(message):
+    """Replace the obvious variables of a message with wildcards."""
+    return MASK_PATTERN.sub(WILDCARD, message)
+
+
+def template_pattern(template):
+    """
+    Compile a regex matching the messages of a template, with one group per
+    wildcard.
+    """
+    tokens = [
+        '(.*?)'.join(re.escape(part) for part in token.split(WILDCARD))
+        for token in template.split()
+    ]
+    return re.compile(r'\s*' + r'\s+'.join(tokens) + r'\s*$', re.DOTALL)
+
+
+def template_parameters(template, message):
+    """
+    Return the values of the wildcards of a template in a message, or None
+    if the message does not fit the template.
+    """
+    match = template_pattern(template).match(message)
+    return list(match.groups()) if match else None
+
+
+class LogCluster:
+    """A template and the number of messages assigned to it."""
+
+    __slots__ = ('id', 'tokens', 'count')
+
+    def __init__(self, cluster_id, tokens, count=0):
+        self.id = cluster_id
+        self.tokens = tokens
+        self.count = count
+
+    @property
+    def template(self):
+        return ' '.join(self.tokens)
+
+
+class TemplateMiner:
+    """
+    Assigns messages to templates with the Drain parse tree.
+
+    The tree is nested dicts: {token count: {token: ... {token: [clusters]}}}.
+    """
+
+    def __init__(self):
+        self.clusters = []
+        self.root = {}
+        self.cache = {}
+
+    @classmethod
+    def from_dict(cls, saved):
+        """
+        Rebuild a miner from a saved 'templates.json', so that more messages
+        can be added with the same template ids.
+        """
+        miner = cls()
+        for template in saved['templates']:
+            cluster = LogCluster(template['id'], template['template'].split(), template['count'])
+            miner.clusters.append(cluster)
+            miner._insert(cluster)
+        return miner
+
+    def to_dict(self):
+        """Return the templates in the layout saved to 'templates.json'."""
+        return {
+            'templates': [
+                {'id': cluster.id, 'template': cluster.template, 'count': cluster.count}
+                for cluster in self.clusters
+            ],
+        }
+
+    def add(self, message):
+        """
+        Assign a message to a template.
+
+        Returns:
+        int: The template id.
+        """
+        return self.add_masked(mask(message))
+
+    def add_masked(self, masked):
+        """
+        Assign a message already masked with mask to a template.
+
+        Returns:
+        int: The template id.
+        """
+        cluster = self.cache.get(masked)
+        if cluster is None:
+            tokens = masked.split()
+            cluster = self._search(tokens)
+            if cluster is None:
+                cluster = LogCluster(len(self.clusters), tokens)
+                self.clusters.append(cluster)
+                self._insert(cluster)
+            else:
+                cluster.tokens = [
+                    token if token == new_token else WILDCARD
+                    for token, new_token in zip(cluster.tokens, tokens)
+                ]
+            if len(self.cache) >= MAX_CACHED_MESSAGES:
+                self.cache.clear()
+            self.cache[masked] = cluster
+        cluster.count += 1
+        return cluster.id
+
+    def _search(self, tokens):
+        node = self.root.get(len(tokens))
+        if node is None:
+            return None
+        for token in tokens[:TREE_DEPTH - 2]:
+            child = node.get(token)
+            if child is None:
+                child = node.get(WILDCARD)
+                if child is None:
+                    return None
+            node = child
+        if isinstance(node, dict):
+            # Fewer tokens than tree levels: the leaf hangs off a wildcard
+            node = node.get(WILDCARD, [])
+
+        best, best_similarity, best_wildcards = None, -1, -1
+        for cluster in node:
+            equal, wildcards = 0, 0
+            for token, new_token in zip(cluster.tokens, tokens):
+                if token == WILDCARD:
+                    wildcards += 1
+                elif token == new_token:
+                    equal += 1
+            similarity = equal / len(tokens) if tokens else 1
+            if similarity > best_similarity or (similarity == best_similarity
+                                                and wildcards > best_wildcards):
+                best, best_similarity, best_wildcards = cluster, similarity, wildcards
+        if best is not None and best_similarity >= SIMILARITY_THRESHOLD:
+            return best
+        return None
+
+    def _insert(self, cluster):
+        node = self.root.setdefault(len(cluster.tokens), {})
+        path = cluster.tokens[:TREE_DEPTH - 2] or [WILDCARD]
+        for depth, token in enumerate(path):
+            # Variable looking tokens, and any once a node is full, share
+            # the wildcard child
+            if HAS_DIGIT.search(token) or (token not in node and len(node) >= MAX_CHILDREN - 1):
+                token = WILDCARD
+            last = depth == len(path) - 1
+            if token not in node:
+                node[token] = [] if last else {}
+            node = node[token]
+        node.append(cluster)
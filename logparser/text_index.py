@@ -0,0 +1,297 @@
+"""
+Inverted token index over the parsed messages, built while a log is parsed.
+
+Every record is split into lowercased tokens (see tokenize) and its row
+number is added to the posting list of each of them. The records are
+tokenized a batch at a time where the batch is prepared (see
+batch_postings), in the worker processes of a parallel parse, and the
+writer only appends the posting lists of every batch to its own. Posting
+lists are collected in memory and written out as a sorted run every
+FLUSH_POSTINGS postings; the runs are merged into the final index when the
+store is closed, so memory stays bounded whatever the size of the log.
+
+The index is the 'index' folder of the columnar store:
+
+    terms.bin      utf-8 bytes of all tokens back to back, in byte order
+    terms.off      int64 end offset of every token in terms.bin
+    postings.off   int64 end of the posting list of every token, in rows
+    postings.u4    uint32 row numbers, ascending within every posting list
+
+Like the columns, the files can be memory-mapped with numpy; a token is
+found by bisecting terms.off (see backend.search).
+"""
+from array import array
+from collections import defaultdict
+import heapq
+import os
+import re
+import shutil
+import struct
+import sys
+
+INDEX_FOLDER = 'index'
+
+# Record fields whose tokens are indexed.
+INDEXED_FIELDS = ('message', 'ip_address')
+
+# Number of postings held in memory before they are written out as a run.
+FLUSH_POSTINGS = 4_000_000
+# Number of offsets read at a time while merging.
+READ_OFFSETS = 65536
+# Compound tokens longer than this are only indexed by their words.
+MAX_TOKEN_LENGTH = 128
+
+# Letters and digits: '_' separates words, as in 'blk_-1608999687919862906'
+WORD_PATTERN = re.compile(r'[^\W_]+')
+# Words joined by at least one separator, or by '_' alone
+COMPOUND_PATTERN = re.compile(r'\b\w+(?:[.:/@-]+\w+)+|\b\w+_\w+')
+
+RUN_HEADER = struct.Struct('<II')
+
+_NO_TOKENS = frozenset()
+
+
+def tokenize(text):
+    """
+    Return the distinct search tokens of a text.
+
+    The tokens are the lowercased words of the text, runs of letters and
+    digits, plus the compound tokens made of words joined by '_', '.', ':',
+    '/', '@' or '-', such as 'java.io.ioexception', '10.251.42.84:50010',
+    'blk_-1608999687919862906' or 'attempt_201510_m_000001', so that they
+    can be looked up whole as well as by their words ('blk', 'attempt').
+    """
+    text = text.lower()
+    tokens = set(WORD_PATTERN.findall(text))
+    tokens.update(compound for compound in COMPOUND_PATTERN.findall(text)
+                  if len(compound) <= MAX_TOKEN_LENGTH)
+    return tokens
+
+
+def tokenize_values(values):
+    """
+    Return the tokens of every value of a list, an empty set for the
+    missing and empty values.
+    """
+    return [tokenize(str(value)) if value else _NO_TOKENS for value in values]
+
+
+def batch_postings(columns):
+    """
+    Return the posting lists of a batch of records.
+
+    Parameters:
+    - columns (list): For every indexed field of the records, the tokens of
+    the field of every record (see tokenize_values).
+
+    Returns:
+    dict: {token: array('I') of the ascending rows of the batch holding it}.
+    """
+    postings = defaultdict(lambda: array('I'))
+    record_tokens = columns[0] if len(columns) == 1 else map(frozenset().union, *columns)
+    for row, tokens in enumerate(record_tokens):
+        for token in tokens:
+            postings[token].append(row)
+    # A plain dict, to be sent back from the worker processes
+    return dict(postings)
+
+
+def _little_endian(rows):
+    if sys.byteorder == 'big':
+        rows = array('I', rows)
+        rows.byteswap()
+    return rows.tobytes()
+
+
+def _read_run(path):
+    # (token bytes, posting bytes) in token order from a run file
+    with open(path, 'rb') as run_file:
+        while True:
+            header = run_file.read(RUN_HEADER.size)
+            if not header:
+                return
+            token_length, count = RUN_HEADER.unpack(header)
+            yield run_file.read(token_length), run_file.read(count * 4)
+
+
+def _read_offsets(file):
+    start = 0
+    while True:
+        offsets = array('q')
+        data = file.read(READ_OFFSETS * 8)
+        if not data:
+            return
+        offsets.frombytes(data)
+        if sys.byteorder == 'big':
+            offsets.byteswap()
+        for end in offsets:
+            yield start, end
+            start = end
+
+
+def _read_index(index_folder):
+    # (token bytes, posting bytes) in token order from a finished index
+    files = [open(os.path.join(index_folder, name), 'rb')
+             for name in ('terms.off', 'terms.bin', 'postings.off', 'postings.u4')]
+    try:
+        terms_offsets, terms, postings_offsets, postings = files
+        for (term_start, term_end), (start, end) in zip(_read_offsets(terms_offsets),
+                                                          _read_offsets(postings_offsets)):
+            yield terms.read(term_end - term_start), postings.read((end - start) * 4)
+    finally:
+        for file in files:
+            file.close()
+
+
+def _numbered(number, entries):
+    for token, postings in entries:
+        yield token, number, postings
+
+
+class _IndexFiles:
+    """Writes (token, postings) pairs in token order as a finished index."""
+
+    def __init__(self, index_folder):
+        os.makedirs(index_folder)
+        self.files = {
+            name: open(os.path.join(index_folder, name), 'wb')
+            for name in ('terms.off', 'terms.bin', 'postings.off', 'postings.u4')
+        }
+        self.terms_end = 0
+        self.postings_end = 0
+        self.terms_offsets = array('q')
+        self.postings_offsets = array('q')
+
+    def write(self, token, postings):
+        self.terms_end += len(token)
+        self.postings_end += len(postings) // 4
+        self.terms_offsets.append(self.terms_end)
+        self.postings_offsets.append(self.postings_end)
+        self.files['terms.bin'].write(token)
+        self.files['postings.u4'].write(postings)
+        if len(self.terms_offsets) >= READ_OFFSETS:
+            self.flush()
+
+    def flush(self):
+        for name, offsets in (('terms.off', self.terms_offsets),
+                              ('postings.off', self.postings_offsets)):
+            if sys.byteorder == 'big':
+                offsets.byteswap()
+            offsets.tofile(self.files[name])
+        self.terms_offsets = array('q')
+        self.postings_offsets = array('q')
+
+    def close(self):
+        self.flush()
+        for file in self.files.values():
+            file.close()
+
+
+class IndexWriter:
+    """
+    Builds the inverted index of the records written to a store.
+
+    Parameters:
+    - index_folder (str): The 'index' folder of the store.
+    - first_row (int): The row number of the first record added. Above 0
+    the records are appended to a store and merged into its existing index;
+    a store without an index (parsed before indexing existed) stays without
+    one, rather than getting an index of its new rows only.
+    """
+
+    def __init__(self, index_folder, first_row=0):
+        self.index_folder = index_folder
+        self.runs_folder = index_folder + '.runs'
+        self.first_row = first_row
+        self.enabled = first_row == 0 or os.path.isdir(index_folder)
+        self.postings = {}
+        self.pending = 0
+        self.runs = []
+        if self.enabled:
+            shutil.rmtree(self.runs_folder, ignore_errors=True)
+            os.makedirs(self.runs_folder)
+
+    def add_postings(self, first_row, batch):
+        """
+        Index a batch of records stored from a row number on.
+
+        Parameters:
+        - first_row (int): The row number of the first record of the batch.
+        - batch (dict): The posting lists of the batch, see batch_postings.
+        """
+        if not self.enabled:
+            return
+        postings = self.postings
+        for token, rows in batch.items():
+            if first_row:
+                rows = array('I', map(first_row.__add__, rows))
+            existing = postings.get(token)
+            if existing is None:
+                # The batch is not used once written, its lists are taken over
+                postings[token] = rows
+            else:
+                existing.extend(rows)
+        self.pending += sum(map(len, batch.values()))
+        if self.pending >= FLUSH_POSTINGS:
+            self.flush()
+
+    def _sorted_postings(self):
+        return sorted((token.encode('utf-8'), rows) for token, rows in self.postings.items())
+
+    def flush(self):
+        """Write the postings collected so far as a sorted run."""
+        if not self.postings:
+            return
+        path = os.path.join(self.runs_folder, f'{len(self.runs)}.run')
+        with open(path, 'wb') as run_file:
+            run_file.write(b''.join(
+                RUN_HEADER.pack(len(token), len(rows)) + token + _little_endian(rows)
+                for token, rows in self._sorted_postings()
+            ))
+        self.runs.append(path)
+        self.postings = {}
+        self.pending = 0
+
+    def close(self):
+        """Merge the runs, and the existing index when appending, into place."""
+        if not self.enabled:
+            return
+        new_folder = self.index_folder + '.new'
+        shutil.rmtree(new_folder, ignore_errors=True)
+        output = _IndexFiles(new_folder)
+
+        if not self.runs and not self.first_row:
+            # Everything fits in memory: no runs to merge
+            for token, rows in self._sorted_postings():
+                output.write(token, _little_endian(rows))
+        else:
+            self.flush()
+            sources = [_read_run(path) for path in self.runs]
+            if self.first_row:
+                # The existing rows come first, so posting lists stay ascending
+                sources.insert(0, _read_index(self.index_folder))
+            merged = heapq.merge(*(_numbered(number, entries)
+                                   for number, entries in enumerate(sources)))
+            token, postings = None, []
+            for next_token, _, next_postings in merged:
+                if next_token != token and postings:
+                    output.write(token, b''.join(postings))
+                    postings = []
+                token = next_token
+                postings.append(next_postings)
+            if postings:
+                output.write(token, b''.join(postings))
+        output.close()
+
+        old_folder = self.index_folder + '.old'
+        shutil.rmtree(old_folder, ignore_errors=True)
+        if os.path.exists(self.index_folder):
+            os.rename(self.index_folder, old_folder)
+        os.rename(new_folder, self.index_folder)
+        shutil.rmtree(old_folder, ignore_errors=True)
+        shutil.rmtree(self.runs_folder, ignore_errors=True)
+
+    def abort(self):
+        if self.enabled:
+            shutil.rmtree(self.runs_folder, ignore_errors=True)
+            shutil.rmtree(self.index_folder + '.new', ignore_errors=True)
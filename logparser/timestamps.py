@@ -0,0 +1,275 @@
+"""
+Fast timestamp normalization for the known log formats.
+
+Lines in a log burst mostly share the same date, hour and minute, so each
+parser slices its fixed-layout timestamp and looks the date+minute prefix up
+in a small memo cache. Only the seconds (and milliseconds) are formatted per
+line. Anything that does not fit the fixed layout exactly falls back to
+`datetime.strptime`, which keeps the results (and the errors raised for
+invalid timestamps) identical to the strptime based conversion.
+
+`to_epoch_us` uses the same date+minute memo to turn normalized timestamps
+into the int64 epoch values kept by the columnar store.
+"""
+import calendar
+from datetime import datetime, timedelta, timezone
+import re
+
+HADOOP_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+HDFS_FORMAT = "%y%m%d %H%M%S"
+CLF_FORMAT = "%d/%b/%Y:%H:%M:%S %z"
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+
+# The number of distinct prefixes kept before a cache is emptied.
+MAX_CACHE_SIZE = 4096
+
+# Epoch value stored for records without a usable timestamp. It is the same
+# sentinel numpy and pandas use for NaT.
+MISSING_EPOCH = -2 ** 63
+
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Seconds, optional fraction and optional UTC offset of an ISO timestamp.
+ISO_TAIL_PATTERN = re.compile(r'(\d\d)(?:[.,](\d{1,9}))?(Z|[+-]\d\d(?::?\d\d)?)?$')
+
+_hadoop_cache = {}
+_hdfs_cache = {}
+_clf_cache = {}
+_epoch_cache = {}
+
+
+def _remember(cache, key, value):
+    if len(cache) >= MAX_CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
+    return value
+
+
+def hadoop_to_iso(timestamp):
+    """
+    Convert a 'YYYY-MM-DD HH:MM:SS,fff' timestamp to ISO 8601.
+
+    Used by the Hadoop and Zookeeper parsers.
+
+    Example:
+    >>> hadoop_to_iso('2015-10-18 18:01:47,978')
+    '2015-10-18T18:01:47.978000'
+    """
+    if (len(timestamp) == 23 and timestamp[19] == ',' and timestamp.isascii()
+            and timestamp[17:19].isdigit() and timestamp[20:].isdigit()
+            and timestamp[17:19] < '60'):
+        prefix = _hadoop_cache.get(timestamp[:17])
+        if prefix is None:
+            prefix = _hadoop_prefix(timestamp)
+        if prefix is not None:
+            if timestamp[20:] == '000':
+                return prefix + timestamp[17:19]
+            return prefix + timestamp[17:19] + '.' + timestamp[20:] + '000'
+
+    return datetime.strptime(timestamp, HADOOP_FORMAT).isoformat()
+
+
+def _hadoop_prefix(timestamp):
+    # 'YYYY-MM-DD HH:MM:' -> 'YYYY-MM-DDTHH:MM:'
+    key = timestamp[:17]
+    if (key[4] + key[7] + key[10] + key[13] + key[16] != '-- ::'
+            or not (key[:4] + key[5:7] + key[8:10] + key[11:13]
+                    + key[14:16]).isdigit()):
+        return None
+    try:
+        datetime(int(key[:4]), int(key[5:7]), int(key[8:10]),
+                 int(key[11:13]), int(key[14:16]))
+    except ValueError:
+        return None
+    return _remember(_hadoop_cache, key, key[:10] + 'T' + key[11:])
+
+
+def hdfs_to_iso(timestamp):
+    """
+    Convert a 'yymmdd HHMMSS' timestamp to 'YYYY-MM-DD HH:MM:SS'.
+
+    Example:
+    >>> hdfs_to_iso('081109 203518')
+    '2008-11-09 20:35:18'
+    """
+    if (len(timestamp) == 13 and timestamp.isascii()
+            and timestamp[11:].isdigit() and timestamp[11:] < '60'):
+        prefix = _hdfs_cache.get(timestamp[:11])
+        if prefix is None:
+            prefix = _hdfs_prefix(timestamp)
+        if prefix is not None:
+            return prefix + timestamp[11:]
+
+    return datetime.strptime(timestamp, HDFS_FORMAT).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _hdfs_prefix(timestamp):
+    # 'yymmdd HHMM' -> 'YYYY-MM-DD HH:MM:'
+    key = timestamp[:11]
+    if key[6] != ' ' or not (key[:6] + key[7:]).isdigit():
+        return None
+    # Same pivot as strptime's %y: 69-99 -> 1900s, 00-68 -> 2000s
+    year = int(key[:2])
+    year += 1900 if year >= 69 else 2000
+    try:
+        datetime(year, int(key[2:4]), int(key[4:6]),
+                 int(key[7:9]), int(key[9:11]))
+    except ValueError:
+        return None
+    return _remember(_hdfs_cache, key, f"{year:04d}-{key[2:4]}-{key[4:6]} "
+                                       f"{key[7:9]}:{key[9:11]}:")
+
+
+def clf_to_iso(timestamp):
+    """
+    Convert a 'DD/Mon/YYYY:HH:MM:SS +zzzz' timestamp to ISO 8601.
+
+    Example:
+    >>> clf_to_iso('10/Oct/2000:13:55:36 -0700')
+    '2000-10-10T13:55:36-07:00'
+    """
+    if (len(timestamp) == 26 and timestamp[17] == ':' and timestamp.isascii()
+            and timestamp[18:20].isdigit() and timestamp[18:20] < '60'):
+        key = timestamp[:17] + timestamp[20:]
+        parts = _clf_cache.get(key)
+        if parts is None:
+            parts = _clf_prefix(key)
+        if parts is not None:
+            return parts[0] + timestamp[18:20] + parts[1]
+
+    return datetime.strptime(timestamp, CLF_FORMAT).isoformat()
+
+
+def _clf_prefix(key):
+    # 'DD/Mon/YYYY:HH:MM +zzzz' -> ('YYYY-MM-DDTHH:MM:', '+zz:zz')
+    month = MONTHS.get(key[3:6])
+    if (month is None or key[2] + key[6] + key[11] + key[14] + key[17] != '//:: '
+            or key[18] not in '+-'
+            or not (key[:2] + key[7:11] + key[12:14] + key[15:17]
+                    + key[19:]).isdigit()):
+        return None
+    try:
+        datetime(int(key[7:11]), month, int(key[:2]),
+                 int(key[12:14]), int(key[15:17]))
+    except ValueError:
+        return None
+    if int(key[19:21]) > 23 or int(key[21:23]) > 59:
+        return None
+    offset = key[18:21] + ':' + key[21:23]
+    if offset == '-00:00':
+        offset = '+00:00'
+    return _remember(_clf_cache, key, (
+        f"{key[7:11]}-{month:02d}-{key[:2]}T{key[12:14]}:{key[15:17]}:", offset
+    ))
+
+
+def convert_distinct(convert, timestamps):
+    """
+    Convert every distinct timestamp of a column once.
+
+    Second resolution timestamps repeat over whole runs of lines. Values
+    are converted in order of first appearance, so an invalid timestamp
+    raises the same error as converting the column one by one would.
+
+    Returns:
+    dict: The converted value of every timestamp.
+
+    Example:
+    >>> convert_distinct(hdfs_to_iso, ['081109 203518', '081109 203518'])
+    {'081109 203518': '2008-11-09 20:35:18'}
+    """
+    return {timestamp: convert(timestamp) for timestamp in dict.fromkeys(timestamps)}
+
+
+def hadoop_column_to_iso(timestamps):
+    """
+    Convert a list of 'YYYY-MM-DD HH:MM:SS,fff' timestamps to ISO 8601, the
+    same as hadoop_to_iso one by one.
+
+    Everything up to the milliseconds is converted once per distinct second;
+    only the milliseconds are appended per value.
+
+    Example:
+    >>> hadoop_column_to_iso(['2015-10-18 18:01:47,978', '2015-10-18 18:01:47,000'])
+    ['2015-10-18T18:01:47.978000', '2015-10-18T18:01:47']
+    """
+    seconds = {}
+    converted = []
+    for timestamp in timestamps:
+        key = timestamp[:20]
+        milliseconds = timestamp[20:]
+        prefix = seconds.get(key)
+        if prefix is None or not (milliseconds.isascii() and milliseconds.isdigit()):
+            if not (len(timestamp) == 23 and timestamp.isascii() and milliseconds.isdigit()):
+                converted.append(hadoop_to_iso(timestamp))
+                continue
+            try:
+                prefix = seconds[key] = hadoop_to_iso(key + '000')
+            except ValueError:
+                # Raise the error of the timestamp itself
+                hadoop_to_iso(timestamp)
+                raise
+        if milliseconds == '000':
+            converted.append(prefix)
+        else:
+            converted.append(prefix + '.' + milliseconds + '000')
+    return converted
+
+
+def to_epoch_us(timestamp):
+    """
+    Convert a normalized ISO 8601 timestamp to microseconds since the epoch.
+
+    Timestamps without a UTC offset are taken to be UTC. Values that are not
+    timestamps (including None) map to MISSING_EPOCH.
+
+    Example:
+    >>> to_epoch_us('1970-01-01T00:01:00.5')
+    60500000
+    """
+    if not isinstance(timestamp, str):
+        return MISSING_EPOCH
+
+    if len(timestamp) >= 19 and timestamp[16] == ':' and timestamp.isascii():
+        base = _epoch_cache.get(timestamp[:16])
+        if base is None:
+            base = _epoch_base(timestamp[:16])
+        tail = ISO_TAIL_PATTERN.match(timestamp, 17)
+        if base is not None and tail and tail.group(1) < '60':
+            seconds, fraction, offset = tail.groups()
+            epoch = base + int(seconds) * 1_000_000
+            if fraction:
+                epoch += int(fraction[:6].ljust(6, '0'))
+            if offset and offset != 'Z':
+                minutes = int(offset[1:3]) * 60
+                if len(offset) > 3:
+                    minutes += int(offset[-2:])
+                epoch -= (minutes if offset[0] == '+' else -minutes) * 60_000_000
+            return epoch
+
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except ValueError:
+        return MISSING_EPOCH
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - UNIX_EPOCH) // timedelta(microseconds=1)
+
+
+def _epoch_base(key):
+    # 'YYYY-MM-DDTHH:MM' (or with a space separator) -> epoch microseconds
+    if (key[4] + key[7] + key[13] != '--:' or key[10] not in 'T '
+            or not (key[:4] + key[5:7] + key[8:10] + key[11:13]
+                    + key[14:16]).isdigit()):
+        return None
+    try:
+        moment = datetime(int(key[:4]), int(key[5:7]), int(key[8:10]),
+                          int(key[11:13]), int(key[14:16]))
+    except ValueError:
+        return None
+    return _remember(_epoch_cache, key,
+                     calendar.timegm(moment.timetuple()) * 1_000_000)
@@ -1,12 +1,17 @@
-from datetime import datetime
 import re
 import json
+from logparser.metrics import stage
+from logparser.pipeline import block_parser, match_block, run_pipeline
+from logparser.sources import open_log
+from logparser.timestamps import hadoop_column_to_iso, hadoop_to_iso
 
 log_entry_pattern = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})\s*-\s*(\w+)\s+\[.*?\]\s*-\s*(.*)$')
+# log_entry_pattern for a whole block of lines, see parse_zookeeper_lines
+block_pattern = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3})[^\S\n]*-[^\S\n]*(\w+)[^\S\n]+\[.*?\][^\S\n]*-[^\S\n]*(.*)$', re.MULTILINE)
 
 def is_zookeeper_log_file(input_file_path):
     try:
-        with open(input_file_path, "r") as file:
+        with open_log(input_file_path) as file:
             for line in file:
                 # Parse the log entry
                 return bool(log_entry_pattern.match(line.strip()))
@@ -35,31 +40,27 @@ def parse_zookeeper_log(log_entry):
         print(f"Failed to match log entry: {log_entry}")
         return None
 
-def convert_to_iso_format(timestamp):
-    # Parse the timestamp using the format
-    timestamp_datetime = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S,%f")
-
-    # Convert to ISO format
-    iso_format = timestamp_datetime.isoformat()
+@block_parser(parse_zookeeper_log)
+def parse_zookeeper_lines(lines):
+    # Batch version of parse_zookeeper_log: one regex scan for all lines,
+    # timestamps converted column-wise
+    matches, unmatched = match_block(block_pattern, lines)
+    with stage('timestamps'):
+        timestamps = hadoop_column_to_iso([match[0] for match in matches])
+    return [
+        {"timestamp": timestamp, "log_level": match[1], "message": match[2]}
+        for timestamp, match in zip(timestamps, matches)
+    ], unmatched
 
-    return iso_format
-
-def zookeeper_parser(input_file_path, output_file_path):
-    parsed_data_list = []
+def convert_to_iso_format(timestamp):
+    # Slice the fixed-layout timestamp, falling back to strptime if needed
+    return hadoop_to_iso(timestamp)
 
+def zookeeper_parser(input_file_path, output_file_path, workers=1, progress=None):
     try:
-        with open(input_file_path, "r") as file:
-            # Read each line from the log file
-            for line in file:
-                # Parse the log entry
-                parsed_data = parse_zookeeper_log(line.strip())
-                
-                if parsed_data:
-                    parsed_data_list.append(parsed_data)
-
-        # Save the parsed data to a JSON file
-        with open(output_file_path + '/output.json', "w") as json_file:
-            json.dump(parsed_data_list, json_file, indent=2)
+        # Stream each line through the parser straight into the JSON file
+        return run_pipeline(input_file_path, output_file_path, parse_zookeeper_log, workers,
+                            progress=progress)
 
     except FileNotFoundError:
         print(f"File '{input_file_path}' not found.")
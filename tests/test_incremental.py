@@ -0,0 +1,86 @@
+"""
+Appending to a log uploaded in full: the full parse saves the checkpoint the
+appends continue from, so every append parses only the new lines.
+"""
+import io
+import json
+import os
+import time
+
+import pytest
+
+from backend.application import app
+from benchmarks.generators import write_hdfs_log
+from logparser.hdfs_parser import parse_hdfs_log
+from logparser.incremental import read_checkpoint
+from logparser.pipeline import run_pipeline
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # The job states are saved in a folder relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setitem(app.config, 'OUTPUT_FOLDER', str(tmp_path / 'parsed_logs'))
+    return app.test_client()
+
+
+@pytest.fixture
+def log_lines(tmp_path):
+    path = tmp_path / 'generated.log'
+    write_hdfs_log(str(path), 3000)
+    return path.read_bytes().splitlines(keepends=True)
+
+
+def upload(client, lines, query=''):
+    """Upload lines as 'hdfs.log' and return the result of the parse job."""
+    response = client.post('/upload' + query, data={
+        'file': (io.BytesIO(b''.join(lines)), 'hdfs.log'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202, response.get_json()
+    job_id = response.get_json()['job_id']
+
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['state'] not in ('queued', 'running'):
+            assert job['error'] is None
+            return job['result']
+        time.sleep(0.05)
+    raise AssertionError('The parse job did not finish')
+
+
+def test_upload_then_appends_parse_only_new_lines(client, log_lines):
+    first = upload(client, log_lines[:1000])
+    assert first['records'] == 1000
+
+    dataset_folder = os.path.join(app.config['OUTPUT_FOLDER'], first['id'])
+    checkpoint = read_checkpoint(dataset_folder)
+    assert checkpoint['offset'] == len(b''.join(log_lines[:1000]))
+    assert checkpoint['rows'] == 1000
+
+    second = upload(client, log_lines[:2000], '?mode=append')
+    assert second['id'] == first['id']
+    assert (second['records'], second['rows']) == (1000, 2000)
+
+    third = upload(client, log_lines, '?mode=append')
+    assert third['id'] == first['id']
+    assert (third['records'], third['rows']) == (1000, 3000)
+
+    # The appended outputs are those of parsing the whole log at once
+    whole_folder = os.path.join(app.config['OUTPUT_FOLDER'], 'whole')
+    os.makedirs(whole_folder)
+    whole_log = os.path.join(app.config['OUTPUT_FOLDER'], 'hdfs.log')
+    with open(whole_log, 'wb') as file:
+        file.write(b''.join(log_lines))
+    run_pipeline(whole_log, whole_folder, parse_hdfs_log)
+    with open(os.path.join(dataset_folder, 'output.json')) as appended, \
+            open(os.path.join(whole_folder, 'output.json')) as whole:
+        assert json.load(appended) == json.load(whole)
+
+
+def test_unterminated_last_line_gets_no_checkpoint(tmp_path, log_lines):
+    log_path = tmp_path / 'hdfs.log'
+    log_path.write_bytes(b''.join(log_lines[:10]) + log_lines[10].rstrip(b'\n'))
+    run_pipeline(str(log_path), str(tmp_path), parse_hdfs_log)
+    assert read_checkpoint(str(tmp_path)) is None
@@ -0,0 +1,82 @@
+"""
+The chunked JSON decoder: read a few characters at a time, every value and
+delimiter ends up split across chunks, and the records must still be those
+json.load gives.
+"""
+import json
+
+import pytest
+
+from logparser import json_parser
+from logparser.json_parser import read_json_records
+
+RECORDS = [
+    {'timestamp': '2024-01-01T00:00:00Z', 'level': 'INFO', 'message': 'started'},
+    12345678901234567890,
+    -1.5e10,
+    0.000123,
+    'a string with "quotes", commas, and ] brackets',
+    [1, [2, 3], {'nested': [4.5, -6]}],
+    {'id': 987654321, 'ratio': 3.14159e-7, 'empty': {}, 'none': None},
+    7,
+]
+
+
+@pytest.fixture(params=[1, 2, 3, 5, 7])
+def read_chars(request, monkeypatch):
+    monkeypatch.setattr(json_parser, 'READ_CHARS', request.param)
+    return request.param
+
+
+def read(tmp_path, text):
+    path = tmp_path / 'log.json'
+    path.write_text(text, encoding='utf-8')
+    return list(read_json_records(str(path)))
+
+
+@pytest.mark.parametrize('text', [
+    json.dumps(RECORDS),
+    json.dumps(RECORDS, indent=2),
+    json.dumps(RECORDS, separators=(',', ':')),
+    ' \n[ ' + ' ,\n '.join(map(json.dumps, RECORDS)) + ' ]\n',
+    '[]',
+    '[12345]',
+    '[1,22,333,4444]',
+])
+def test_top_level_array(tmp_path, read_chars, text):
+    assert read(tmp_path, text) == json.loads(text)
+
+
+@pytest.mark.parametrize('separator', ['\n', '\r\n', ' ', '\n\n'])
+def test_ndjson(tmp_path, read_chars, separator):
+    # Records are objects, numbers are only ever cut off by the chunk end
+    records = [record for record in RECORDS if not isinstance(record, list)]
+    text = separator.join(map(json.dumps, records))
+    assert read(tmp_path, text) == records
+    assert read(tmp_path, text + separator) == records
+
+
+@pytest.mark.parametrize('text', ['1 22 333 4444', '1\n22\n333\n4444\n'])
+def test_ndjson_numbers(tmp_path, read_chars, text):
+    assert read(tmp_path, text) == [json.loads(line) for line in text.split()]
+
+
+def test_delimiter_at_end_of_buffer(tmp_path, monkeypatch):
+    # Every chunk ends on the delimiter after a value, or on the value itself
+    monkeypatch.setattr(json_parser, 'READ_CHARS', 4)
+    assert read(tmp_path, '[12,\n34,\n56]') == [12, 34, 56]
+    assert read(tmp_path, '[123,456,789]') == [123, 456, 789]
+    assert read(tmp_path, '123\n456\n789\n') == [123, 456, 789]
+
+
+def test_ndjson_of_arrays_is_a_top_level_array(tmp_path, read_chars):
+    # The first record is read as the opening of a top-level array
+    assert read(tmp_path, '[1, 2]') == [1, 2]
+    with pytest.raises(json.JSONDecodeError):
+        read(tmp_path, '[1, 2]\n[3, 4]\n')
+
+
+@pytest.mark.parametrize('text', ['[1, 2', '[1 2]', '{"a": 1', '[1, 2] 3', '123abc'])
+def test_invalid_json(tmp_path, read_chars, text):
+    with pytest.raises(json.JSONDecodeError):
+        read(tmp_path, text)